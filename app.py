@@ -1,18 +1,320 @@
 # app.py
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Body
+from fastapi import Request, Response, Header, Query
+from fastapi.responses import StreamingResponse, PlainTextResponse, FileResponse
 import point_calculator # Import your calculation module
+import events
+import metrics
+import profiling
+import snapshots
+import watcher
+import asyncio
+import hashlib
+import json
 import logging
 import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv # Still useful for other potential env vars
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
+from typing import Any, Dict, Optional
 # Load environment variables (if any, other than MongoDB)
 load_dotenv()
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Last successful calculation, keyed on point_calculator.compute_inputs_fingerprint().
+# Replaced as a whole (never mutated field by field) so readers always see a matching fingerprint/data pair.
+# "body" is the UTF-8 JSON of data, written by point_calculator straight from the result columns.
+# With RESULT_SNAPSHOTS=1 the entry holds a mapped snapshots.Snapshot instead: "body" is a view of its payload
+# and "data" stays None (see _result_data), so workers share one copy of the result through the page cache.
+# "digest" (events.result_digest) lets the next result be diffed for /api/v1/events without keeping this one's data.
+# "encoded_bodies" holds body precompressed per Content-Encoding (point_calculator.compress_json_body).
+# "body_hash" is a digest of body (computed once per stored result) and the base of its ETag.
+# "indexes" (_build_result_indexes) serve the query routes for in-memory results; snapshots are queried directly.
+# Everything is derived in _store_result, called from pool threads, so requests never build it on the event loop.
+_result_cache: Dict[str, Any] = {"fingerprint": None, "data": None, "body": None, "encoded_bodies": {}, "indexes": None, "snapshot": None,
+                                 "n_fixtures": 0, "digest": None, "body_hash": None}
+_store_lock = threading.Lock() # Orders swaps so each diff is against the result it replaced
+
+def _store_result(fingerprint: str, data, body: Optional[bytes] = None, snapshot: Optional[snapshots.Snapshot] = None,
+                  encoded_bodies: Optional[Dict[str, bytes]] = None) -> Dict[str, Any]:
+    global _result_cache
+    digest = events.result_digest(snapshot.iter_digest_items() if snapshot else events.iter_data_digest_items(data))
+    if snapshot is not None: body = snapshot.body
+    body_hash = hashlib.sha256(body).hexdigest()[:32] if body is not None else None
+    indexes = _build_result_indexes(data) if snapshot is None else None
+    with _store_lock:
+        previous = _result_cache
+        _result_cache = {"fingerprint": fingerprint, "data": data, "body": body,
+                         "encoded_bodies": snapshot.encoded_bodies if snapshot else encoded_bodies or {}, "indexes": indexes,
+                         "snapshot": snapshot, "n_fixtures": snapshot.n_fixtures if snapshot else len(data or []), "digest": digest,
+                         "body_hash": body_hash}
+        if previous["digest"] is not None: _publish_result_diff(previous, _result_cache)
+        return _result_cache
+
+def _result_data(result: Dict[str, Any]):
+    """The grouped result of a cache entry (decoded from the snapshot payload on first use in this worker)."""
+    return result["snapshot"].load_data() if result["snapshot"] is not None else result["data"]
+
+# --- Background calculation pool, single-flight coalescing & jobs ---
+# Calculations run on a bounded thread pool so the event loop keeps serving other routes.
+# Threads (not processes) so every worker shares the result cache and incremental state.
+CALCULATION_WORKERS = int(os.getenv("CALCULATION_WORKERS", "2"))
+# Max distinct calculations (different input fingerprints) running at once; further ones wait for a slot
+MAX_CONCURRENT_CALCULATIONS = int(os.getenv("MAX_CONCURRENT_CALCULATIONS", str(CALCULATION_WORKERS)))
+MAX_STORED_JOBS = int(os.getenv("MAX_STORED_JOBS", "100"))
+MAX_SCENARIOS_PER_REQUEST = int(os.getenv("MAX_SCENARIOS_PER_REQUEST", "1000"))
+MAX_SIMULATIONS_PER_REQUEST = int(os.getenv("MAX_SIMULATIONS_PER_REQUEST", "1000000"))
+_calculation_executor = ThreadPoolExecutor(max_workers=CALCULATION_WORKERS, thread_name_prefix="points-calc")
+_calculation_slots = asyncio.Semaphore(MAX_CONCURRENT_CALCULATIONS)
+_inflight_calculations: Dict[Any, asyncio.Future] = {} # Key: input fingerprint (or a slice key)
+_jobs: Dict[str, Dict[str, Any]] = {} # Key: job_id, insertion ordered (oldest first)
+
+def _calculate_and_cache(fingerprint: str, on_fixture_json=None):
+    """Runs the calculation (on the pool) and caches a successful result under the given input fingerprint.
+    Returns (result cache entry, error_message). on_fixture_json is passed to the calculation (not called when
+    the result comes from a snapshot).
+
+    With snapshots enabled, one worker at a time builds (under the snapshot builder lock); the others map the
+    snapshot it publishes for this fingerprint instead of recomputing.
+    """
+    if not snapshots.SNAPSHOTS_ENABLED: return _compute_and_cache(fingerprint, on_fixture_json)
+    with snapshots.builder_lock():
+        snapshot = snapshots.open_current(fingerprint)
+        metrics.record_cache("snapshot", snapshot is not None)
+        if snapshot is not None:
+            logging.info(f"Serving player points from snapshot generation {snapshot.generation} (fingerprint {fingerprint[:12]}).")
+            return _store_result(fingerprint, None, snapshot=snapshot), None
+        return _compute_and_cache(fingerprint, on_fixture_json)
+
+def _compute_and_cache(fingerprint: str, on_fixture_json=None):
+    logging.info(f"Input fingerprint changed ({fingerprint[:12]}). Recomputing player points.")
+    data, body, error_message = point_calculator.generate_all_player_points_data(incremental=True, with_json=True, on_fixture_json=on_fixture_json)
+    if error_message:
+        return {"fingerprint": None, "data": data, "body": None, "encoded_bodies": {}, "indexes": None, "snapshot": None, "n_fixtures": 0, "digest": None}, error_message
+    # Fingerprint is taken before computing, so inputs changed mid-run are picked up by the next request
+    snapshot = snapshots.write_snapshot(fingerprint, data) if snapshots.SNAPSHOTS_ENABLED else None
+    if snapshot is not None: return _store_result(fingerprint, None, snapshot=snapshot), None
+    return _store_result(fingerprint, data, body, encoded_bodies=point_calculator.compress_json_body(body)), None
+
+async def _run_calculation_for(fingerprint: str, on_fixture_json=None):
+    async with _calculation_slots:
+        # Another calculation may have produced this fingerprint while we waited for a slot
+        cache = _result_cache
+        if cache["fingerprint"] == fingerprint: return cache, None
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_calculation_executor, _calculate_and_cache, fingerprint, on_fixture_json)
+
+async def _get_inputs_fingerprint() -> str:
+    def timed_fingerprint():
+        with metrics.stage_timer("inputs_fingerprint"): return point_calculator.compute_inputs_fingerprint()
+    return await asyncio.to_thread(timed_fingerprint)
+
+def _single_flight(key, coroutine_factory):
+    """Returns a shielded awaitable for the in-flight task with this key, starting it via coroutine_factory if needed.
+    Shielded so a disconnecting client doesn't cancel the calculation other callers are waiting on."""
+    inflight = _inflight_calculations.get(key)
+    if inflight is None:
+        inflight = asyncio.ensure_future(coroutine_factory())
+        _inflight_calculations[key] = inflight
+        inflight.add_done_callback(lambda done: _inflight_calculations.pop(key, None) if _inflight_calculations.get(key) is done else None)
+    else:
+        logging.info(f"Joining in-flight calculation {key if isinstance(key, tuple) else key[:12]}.")
+        metrics.REGISTRY.inc("points_coalesced_requests_total", "Requests that joined an in-flight calculation instead of starting one.")
+    return asyncio.shield(inflight)
+
+# --- Data-directory watcher & background refresh ---
+# While the watcher runs, a changed input never makes a request wait: the last result keeps being served and a
+# background recompute replaces it (as a whole, via _store_result) once it succeeds.
+_data_watcher: Optional[watcher.DataWatcher] = None
+_background_tasks = set() # References to running refresh tasks so they aren't garbage collected
+_failed_refresh_fingerprint: Optional[str] = None # Not retried by requests until the inputs change again
+
+async def _refresh_in_background(force: bool = False, fingerprint: Optional[str] = None):
+    """Recomputes the result for the current inputs unless it's already cached (or, unless forced by the watcher,
+    the last background attempt for these inputs failed)."""
+    global _failed_refresh_fingerprint
+    fingerprint = fingerprint or await _get_inputs_fingerprint()
+    if _result_cache["fingerprint"] == fingerprint or (not force and fingerprint == _failed_refresh_fingerprint): return
+    logging.info(f"Refreshing player points in the background (fingerprint {fingerprint[:12]}).")
+    try: _, error_message = await _single_flight(fingerprint, lambda: _run_calculation_for(fingerprint))
+    except Exception as e: error_message = str(e)
+    _failed_refresh_fingerprint = fingerprint if error_message else None
+    if error_message: logging.error(f"Background refresh failed; still serving the previous result: {error_message}")
+    else: metrics.REGISTRY.inc("points_background_refreshes_total", "Results recomputed in the background after an input change.")
+
+def _start_background_refresh(force: bool = False, fingerprint: Optional[str] = None):
+    task = asyncio.ensure_future(_refresh_in_background(force, fingerprint))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+def _serveable_result(fingerprint: str) -> Optional[Dict[str, Any]]:
+    """The cached result if it is for these inputs, or (with the watcher running) any cached result while a
+    background refresh for the new inputs runs. None if the caller has to calculate."""
+    cache = _result_cache
+    if cache["fingerprint"] == fingerprint: return cache
+    if _data_watcher is None or cache["fingerprint"] is None: return None
+    # Inputs the watcher hasn't reported yet (or that changed in another way) are picked up here
+    if fingerprint not in _inflight_calculations and fingerprint != _failed_refresh_fingerprint: _start_background_refresh(fingerprint=fingerprint)
+    return cache
+
+async def get_player_points_result():
+    """Returns (result cache entry with "data" and its JSON "body", error_message) for the current inputs without
+    blocking the event loop.
+
+    Served from the result cache when the input fingerprint is unchanged (or, with the data watcher running,
+    while the changed inputs are recomputed in the background). Otherwise concurrent callers for the same
+    fingerprint share one in-flight calculation (single-flight), and at most MAX_CONCURRENT_CALCULATIONS
+    distinct calculations run at once.
+    """
+    fingerprint = await _get_inputs_fingerprint()
+    cache = _serveable_result(fingerprint)
+    metrics.record_cache("result", cache is not None and cache["fingerprint"] == fingerprint)
+    if cache is not None:
+        logging.info(f"Serving cached player points (fingerprint {cache['fingerprint'][:12]}).")
+        return cache, None
+    return await _single_flight(fingerprint, lambda: _run_calculation_for(fingerprint))
+
+async def get_player_points():
+    """Returns (data, error_message) for the current inputs; see get_player_points_result."""
+    result, error_message = await get_player_points_result()
+    return await asyncio.to_thread(_result_data, result), error_message
+
+# --- Change events (SSE) ---
+# Each stored result is diffed against the one it replaced; subscribers of /api/v1/events get the changed fixtures
+# and players instead of polling the full payload. Events are published on the event loop (results are stored from
+# pool threads), encoded once and fanned out to bounded per-subscriber queues.
+MAX_EVENT_SUBSCRIBERS = int(os.getenv("MAX_EVENT_SUBSCRIBERS", "1000"))
+_event_broker = events.EventBroker()
+_event_loop: Optional[asyncio.AbstractEventLoop] = None # Set in lifespan
+
+def _publish_result_diff(previous: Dict[str, Any], current: Dict[str, Any]):
+    diff = events.diff_digests(previous["digest"], current["digest"])
+    if _event_loop is None or not (diff["changed_fixture_ids"] or diff["players"]): return
+    payload = {"fingerprint": current["fingerprint"], "previous_fingerprint": previous["fingerprint"], "tolerance": events.POINTS_CHANGE_TOLERANCE, **diff}
+    _event_loop.call_soon_threadsafe(_event_broker.publish, "player_points_diff", payload)
+
+# --- Indexed queries (by fixture, GW, team, player) ---
+QUERY_INDEXES = ("fixture_id", "gw", "team_short_code", "player_id")
+
+def _build_result_indexes(data) -> Dict[str, Dict[str, list]]:
+    """Indexes the grouped result by fixture_id, GW, Team Short Code and player_id. Team/player entries are the
+    fixture dicts restricted to that team's/player's rows (player dicts are shared, not copied)."""
+    indexes = {index_name: {} for index_name in QUERY_INDEXES}
+    for match_info in data or []:
+        match_header = {key: value for key, value in match_info.items() if key != "players"}
+        indexes["fixture_id"].setdefault(str(match_info["fixture_id"]), []).append(match_info)
+        indexes["gw"].setdefault(str(match_info["GW"]), []).append(match_info)
+        players_by_team, players_by_id = {}, {}
+        for player in match_info["players"]:
+            players_by_team.setdefault(str(player["Team Short Code"]).upper(), []).append(player)
+            if player["player_id"] is not None: players_by_id.setdefault(str(player["player_id"]), []).append(player)
+        for short_code, team_players in players_by_team.items():
+            indexes["team_short_code"].setdefault(short_code, []).append(dict(match_header, players=team_players))
+        for player_id, player_rows in players_by_id.items():
+            indexes["player_id"].setdefault(player_id, []).append(dict(match_header, players=player_rows))
+    return indexes
+
+async def _run_slice_calculation(index_name: str, key: str):
+    async with _calculation_slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_calculation_executor, lambda: point_calculator.generate_player_points_slice(**{"gw" if index_name == "gw" else index_name: key}))
+
+async def query_player_points(index_name: str, key: str):
+    """Returns (matching fixture dicts, error_message) for one index key.
+
+    Served from indexes over the cached result (or a full calculation already in flight). Without either, only
+    the requested slice is calculated, not the whole tournament.
+    """
+    if index_name == "team_short_code": key = key.upper()
+    fingerprint = await _get_inputs_fingerprint()
+    cache = _serveable_result(fingerprint)
+    if cache is None and fingerprint in _inflight_calculations:
+        await asyncio.shield(_inflight_calculations[fingerprint])
+        cache = _serveable_result(fingerprint)
+    if cache is not None:
+        if cache["snapshot"] is not None: return await asyncio.to_thread(cache["snapshot"].query, index_name, key), None
+        return cache["indexes"][index_name].get(key, []), None
+    return await _single_flight(("slice", fingerprint, index_name, key), lambda: _run_slice_calculation(index_name, key))
+
+# --- Streaming (NDJSON, one fixture per line) ---
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def _json_default(value):
+    if hasattr(value, "item"): return value.item() # numpy scalars
+    return str(value)
+
+def _ndjson_line(match_info: Dict[str, Any]) -> bytes:
+    return (json.dumps(match_info, ensure_ascii=False, default=_json_default) + "\n").encode("utf-8")
+
+def _cached_ndjson_body(cache: Dict[str, Any]):
+    if cache["snapshot"] is not None: return (fixture_json + b"\n" for fixture_json in cache["snapshot"].iter_fixture_json())
+    return (_ndjson_line(match_info) for match_info in cache["data"])
+
+async def stream_player_points() -> StreamingResponse:
+    """NDJSON response with one fixture object per line.
+
+    Cached results are streamed directly. Otherwise the request starts (or joins) the single-flight calculation
+    for the current inputs, which caches its result like any other. A calculation started here also hands each
+    fixture's JSON to this response as soon as its group is finalized; the lines are queued on the event loop, so
+    a slow client never holds a pool thread.
+    """
+    fingerprint = await _get_inputs_fingerprint()
+    cache = _serveable_result(fingerprint)
+    metrics.record_cache("result", cache is not None and cache["fingerprint"] == fingerprint)
+    if cache is not None: return StreamingResponse(_cached_ndjson_body(cache), media_type=NDJSON_MEDIA_TYPE)
+
+    loop = asyncio.get_running_loop()
+    lines: asyncio.Queue = asyncio.Queue() # Fixture lines, then None once the calculation finished
+    def on_fixture_json(match_json: str): loop.call_soon_threadsafe(lines.put_nowait, match_json.encode("utf-8") + b"\n")
+    async def calculate_and_stream():
+        try: return await _run_calculation_for(fingerprint, on_fixture_json)
+        finally: lines.put_nowait(None)
+    if fingerprint in _inflight_calculations: lines.put_nowait(None) # Joined: nothing is streamed until it's cached
+    calculation = _single_flight(fingerprint, calculate_and_stream)
+
+    first_line = await lines.get()
+    if first_line is None: # Calculation joined, failed, or served from a snapshot/another run: answer from the cache
+        result, error_message = await calculation
+        if error_message: raise HTTPException(status_code=500, detail=error_message)
+        return StreamingResponse(_cached_ndjson_body(result), media_type=NDJSON_MEDIA_TYPE)
+
+    async def ndjson_body():
+        line = first_line
+        while line is not None:
+            yield line
+            line = await lines.get()
+        try: _, error_message = await calculation
+        except Exception as e: error_message = str(e)
+        if error_message: logging.error(f"Player points stream aborted: {error_message}")
+
+    return StreamingResponse(ndjson_body(), media_type=NDJSON_MEDIA_TYPE)
+
+async def _run_job(job: Dict[str, Any]):
+    job["status"], job["started_at"] = "running", time.time()
+    try:
+        job["data"], job["error"] = await get_player_points()
+        job["status"] = "failed" if job["error"] else "done"
+    except Exception as e:
+        logging.error(f"Job {job['job_id']} failed: {e}")
+        job["status"], job["error"] = "failed", str(e)
+    job["finished_at"] = time.time()
+
+def _prune_jobs():
+    """Drops the oldest finished jobs once more than MAX_STORED_JOBS are stored."""
+    for job_id in list(_jobs):
+        if len(_jobs) <= MAX_STORED_JOBS: break
+        if _jobs[job_id]["status"] in ("done", "failed"): del _jobs[job_id]
+
+def _job_status(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: job[key] for key in ("job_id", "status", "created_at", "started_at", "finished_at", "error")}
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Code to run on startup
@@ -28,9 +330,27 @@ async def lifespan(app: FastAPI):
                 logging.error(f"Could not create data directory {point_calculator.DATA_DIR}: {e}")
     else:
         logging.warning("point_calculator.DATA_DIR is not defined or is empty. Skipping data directory creation check.")
+
+    # Warm the result cache so the first request does not pay for a full calculation
+    try:
+        _, warm_error = await get_player_points_result()
+        if warm_error: logging.warning(f"Result cache warm-up finished with an error: {warm_error}")
+        else: logging.info("Result cache warmed.")
+    except Exception as e:
+        logging.error(f"Result cache warm-up failed: {e}")
+
+    # Recompute in the background as soon as an input file changes, instead of on the next request
+    global _data_watcher, _event_loop
+    _event_loop = asyncio.get_running_loop()
+    if watcher.DATA_WATCH_ENABLED:
+        _data_watcher = watcher.DataWatcher(lambda: _event_loop.call_soon_threadsafe(_start_background_refresh, True)).start()
     yield
     # Code to run on shutdown (if any)
     logging.info("Application shutdown...")
+    if _data_watcher is not None: _data_watcher.stop()
+    _data_watcher, _event_loop = None, None
+    _calculation_executor.shutdown(wait=False, cancel_futures=True)
+    point_calculator.shutdown_process_pools()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -41,25 +361,103 @@ app.add_middleware(
     allow_methods=["*"],  # Allow all HTTP methods
     allow_headers=["*"],  # Allow all headers
 )
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template (not the raw path) to keep label cardinality bounded
+    route = request.scope.get("route")
+    metrics.REGISTRY.observe("points_http_request_duration_seconds", "HTTP request latency (until the response starts) by route.",
+                             time.perf_counter() - start, {"method": request.method, "route": getattr(route, "path", "unmatched"), "status": str(response.status_code)})
+    return response
+
 @app.get('/')
 async def home():
     logging.info("Root path '/' accessed.")
     return {
         "message": "Welcome to the Fantasy Football Player Points API!",
         "endpoints": {
-            "calculate_points": "/api/v1/calculate_player_points"
+            "calculate_points": "/api/v1/calculate_player_points",
+            "start_job": "POST /api/v1/jobs",
+            "job_status": "/api/v1/jobs/{job_id}",
+            "job_result": "/api/v1/jobs/{job_id}/result",
+            "fixture": "/api/v1/fixtures/{fixture_id}",
+            "gameweek": "/api/v1/gw/{GW}",
+            "team": "/api/v1/teams/{short_code}",
+            "player": "/api/v1/players/{player_id}",
+            "scenarios": "/api/v1/scenarios (POST)",
+            "tournament_simulation": "/api/v1/simulations/tournament?n_simulations=100000&seed=0",
+            "events": "/api/v1/events (server-sent events: changed fixtures/players after each recalculation)",
+            "metrics": "/metrics",
+            "profiles": "/api/v1/profiles (with PROFILING_ENABLED=1; profile a run with ?profile=1 or X-Profile: 1)"
         },
-        "instructions": "Make a GET request to /api/v1/calculate_player_points to get the data. This may take a moment to process all matches."
+        "instructions": "Make a GET request to /api/v1/calculate_player_points to get the data. This may take a moment to process all matches. Add ?stream=true to receive one fixture per line (NDJSON) as each is ready."
     }
 
+async def _profile_player_points(response: Response):
+    """Forces a full (non-incremental) recalculation under cProfile, caches its result and stores the profile.
+    The profile id is returned in the X-Profile-Id header; see /api/v1/profiles/{profile_id}."""
+    if not profiling.PROFILING_ENABLED: raise HTTPException(status_code=403, detail="Profiling is disabled (set PROFILING_ENABLED=1).")
+    fingerprint = await _get_inputs_fingerprint()
+    async with _calculation_slots:
+        loop = asyncio.get_running_loop()
+        (data, body, error_message), summary = await loop.run_in_executor(
+            _calculation_executor, lambda: profiling.run_profiled("calculate_player_points", point_calculator.generate_all_player_points_data, with_json=True))
+    if not error_message:
+        await asyncio.to_thread(lambda: _store_result(fingerprint, data, body, encoded_bodies=point_calculator.compress_json_body(body)))
+    response.headers["X-Profile-Id"] = summary["profile_id"]
+    logging.info(f"Stored profile {summary['profile_id']} ({summary['wall_seconds']:.2f}s).")
+    return data, body, error_message
+
+# --- Conditional GET & content negotiation ---
+# The ETag is the digest of the served body (suffixed per content coding, as each coding is its own representation),
+# computed once when the result is stored, so an unchanged poll is answered 304 before anything is sent.
+CONTENT_CODING_PREFERENCE = ("br", "gzip") # Server preference among equally acceptable codings
+
+def _result_etag(body_hash: str, content_coding: Optional[str] = None) -> str:
+    return f'"{body_hash}-{content_coding}"' if content_coding else f'"{body_hash}"'
+
+def _etag_matches(if_none_match: Optional[str], body_hash: str) -> bool:
+    """If-None-Match (weak comparison) against any representation of this result."""
+    if not if_none_match: return False
+    representation_etags = {_result_etag(body_hash, content_coding) for content_coding in (None,) + CONTENT_CODING_PREFERENCE}
+    return any(tag == "*" or tag.removeprefix("W/") in representation_etags for tag in (part.strip() for part in if_none_match.split(",")))
+
+def _choose_content_coding(accept_encoding: Optional[str], available) -> Optional[str]:
+    """The acceptable coding (highest q, then CONTENT_CODING_PREFERENCE) among the available ones; None for identity."""
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        q_value = next((param[2:] for param in params if param.lower().startswith("q=")), "1")
+        try: accepted[coding.lower()] = float(q_value)
+        except ValueError: accepted[coding.lower()] = 0.0
+    candidates = [(accepted.get(coding, accepted.get("*", 0.0)), -rank, coding) for rank, coding in enumerate(CONTENT_CODING_PREFERENCE) if coding in available]
+    best = max(candidates, default=None)
+    return best[2] if best and best[0] > 0 else None
+
 @app.get('/api/v1/calculate_player_points')
-async def get_player_points_api():
+async def get_player_points_api(response: Response, stream: bool = False, profile: bool = False, x_profile: Optional[str] = Header(None),
+                                if_none_match: Optional[str] = Header(None), accept_encoding: Optional[str] = Header(None)):
     logging.info("Received request for /api/v1/calculate_player_points")
 
-    # Assuming point_calculator.generate_all_player_points_data() is synchronous.
-    # Ensure this function exists and works as expected in your point_calculator.py
+    # Served from the result cache; only recomputed when a data file or weight constant changed.
     try:
-        data, error_message = point_calculator.generate_all_player_points_data()
+        if profile or x_profile == "1":
+            data, body, error_message = await _profile_player_points(response) # Opt-in, never streamed
+            n_fixtures = len(data or [])
+        elif stream: return await stream_player_points() # Opt-in NDJSON, one fixture per line
+        else:
+            result, error_message = await get_player_points_result()
+            data, body, n_fixtures = result["data"], result["body"], result["n_fixtures"]
+            if result["snapshot"] is not None: response.headers["X-Snapshot-Generation"] = str(result["snapshot"].generation)
+            if not error_message and body is not None and n_fixtures:
+                content_coding = _choose_content_coding(accept_encoding, result["encoded_bodies"])
+                response.headers.update({"ETag": _result_etag(result["body_hash"], content_coding), "Vary": "Accept-Encoding", "Cache-Control": "no-cache"})
+                if _etag_matches(if_none_match, result["body_hash"]): return Response(status_code=304, headers=dict(response.headers))
+                if content_coding: body, response.headers["Content-Encoding"] = result["encoded_bodies"][content_coding], content_coding
+    except HTTPException:
+        raise
     except AttributeError:
         logging.error("The function 'generate_all_player_points_data' was not found in 'point_calculator' module.")
         raise HTTPException(status_code=500, detail="Server configuration error: Point calculation function missing.")
@@ -72,13 +470,149 @@ async def get_player_points_api():
         logging.error(f"Error during calculation: {error_message}")
         raise HTTPException(status_code=500, detail=error_message)
 
-    if not data and not error_message:
+    if not n_fixtures and not error_message:
         logging.warning("Calculation resulted in no data, but no explicit error message.")
         return {"message": "No player point data generated. Check server logs for warnings."}
 
-    logging.info(f"Successfully processed request. Returning data for {len(data) if data else 0} potential matches/items.")
-    
-    return data
+    logging.info(f"Successfully processed request. Returning data for {n_fixtures} potential matches/items.")
+    # Pre-encoded JSON, so FastAPI doesn't re-encode the whole result
+    return Response(content=body, media_type="application/json", headers=dict(response.headers)) if body is not None else data
+
+async def _query_or_404(index_name: str, key: str):
+    try:
+        matches, error_message = await query_player_points(index_name, key)
+    except Exception as e:
+        logging.error(f"An unexpected error occurred during {index_name} query '{key}': {e}")
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
+    if error_message: raise HTTPException(status_code=500, detail=error_message)
+    if not matches: raise HTTPException(status_code=404, detail=f"No player points found for {index_name} '{key}'.")
+    return matches
+
+def _matches_response(matches, first: bool = False):
+    """Snapshot queries return each match as JSON bytes sliced from the mapped payload; those are sent without re-encoding."""
+    if not isinstance(matches[0], bytes): return matches[0] if first else matches
+    return Response(content=matches[0] if first else b"[" + b",".join(matches) + b"]", media_type="application/json")
+
+@app.get('/api/v1/fixtures/{fixture_id}')
+async def get_fixture_player_points(fixture_id: str):
+    return _matches_response(await _query_or_404("fixture_id", fixture_id), first=True)
+
+@app.get('/api/v1/gw/{gw}')
+async def get_gameweek_player_points(gw: str):
+    return _matches_response(await _query_or_404("gw", gw))
+
+@app.get('/api/v1/teams/{short_code}')
+async def get_team_player_points(short_code: str):
+    return _matches_response(await _query_or_404("team_short_code", short_code))
+
+@app.get('/api/v1/players/{player_id}')
+async def get_player_player_points(player_id: str):
+    return _matches_response(await _query_or_404("player_id", player_id))
+
+@app.get('/api/v1/events')
+async def stream_player_points_events():
+    """Server-sent events. "hello" carries the fingerprint of the result currently served; each later
+    "player_points_diff" lists changed_fixture_ids and the players whose TotalPoints moved by more than the
+    tolerance. "resync" means events were dropped for this (slow) client: refetch the full result."""
+    if _event_broker.subscriber_count >= MAX_EVENT_SUBSCRIBERS: raise HTTPException(status_code=503, detail="Too many event subscribers.")
+    queue = _event_broker.subscribe()
+
+    async def event_stream():
+        try:
+            yield events.format_sse("hello", {"fingerprint": _result_cache["fingerprint"], "tolerance": events.POINTS_CHANGE_TOLERANCE})
+            while True:
+                try: yield await asyncio.wait_for(queue.get(), events.EVENT_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError: yield events.SSE_KEEPALIVE
+        finally:
+            _event_broker.unsubscribe(queue)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post('/api/v1/jobs', status_code=202)
+async def start_calculation_job():
+    """Queues a point calculation on the background pool and returns its job id immediately."""
+    job_id = uuid.uuid4().hex
+    job = {"job_id": job_id, "status": "queued", "created_at": time.time(), "started_at": None, "finished_at": None, "error": None, "data": None}
+    _jobs[job_id] = job
+    _prune_jobs()
+    job["task"] = asyncio.create_task(_run_job(job)) # Keep a reference so the task isn't garbage collected
+    logging.info(f"Queued calculation job {job_id}.")
+    return _job_status(job)
+
+@app.get('/api/v1/jobs/{job_id}')
+async def get_calculation_job(job_id: str):
+    job = _jobs.get(job_id)
+    if not job: raise HTTPException(status_code=404, detail=f"Unknown job id '{job_id}'.")
+    return _job_status(job)
+
+@app.get('/api/v1/jobs/{job_id}/result')
+async def get_calculation_job_result(job_id: str):
+    job = _jobs.get(job_id)
+    if not job: raise HTTPException(status_code=404, detail=f"Unknown job id '{job_id}'.")
+    if job["status"] == "failed": raise HTTPException(status_code=500, detail=job["error"])
+    if job["status"] != "done": raise HTTPException(status_code=409, detail=f"Job '{job_id}' is still {job['status']}.")
+    return job["data"]
+
+@app.post('/api/v1/scenarios')
+async def evaluate_what_if_scenarios(payload: Dict[str, Any] = Body(...)):
+    """Evaluates a batch of what-if scenarios ({"scenarios": [overrides, ...]}) in one pass.
+    See point_calculator.parse_scenarios for the accepted overrides."""
+    scenarios = payload.get("scenarios")
+    if isinstance(scenarios, list) and len(scenarios) > MAX_SCENARIOS_PER_REQUEST:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SCENARIOS_PER_REQUEST} scenarios per request.")
+    parsed_scenarios, error_message = point_calculator.parse_scenarios(scenarios)
+    if error_message: raise HTTPException(status_code=400, detail=error_message)
+    try:
+        async with _calculation_slots:
+            loop = asyncio.get_running_loop()
+            result, error_message = await loop.run_in_executor(_calculation_executor, point_calculator.evaluate_scenarios, parsed_scenarios)
+    except Exception as e:
+        logging.error(f"An unexpected error occurred during scenario evaluation: {e}")
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
+    if error_message: raise HTTPException(status_code=500, detail=error_message)
+    return result
+
+@app.get('/api/v1/simulations/tournament')
+async def get_tournament_simulation(n_simulations: int = 100_000, seed: Optional[int] = Query(None, ge=0)):
+    """Monte Carlo tournament simulation: per-team round probabilities and per-player expected points/matches
+    through the knockout rounds. Pass a seed for reproducible results."""
+    if not 1 <= n_simulations <= MAX_SIMULATIONS_PER_REQUEST:
+        raise HTTPException(status_code=400, detail=f"n_simulations must be between 1 and {MAX_SIMULATIONS_PER_REQUEST}.")
+    try:
+        async with _calculation_slots:
+            loop = asyncio.get_running_loop()
+            result, error_message = await loop.run_in_executor(_calculation_executor, point_calculator.simulate_tournament, n_simulations, seed)
+    except Exception as e:
+        logging.error(f"An unexpected error occurred during tournament simulation: {e}")
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
+    if error_message: raise HTTPException(status_code=500, detail=error_message)
+    return result
+
+@app.get('/metrics', response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus scrape endpoint: per-stage duration histograms, row counts, cache hits/misses and method/fallback counts."""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def _require_profiling():
+    if not profiling.PROFILING_ENABLED: raise HTTPException(status_code=403, detail="Profiling is disabled (set PROFILING_ENABLED=1).")
+
+@app.get('/api/v1/profiles')
+async def list_profiles():
+    _require_profiling()
+    summaries = [profiling.load_profile_summary(profile_id) for profile_id in reversed(profiling.list_profile_ids())]
+    return [{key: summary[key] for key in ("profile_id", "label", "started_at", "wall_seconds")} for summary in summaries if summary]
+
+@app.get('/api/v1/profiles/{profile_id}')
+async def get_profile(profile_id: str, raw: bool = False):
+    """Hottest functions of a stored profile; ?raw=true downloads the .prof file for pstats/snakeviz."""
+    _require_profiling()
+    if raw:
+        stats_fp = profiling.get_profile_stats_path(profile_id)
+        if not stats_fp: raise HTTPException(status_code=404, detail=f"Unknown profile id '{profile_id}'.")
+        return FileResponse(stats_fp, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+    summary = profiling.load_profile_summary(profile_id)
+    if not summary: raise HTTPException(status_code=404, detail=f"Unknown profile id '{profile_id}'.")
+    return summary
 
 # To run this application:
 # 1. Save it as app.py (or main.py, then adjust uvicorn command).
@@ -88,4 +622,8 @@ async def get_player_points_api():
 #    are in the same directory or accessible via Python's import path.
 #    And that 'point_calculator.py' has 'DATA_DIR' (if used) and 'generate_all_player_points_data'.
 # 4. Run from your terminal (ensure venv is active):
-#    uvicorn app:app --reload --host 0.0.0.0 --port 5001
\ No newline at end of file
+#    uvicorn app:app --reload --host 0.0.0.0 --port 5001
+# 5. With several workers (uvicorn app:app --workers 4 ...), set RESULT_SNAPSHOTS=1 so one worker builds the result
+#    and every worker serves it from the shared memory-mapped snapshot (see snapshots.py) instead of its own copy.
+# 6. Input files under data/ are watched (DATA_WATCH=0 disables it): after a change the previous result is served
+#    until the background recompute finishes, then swapped in.
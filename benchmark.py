@@ -0,0 +1,310 @@
+"""Synthetic-scale benchmarks for the point calculation pipeline.
+
+Generates fixtures, correct-score JSON, outright odds and a player workbook at each requested size, times every
+pipeline stage and writes a JSON report that can be compared across commits:
+
+    python benchmark.py --sizes 700x48,10000x2000 --output bench.json
+    python benchmark.py --sizes 700x48,10000x2000 --compare bench.json
+
+A size is PLAYERSxFIXTURES. Stage timings are the best of --repeat runs; peak memory comes from a separate
+tracemalloc pass (skipped with --no-memory) so tracing doesn't distort the timings. The report also has the cold
+start cost: import time of point_calculator and app in fresh interpreters (best of --startup-repeat).
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from scipy.stats import poisson
+
+with contextlib.redirect_stdout(sys.stderr): # Keep import-time log lines out of the JSON report on stdout
+    import point_calculator
+
+BENCHMARK_REPORT_VERSION = 1
+BENCHMARK_STAGES = ['fixture_build', 'outright_parse', 'fdr', 'player_ingest', 'player_ingest_cached', 'points_loop', 'bonus', 'grouping_serialization']
+DEFAULT_SIZES = '700x48,2500x200,10000x2000'
+PLAYERS_PER_TEAM = 26
+# Squad template: (Position as in the workbook, players per squad, mean season goals, mean season assists)
+SQUAD_TEMPLATE = [('Goalkeeper', 3, 0.0, 0.1), ('Centre-Back', 5, 0.8, 0.5), ('Left-Back', 2, 0.6, 2.0), ('Right-Back', 2, 0.6, 2.0),
+                  ('Defensive Midfield', 3, 1.0, 1.5), ('Central Midfield', 3, 2.0, 2.5), ('Attacking Midfield', 2, 4.0, 4.0),
+                  ('Left Winger', 2, 5.0, 4.0), ('Right Winger', 2, 5.0, 4.0), ('Centre-Forward', 2, 10.0, 3.0)]
+SYNTHETIC_STADIUMS = ["Hard Rock Stadium, Miami Gardens, FL", "MetLife Stadium, East Rutherford, NJ", "Lumen Field, Seattle, WA",
+                      "Rose Bowl Stadium, Pasadena, CA", "Mercedes-Benz Stadium, Atlanta, GA", "GEODIS Park, Nashville, TN"]
+CS_ODDS_SHARE = 0.5 # Fraction of synthetic fixtures that get correct-score odds (the rest use the Poisson fallback)
+CS_MAX_GOALS = 5
+STARTUP_MODULES = ('point_calculator', 'app')
+HEAVY_MODULES = ('numpy', 'pandas', 'scipy.stats', 'bs4') # Should stay unloaded until a calculation runs
+# Run in a fresh interpreter per measurement; prints one JSON line
+STARTUP_PROBE = """import contextlib, io, json, sys, time
+start = time.perf_counter()
+import {module}
+result = {{'import_seconds': time.perf_counter() - start, 'heavy_modules_loaded': sorted(m for m in {heavy_modules!r} if m in sys.modules)}}
+if {module!r} == 'point_calculator':
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()): point_calculator.get_fixture_id_gw_lookup()
+    result['first_fixture_lookup_seconds'] = time.perf_counter() - start
+print(json.dumps(result))
+"""
+
+def parse_sizes(sizes_arg):
+    sizes = []
+    for size in sizes_arg.split(','):
+        n_players, n_fixtures = (int(part) for part in size.lower().split('x'))
+        sizes.append((n_players, n_fixtures))
+    return sizes
+
+def generate_synthetic_dataset(n_players, n_fixtures, data_dir, seed=0):
+    """Writes synthetic inputs in the bundled file formats to data_dir. Returns the dataset description
+    (file paths, team mapping/details, raw fixtures and fixture_id/GW lookup) the stages run against."""
+    rng = np.random.default_rng(seed)
+    n_teams = max(2, -(-n_players // PLAYERS_PER_TEAM))
+    teams = [f"Synthetic Club {i:05d}" for i in range(n_teams)]
+    team_details = {team_c: {'short_code': f"S{i:05d}", 'api_id': 900000 + i, 'image': None} for i, team_c in enumerate(teams)}
+
+    # Fixtures: each matchday pairs every team at most once, so rest days and venues vary like a real schedule
+    fixtures_raw, fixture_id_gw_lookup, start_date = [], {}, datetime(2025, 6, 15)
+    matches_per_day = max(1, n_teams // 2)
+    for k in range(n_fixtures):
+        day, slot = divmod(k, matches_per_day)
+        if slot == 0: day_order = rng.permutation(n_teams)
+        home_c, away_c = teams[day_order[(2 * slot) % n_teams]], teams[day_order[(2 * slot + 1) % n_teams]]
+        date_s = (start_date + timedelta(days=int(day))).strftime('%Y-%m-%d')
+        fixtures_raw.append({'home_team': home_c, 'away_team': away_c, 'date': date_s, 'time': '08:00 PM',
+                             'stadium': SYNTHETIC_STADIUMS[k % len(SYNTHETIC_STADIUMS)], 'group': chr(ord('A') + k % 8)})
+        fixture_id_gw_lookup[(home_c, away_c, date_s)] = {'fixture_id': f"synthetic{k:08d}", 'GW': str(1 + 3 * k // n_fixtures)}
+
+    outright_odds = np.round(np.exp(rng.normal(3.5, 1.2, n_teams)) + 1.5, 2)
+    html_rows = ''.join(f'<div data-testid="outrights-table-row"><div data-testid="outrights-participant-name"><p>{team_c}</p></div>'
+                        f'<div data-testid="add-to-coupon-button"><p>{odds}</p></div></div>' for team_c, odds in zip(teams, outright_odds))
+    html_fp = os.path.join(data_dir, 'outright_odds.html')
+    with open(html_fp, 'w', encoding='utf-8') as f: f.write(f"<html><body>{html_rows}</body></html>")
+
+    goal_range = np.arange(CS_MAX_GOALS + 1)
+    cs_matches = []
+    for fixture in fixtures_raw:
+        if rng.random() >= CS_ODDS_SHARE: continue
+        grid = np.outer(poisson.pmf(goal_range, rng.uniform(0.5, 2.5)), poisson.pmf(goal_range, rng.uniform(0.5, 2.5)))
+        odds = np.round(1 / (grid / grid.sum() * 1.08), 1)
+        cs_matches.append({'match': f"{fixture['home_team']} vs {fixture['away_team']}", 'date': fixture['date'],
+                           'correct_score_odds': {f"{h}-{a}": float(max(1.01, odds[h, a])) for h in goal_range for a in goal_range}})
+    cs_json_fp = os.path.join(data_dir, 'correct_score.json')
+    with open(cs_json_fp, 'w', encoding='utf-8') as f: json.dump({'matches': cs_matches}, f)
+
+    player_rows = []
+    for i in range(n_players):
+        team_i, squad_i = divmod(i, PLAYERS_PER_TEAM)
+        team_i = min(team_i, n_teams - 1)
+        squad_slot = squad_i % sum(count for _, count, _, _ in SQUAD_TEMPLATE)
+        for position, count, mean_goals, mean_assists in SQUAD_TEMPLATE:
+            if squad_slot < count: break
+            squad_slot -= count
+        player_rows.append({
+            'Player Name': f"Synthetic Player {i:06d}", 'Team Name': teams[team_i], 'Team API ID': 900000 + team_i,
+            'Player API ID': 5000000 + i, 'Position': position, 'Goals': int(rng.poisson(mean_goals)), 'Assists': int(rng.poisson(mean_assists)),
+            'Team Short Code': team_details[teams[team_i]]['short_code'], 'player_id': f"{i:024x}", 'player_display_name': f"Player{i}",
+            'player_price': float(np.round(rng.uniform(4.0, 12.0), 1)), 'player_image': None,
+        })
+    player_stats_fp = os.path.join(data_dir, 'players.xlsx')
+    pd.DataFrame(player_rows).to_excel(player_stats_fp, sheet_name='Sheet1', index=False)
+
+    return {'n_players': n_players, 'n_fixtures': n_fixtures, 'n_teams': n_teams, 'n_cs_matches': len(cs_matches),
+            'team_mapping': {team_c: team_c for team_c in teams}, 'team_details': team_details, 'fixtures_raw': fixtures_raw,
+            'fixture_id_gw_lookup': fixture_id_gw_lookup, 'html_fp': html_fp, 'md_fp': os.path.join(data_dir, 'missing.md'),
+            'cs_json_fp': cs_json_fp, 'player_stats_fp': player_stats_fp, 'cache_dir': os.path.join(data_dir, 'cache')}
+
+@contextlib.contextmanager
+def synthetic_environment(dataset):
+    """Points the module-level team mapping/details and the player stats cache at the synthetic dataset."""
+    saved = {name: getattr(point_calculator, name) for name in ('TEAM_NAME_MAPPING', 'TEAM_DETAILS', 'PLAYER_STATS_CACHE_DIR')}
+    point_calculator.TEAM_NAME_MAPPING, point_calculator.TEAM_DETAILS = dataset['team_mapping'], dataset['team_details']
+    point_calculator.PLAYER_STATS_CACHE_DIR = dataset['cache_dir']
+    try: yield
+    finally:
+        for name, value in saved.items(): setattr(point_calculator, name, value)
+
+def run_pipeline_stages(dataset, on_stage, workers=1):
+    """Runs every stage once against the dataset. on_stage(name) returns a context manager wrapped around the stage;
+    returns {stage: items processed} for throughput."""
+    pc, items = point_calculator, {}
+    shutil.rmtree(dataset['cache_dir'], ignore_errors=True)
+    with synthetic_environment(dataset), contextlib.redirect_stdout(io.StringIO()):
+        with on_stage('fixture_build'):
+            all_base_fixtures = pc.create_base_fixtures_with_canonical_names(dataset['team_mapping'], dataset['fixture_id_gw_lookup'], dataset['fixtures_raw'])
+        items['fixture_build'] = len(all_base_fixtures)
+        with on_stage('outright_parse'):
+            df_outright_odds_data = pc.get_tournament_outright_odds_data(dataset['html_fp'], dataset['md_fp'], dataset['team_mapping'])
+        items['outright_parse'] = len(df_outright_odds_data)
+        with on_stage('fdr'):
+            all_involved_teams_canonical = set(t for fix in all_base_fixtures for t in (fix['home_team_canonical'], fix['away_team_canonical']))
+            team_strength_metrics = pc.normalize_tournament_implied_probs(df_outright_odds_data, all_involved_teams_canonical)
+            cs_odds_lookup = pc.load_correct_score_data_for_fdr(dataset['cs_json_fp'], dataset['team_mapping'])
+            fdr_final_df = pc.calculate_fdr_frame(all_base_fixtures, team_strength_metrics, cs_odds_lookup)
+        items['fdr'] = len(fdr_final_df)
+        with on_stage('player_ingest'):
+            player_df, _ = pc.load_player_stats(dataset['player_stats_fp'])
+        with on_stage('player_ingest_cached'):
+            player_df, _ = pc.load_player_stats(dataset['player_stats_fp'])
+        items['player_ingest'] = items['player_ingest_cached'] = len(player_df)
+        with on_stage('points_loop'):
+            team_goals_season_overall = player_df.groupby('Team_Canonical')['Goals'].sum().to_dict()
+            team_assists_season_overall = player_df.groupby('Team_Canonical')['Assists'].sum().to_dict()
+            players_by_team = {team_c: team_players for team_c, team_players in player_df.groupby('Team_Canonical', sort=False)}
+            players_by_team[None] = player_df.iloc[0:0]
+            fixture_player_rows = pc.calculate_player_rows_for_fixtures([fdr_match_row for _, fdr_match_row in fdr_final_df.iterrows()], players_by_team,
+                                                                        team_goals_season_overall, team_assists_season_overall, cs_odds_lookup,
+                                                                        pool_key=dataset['player_stats_fp'], workers=workers)
+            player_points_df = pd.DataFrame([row for fixture_rows in fixture_player_rows for row in fixture_rows])
+        items['points_loop'] = len(player_points_df)
+        with on_stage('bonus'):
+            pc.finalize_player_points(player_points_df, pc.get_bonus_group_columns(player_points_df))
+        items['bonus'] = len(player_points_df)
+        with on_stage('grouping_serialization'):
+            payload = pc.join_fixture_json(pc.group_player_points_by_fixture_json(player_points_df)[1]) # What the API sends
+        items['grouping_serialization'] = len(player_points_df)
+    items['payload_bytes'] = len(payload)
+    return items
+
+def benchmark_size(n_players, n_fixtures, repeat=1, measure_memory=True, workers=1, seed=0):
+    """Benchmarks one synthetic size. Returns its report entry."""
+    data_dir = tempfile.mkdtemp(prefix='points-bench-')
+    try:
+        generation_start = time.perf_counter()
+        dataset = generate_synthetic_dataset(n_players, n_fixtures, data_dir, seed)
+        generation_seconds = time.perf_counter() - generation_start
+
+        best_seconds = {}
+        @contextlib.contextmanager
+        def timed_stage(name):
+            stage_start = time.perf_counter()
+            yield
+            elapsed = time.perf_counter() - stage_start
+            best_seconds[name] = min(best_seconds.get(name, elapsed), elapsed)
+        for _ in range(max(1, repeat)): items = run_pipeline_stages(dataset, timed_stage, workers)
+
+        peak_bytes = {}
+        @contextlib.contextmanager
+        def traced_stage(name):
+            tracemalloc.reset_peak()
+            stage_start_bytes = tracemalloc.get_traced_memory()[0]
+            yield
+            peak_bytes[name] = tracemalloc.get_traced_memory()[1] - stage_start_bytes
+        if measure_memory:
+            tracemalloc.start()
+            try: run_pipeline_stages(dataset, traced_stage, workers)
+            finally: tracemalloc.stop()
+
+        stages = {}
+        for name in BENCHMARK_STAGES:
+            seconds = best_seconds[name]
+            stages[name] = {'seconds': round(seconds, 6), 'items': items[name], 'items_per_second': round(items[name] / seconds, 1) if seconds > 0 else None,
+                            'peak_traced_mb': round(peak_bytes[name] / 2**20, 3) if name in peak_bytes else None}
+        return {'label': f"{n_players}x{n_fixtures}", 'players': n_players, 'fixtures': n_fixtures, 'teams': dataset['n_teams'],
+                'cs_matches': dataset['n_cs_matches'], 'player_rows': items['points_loop'], 'payload_bytes': items['payload_bytes'],
+                'generation_seconds': round(generation_seconds, 3), 'total_seconds': round(sum(best_seconds[name] for name in BENCHMARK_STAGES), 6),
+                'stages': stages}
+    finally: shutil.rmtree(data_dir, ignore_errors=True)
+
+def scaling_exponents(results):
+    """Per-stage log-log slope of seconds vs player rows between consecutive sizes (1.0 = linear)."""
+    curves = {}
+    for smaller, larger in zip(results, results[1:]):
+        rows_ratio = larger['player_rows'] / smaller['player_rows'] if smaller['player_rows'] else 0
+        for name in BENCHMARK_STAGES:
+            t_small, t_large = smaller['stages'][name]['seconds'], larger['stages'][name]['seconds']
+            slope = float(np.log(t_large / t_small) / np.log(rows_ratio)) if rows_ratio > 1 and t_small > 0 and t_large > 0 else None
+            curves.setdefault(name, []).append({'from': smaller['label'], 'to': larger['label'], 'exponent': None if slope is None else round(slope, 3)})
+    return curves
+
+def measure_startup(repeat=3):
+    """Cold-start cost per STARTUP_MODULES module: best import time over `repeat` fresh interpreters (after one
+    untimed run that warms the bytecode cache), the heavy modules the import pulled in, and for point_calculator
+    the first fixture lookup build."""
+    startup = {}
+    for module in STARTUP_MODULES:
+        probe = STARTUP_PROBE.format(module=module, heavy_modules=HEAVY_MODULES)
+        runs = []
+        for run in range(repeat + 1):
+            completed = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+            if completed.returncode != 0:
+                print(f"Warning: startup probe for {module} failed: {completed.stderr.strip().splitlines()[-1:]}", file=sys.stderr)
+                break
+            if run: runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+        if not runs: continue
+        best = min(runs, key=lambda result: result['import_seconds'])
+        startup[module] = {key: round(value, 6) if isinstance(value, float) else value for key, value in best.items()}
+        if 'first_fixture_lookup_seconds' in best: startup[module]['first_fixture_lookup_seconds'] = round(min(r['first_fixture_lookup_seconds'] for r in runs), 6)
+    return startup
+
+def get_environment_info():
+    try: commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError: commit = None
+    return {'commit': commit, 'timestamp': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+            'numpy': np.__version__, 'pandas': pd.__version__, 'platform': platform.platform(), 'cpu_count': os.cpu_count()}
+
+def print_report(report, baseline=None, file=sys.stdout):
+    baseline_by_label = {entry['label']: entry for entry in (baseline or {}).get('results', [])}
+    for entry in report['results']:
+        print(f"\n== {entry['label']} ({entry['teams']} teams, {entry['player_rows']} player rows, {entry['payload_bytes'] / 2**20:.1f} MB JSON) ==", file=file)
+        base_entry = baseline_by_label.get(entry['label'])
+        for name in BENCHMARK_STAGES:
+            stage = entry['stages'][name]
+            line = f"  {name:<24}{stage['seconds']:>10.4f}s {stage['items_per_second'] or 0:>14,.0f}/s"
+            if stage['peak_traced_mb'] is not None: line += f" {stage['peak_traced_mb']:>10.1f} MB"
+            if base_entry and base_entry['stages'][name]['seconds'] > 0: line += f"  x{stage['seconds'] / base_entry['stages'][name]['seconds']:.2f} vs baseline"
+            print(line, file=file)
+        print(f"  {'total':<24}{entry['total_seconds']:>10.4f}s", file=file)
+    if report.get('startup'):
+        print("\n== startup (fresh interpreter) ==", file=file)
+        for module, startup in report['startup'].items():
+            line = f"  import {module:<17}{startup['import_seconds']:>10.4f}s  loaded: {', '.join(startup['heavy_modules_loaded']) or '-'}"
+            base_startup = (baseline or {}).get('startup', {}).get(module)
+            if base_startup and base_startup['import_seconds'] > 0: line += f"  x{startup['import_seconds'] / base_startup['import_seconds']:.2f} vs baseline"
+            print(line, file=file)
+            if 'first_fixture_lookup_seconds' in startup: print(f"  {'first fixture lookup':<24}{startup['first_fixture_lookup_seconds']:>10.4f}s", file=file)
+    print(f"\nPeak RSS: {report['peak_rss_mb']:.0f} MB", file=file)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f"Comma-separated PLAYERSxFIXTURES sizes (default {DEFAULT_SIZES}).")
+    parser.add_argument('--repeat', type=int, default=1, help="Timing runs per size; the best run is reported.")
+    parser.add_argument('--workers', type=int, default=1, help="Processes for the points loop (see FIXTURE_WORKERS).")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc pass.")
+    parser.add_argument('--output', help="Write the JSON report to this file (default: stdout).")
+    parser.add_argument('--compare', help="Baseline JSON report to compare stage timings against.")
+    parser.add_argument('--startup-repeat', type=int, default=3, help="Fresh interpreters per startup measurement; 0 skips it.")
+    args = parser.parse_args(argv)
+
+    results = []
+    for n_players, n_fixtures in parse_sizes(args.sizes):
+        print(f"Benchmarking {n_players} players x {n_fixtures} fixtures...", file=sys.stderr)
+        results.append(benchmark_size(n_players, n_fixtures, args.repeat, not args.no_memory, args.workers, args.seed))
+    point_calculator.shutdown_process_pools()
+    startup = measure_startup(args.startup_repeat) if args.startup_repeat > 0 else {}
+    report = {'version': BENCHMARK_REPORT_VERSION, 'environment': get_environment_info(), 'results': results, 'startup': startup,
+              'scaling': scaling_exponents(results), 'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f: baseline = json.load(f)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f: json.dump(report, f, indent=2)
+        print_report(report, baseline)
+    else:
+        if baseline: print_report(report, baseline, file=sys.stderr)
+        print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# events.py
+# Diffs between successive player-points results, pushed to subscribers as server-sent events (SSE).
+import asyncio
+import json
+import math
+import os
+
+import metrics
+import point_calculator
+
+POINTS_CHANGE_TOLERANCE = float(os.getenv("POINTS_CHANGE_TOLERANCE", "0.01")) # Players are listed when TotalPoints moves by more than this
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "16")) # Pending events per subscriber before it is told to resync
+EVENT_KEEPALIVE_SECONDS = 15.0
+SSE_KEEPALIVE = b": keepalive\n\n" # Comment line; keeps proxies from closing idle streams
+
+# --- Result digests & diffs ---
+# A digest is {"fixtures": {fixture_id: hash of the fixture's JSON}, "points": {(fixture_id, player key): TotalPoints}},
+# small enough to keep next to each cached result so the next one can be diffed without the previous data.
+# Content hashes use hash(), so digests are only comparable within one process (each worker diffs its own results).
+def get_player_key(player):
+    """Identifies a player within a fixture: player_id, else Player API ID, else Player Name."""
+    return str(next((player[col] for col in ('player_id', 'Player API ID', 'Player Name') if player[col] is not None), None))
+
+def iter_data_digest_items(grouped_data):
+    """(fixture_id, fixture JSON bytes, [(player key, TotalPoints)]) per fixture of a grouped result. The JSON is the
+    fixture's fragment of the served body, the same bytes snapshots.Snapshot.iter_digest_items yields."""
+    for match_info in grouped_data or []:
+        head, players_json = point_calculator.encode_fixture_json_parts(match_info)
+        fixture_json = (head + ','.join(players_json) + ']}').encode('utf-8')
+        yield str(match_info['fixture_id']), fixture_json, [(get_player_key(player), player['TotalPoints']) for player in match_info['players']]
+
+def result_digest(digest_items):
+    """Digest of (fixture_id, fixture JSON bytes, [(player key, TotalPoints)]) items; see iter_data_digest_items
+    and snapshots.Snapshot.iter_digest_items. Both hash the same encoding, so in-memory and snapshot results diff cleanly."""
+    digest = {"fixtures": {}, "points": {}}
+    for fixture_id, fixture_content, player_points in digest_items:
+        digest["fixtures"][fixture_id] = hash(fixture_content)
+        for key, total_points in player_points:
+            digest["points"][(fixture_id, key)] = None if total_points is None or (isinstance(total_points, float) and math.isnan(total_points)) else total_points
+    return digest
+
+def _points_moved(previous, current, tolerance):
+    if previous is None or current is None: return previous is not current
+    return abs(current - previous) > tolerance
+
+def diff_digests(previous, current, tolerance=POINTS_CHANGE_TOLERANCE):
+    """Fixtures whose content changed (including added/removed ones) and players whose TotalPoints moved by more than
+    tolerance (None on the side where the player is missing), in result order."""
+    changed_fixture_ids = [fixture_id for fixture_id, fixture_hash in current["fixtures"].items() if previous["fixtures"].get(fixture_id) != fixture_hash]
+    changed_fixture_ids += [fixture_id for fixture_id in previous["fixtures"] if fixture_id not in current["fixtures"]]
+    players = []
+    for points_key in list(current["points"]) + [points_key for points_key in previous["points"] if points_key not in current["points"]]:
+        old_points, new_points = previous["points"].get(points_key), current["points"].get(points_key)
+        if (points_key in previous["points"]) != (points_key in current["points"]) or _points_moved(old_points, new_points, tolerance):
+            players.append({"fixture_id": points_key[0], "player_id": points_key[1], "TotalPoints": new_points, "previous_TotalPoints": old_points})
+    return {"changed_fixture_ids": changed_fixture_ids, "players": players}
+
+# --- Server-sent events fan-out ---
+def format_sse(event_name, payload, event_id=None):
+    """One SSE message (bytes), JSON-encoded once and shared by every subscriber."""
+    data = json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=str)
+    return (f"id: {event_id}\n" if event_id is not None else "").encode('utf-8') + f"event: {event_name}\ndata: {data}\n\n".encode('utf-8')
+
+class EventBroker:
+    """Fans events out to per-subscriber bounded queues. Use from the event loop only (publish from other threads
+    via loop.call_soon_threadsafe). A subscriber whose queue is full loses its backlog and gets one "resync" event
+    instead, telling it to refetch the full result."""
+
+    def __init__(self, queue_size=EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.last_event_id = 0
+        self._subscribers = set()
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, event_name, payload):
+        self.last_event_id += 1
+        message = format_sse(event_name, payload, self.last_event_id)
+        metrics.REGISTRY.inc('points_events_published_total', 'Server-sent events published, by event.', {'event': event_name})
+        for queue in self._subscribers:
+            try: queue.put_nowait(message)
+            except asyncio.QueueFull:
+                while not queue.empty(): queue.get_nowait()
+                queue.put_nowait(format_sse("resync", {"reason": "subscriber fell behind; refetch the full result"}, self.last_event_id))
+                metrics.REGISTRY.inc('points_event_resyncs_total', 'Subscribers whose event backlog was dropped for a resync event.')
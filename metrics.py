@@ -0,0 +1,89 @@
+# metrics.py
+# Minimal in-process metrics (counters and histograms) rendered in the Prometheus text exposition format.
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+METRIC_PREFIX = 'points_'
+STAGE_DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class MetricsRegistry:
+    """Thread-safe store of labelled counters and histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Dict] = {} # Key: metric name, Value: {'type', 'help', 'buckets', 'series': {labels: value}}
+
+    def _get_series(self, name, metric_type, help_text, labels, buckets=None):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = {'type': metric_type, 'help': help_text, 'buckets': buckets, 'series': {}}
+        label_key = tuple(sorted((labels or {}).items()))
+        if label_key not in metric['series']:
+            metric['series'][label_key] = [0] * (len(buckets) + 1) + [0.0, 0] if metric_type == 'histogram' else 0
+        return metric, label_key
+
+    def inc(self, name, help_text, labels=None, amount=1):
+        with self._lock:
+            metric, label_key = self._get_series(name, 'counter', help_text, labels)
+            metric['series'][label_key] += amount
+
+    def observe(self, name, help_text, value, labels=None, buckets=STAGE_DURATION_BUCKETS):
+        """Records one histogram observation. Series layout: per-bucket counts (+Inf last), then sum, then count."""
+        with self._lock:
+            metric, label_key = self._get_series(name, 'histogram', help_text, labels, buckets)
+            series = metric['series'][label_key]
+            bucket_i = next((i for i, upper in enumerate(metric['buckets']) if value <= upper), len(metric['buckets']))
+            series[bucket_i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> str:
+        """Prometheus text format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for name, metric in sorted(self._metrics.items()):
+                lines.append(f"# HELP {name} {metric['help']}")
+                lines.append(f"# TYPE {name} {metric['type']}")
+                for label_key, value in sorted(metric['series'].items()):
+                    if metric['type'] == 'counter':
+                        lines.append(f"{name}{_format_labels(label_key)} {_format_value(value)}")
+                        continue
+                    cumulative = 0
+                    for upper, bucket_count in zip(list(metric['buckets']) + [math.inf], value[:-2]):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{_format_labels(label_key + (('le', '+Inf' if upper == math.inf else repr(float(upper))),))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(label_key)} {_format_value(value[-2])}")
+                    lines.append(f"{name}_count{_format_labels(label_key)} {value[-1]}")
+        return '\n'.join(lines) + '\n'
+
+def _format_labels(label_key: Tuple) -> str:
+    if not label_key: return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in label_key)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(label_key, escaped)) + '}'
+
+def _format_value(value) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+REGISTRY = MetricsRegistry()
+
+# --- Pipeline helpers used by point_calculator/app ---
+@contextmanager
+def stage_timer(stage):
+    """Times a pipeline stage into points_stage_duration_seconds{stage=...} (also when the stage raises)."""
+    start = time.perf_counter()
+    try: yield
+    finally: REGISTRY.observe(f'{METRIC_PREFIX}stage_duration_seconds', 'Duration of each calculation pipeline stage.', time.perf_counter() - start, {'stage': stage})
+
+def record_rows(stage, row_count):
+    REGISTRY.inc(f'{METRIC_PREFIX}stage_rows_total', 'Rows (fixtures, players or player-fixture rows) produced by each stage.', {'stage': stage}, row_count)
+
+def record_cache(cache, hit):
+    REGISTRY.inc(f'{METRIC_PREFIX}cache_requests_total', 'Cache lookups by cache and result.', {'cache': cache, 'result': 'hit' if hit else 'miss'})
+
+def record_method(kind, method, count=1):
+    """Counts calculation methods per fixture, e.g. kind='points' method='Poisson_Fallback_InvalidCS'."""
+    REGISTRY.inc(f'{METRIC_PREFIX}calculation_method_total', 'Fixtures by calculation method (points: CS_Odds/Poisson/fallbacks, fdr: Combined/Outright).',
+                 {'kind': kind, 'method': method}, count)
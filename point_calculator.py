@@ -1,15 +1,36 @@
-import pandas as pd
-import numpy as np
 import json
-from bs4 import BeautifulSoup
 import re
 from datetime import datetime, timedelta
-from scipy.stats import poisson
+import importlib
 import sys
 import os
 import io # Added for parsing fixture string
 import csv # Added for parsing fixture string
+import hashlib
+import gzip
+import math
+import secrets
+import functools
+import shutil
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import Dict, List, Any, FrozenSet, Tuple # Added for type hinting
+import metrics
+
+# --- Lazy imports (numpy, pandas, scipy.stats and bs4 are only loaded when a calculation first needs them) ---
+class _LazyModule:
+    """Stand-in for a module that imports it on first attribute access."""
+    def __init__(self, module_name):
+        self._module_name, self._module = module_name, None
+
+    def __getattr__(self, attr):
+        if self._module is None: self._module = importlib.import_module(self._module_name) # The import system serializes concurrent first imports
+        return getattr(self._module, attr)
+
+pd = _LazyModule('pandas')
+np = _LazyModule('numpy')
 
 # --- Configuration & Constants ---
 DATA_DIR = 'data'
@@ -17,6 +38,11 @@ HTML_ODDS_FP = os.path.join(DATA_DIR, 'fifa_club_wc_odds.html')
 MD_ODDS_FP = os.path.join(DATA_DIR, 'fifa_club_wc_odds.md')
 CS_JSON_FP = os.path.join(DATA_DIR, 'correct_score.json')
 PLAYER_STATS_FP = os.path.join(DATA_DIR, 'merged_mapped_players.xlsx')
+CACHE_DIR = '.cache' # Derived artifacts (kept outside DATA_DIR so they don't change the input fingerprint)
+PLAYER_STATS_CACHE_DIR = os.path.join(CACHE_DIR, 'player_stats')
+PLAYER_STATS_CACHE_VERSION = 1 # Bump when _load_player_stats_from_excel's cleaning changes, so cached tables are rebuilt
+FIXTURE_WORKERS = int(os.environ.get('FIXTURE_WORKERS', '1')) # Processes for per-fixture player points; 0/1 = serial
+FIXTURE_BATCHES_PER_WORKER = 4 # Several batches per worker evens out uneven fixture sizes
 
 # FDR Calculation Weights
 OUTRIGHT_COMPONENT_WEIGHTS = {
@@ -31,7 +57,14 @@ FINAL_FDR_WEIGHTS = {
 
 # Player Points Calculation
 AVERAGE_TOTAL_GOALS_IN_MATCH = 2.7
-MAX_POISSON_GOALS = 7
+MAX_POISSON_GOALS = int(os.environ.get('MAX_POISSON_GOALS', '7')) # Poisson score grids cover 0..MAX_POISSON_GOALS goals per side
+POISSON_TAIL_MODE = os.environ.get('POISSON_TAIL_MODE', 'renormalize') # Mass beyond MAX_POISSON_GOALS: 'renormalize' spreads it over the grid, 'lump' adds it to the last goal count
+POISSON_XG_DECIMALS = 9 # xG rounding for the score grid memo key (absorbs float noise only)
+POISSON_GRID_MEMO_SIZE = 4096
+
+# Fantasy scoring per position (goal points and clean-sheet bonus)
+POSITION_GOAL_POINTS = {'Goalkeeper': 10, 'Defender': 6, 'Midfielder': 5, 'Forward': 4}
+POSITION_CLEAN_SHEET_POINTS = {'Goalkeeper': 4.0, 'Defender': 4.0, 'Midfielder': 1.0}
 
 # --- Team Name Mapping (Ensure this is comprehensive) ---
 TEAM_NAME_MAPPING = {
@@ -136,7 +169,9 @@ TIER_DISPLAY_MAPPING = {
 }
 
 # --- Fixture ID and GW Data Handling (from clean_sheet_calculator.py approach) ---
-FIXTURE_ID_GW_LOOKUP: Dict[Tuple[str, str, str], Dict[str, str]] = {} # Key: (canonical_home, canonical_away, date_str YYYY-MM-DD), Value: {"fixture_id": ..., "GW": ...}
+# FIXTURE_ID_GW_LOOKUP: Dict[Tuple[str, str, str], Dict[str, str]], Key: (canonical_home, canonical_away, date_str YYYY-MM-DD), Value: {"fixture_id": ..., "GW": ...}
+# Not built at import: get_fixture_id_gw_lookup() (or the first point_calculator.FIXTURE_ID_GW_LOOKUP access) populates it.
+_FIXTURE_ID_GW_LOOKUP_LOCK = threading.Lock()
 
 # Raw fixture data string (tab-separated) - same as in clean_sheet_calculator.py
 # This is the authoritative source for fixture_id and GW
@@ -192,87 +227,113 @@ FULL_FIXTURE_DATA_RAW = """fixture_id	stage_name	starting_at	home_team_name	away
 
 # --- Helper Functions ---
 
-def get_canonical_team_name_robust(name_from_source: str, mapping: Dict[str, str]) -> str:
-    """Gets the canonical team name using the provided mapping. Enhanced for robustness."""
-    name_from_source_stripped = name_from_source.strip()
-    if not name_from_source_stripped:
-        return "N/A_EmptyName"
-
-    # Direct match
-    if name_from_source_stripped in mapping:
-        return mapping[name_from_source_stripped]
-    if name_from_source in mapping: # try original if stripped didn't match
-        return mapping[name_from_source]
-
-    # Check if it's already a canonical name (value in mapping)
-    if name_from_source_stripped in mapping.values():
-        return name_from_source_stripped
-    if name_from_source in mapping.values():
-        return name_from_source
-
-    # Case-insensitive match
-    name_lower = name_from_source_stripped.lower()
-    for map_key, canonical_val in mapping.items():
-        if name_lower == map_key.lower():
-            return canonical_val
-
-    # Normalized comparison (remove common suffixes and punctuation)
-    suffixes_to_remove = [" fc", " cf", " rj", " fr", " hd", " sc", " ac", " c.f.", " c. f.", " c f", " de ", " e "] # Note leading space
-    punctuation_to_remove = ".()-&" # Added hyphen and ampersand
-
-    temp_name_norm = name_lower
-    for suffix in suffixes_to_remove:
-        temp_name_norm = temp_name_norm.replace(suffix, "")
-    for punc in punctuation_to_remove:
-        temp_name_norm = temp_name_norm.replace(punc, "")
-    temp_name_norm = temp_name_norm.strip().replace(" ", "") # Also remove internal spaces for comparison
-
-    for map_key, canonical_val in mapping.items():
-        map_key_norm = map_key.lower()
-        for suffix in suffixes_to_remove:
-            map_key_norm = map_key_norm.replace(suffix, "")
-        for punc in punctuation_to_remove:
-            map_key_norm = map_key_norm.replace(punc, "")
-        map_key_norm = map_key_norm.strip().replace(" ", "")
-
-        if temp_name_norm == map_key_norm:
-            return canonical_val
-
-        # Also check against normalized canonical value
-        canonical_val_norm = canonical_val.lower()
-        for suffix in suffixes_to_remove:
-            canonical_val_norm = canonical_val_norm.replace(suffix, "")
-        for punc in punctuation_to_remove:
-            canonical_val_norm = canonical_val_norm.replace(punc, "")
-        canonical_val_norm = canonical_val_norm.strip().replace(" ", "")
-        if temp_name_norm == canonical_val_norm:
-            return canonical_val
-
-    # Fallback: if user provided TEAM_DETAILS and name_from_source matches a key there
-    if name_from_source_stripped in TEAM_DETAILS:
-        # This implies name_from_source_stripped is already canonical if it's a key in TEAM_DETAILS
-        # Let's ensure it's also in TEAM_NAME_MAPPING pointing to itself
-        if name_from_source_stripped not in mapping or mapping[name_from_source_stripped] != name_from_source_stripped:
-             print(f"Warning: Team name '{name_from_source_stripped}' is a TEAM_DETAILS key but missing self-map in TEAM_NAME_MAPPING. Adding.")
-             mapping[name_from_source_stripped] = name_from_source_stripped # Auto-correct mapping
+TEAM_NAME_SUFFIXES_TO_REMOVE = [" fc", " cf", " rj", " fr", " hd", " sc", " ac", " c.f.", " c. f.", " c f", " de ", " e "] # Note leading space
+TEAM_NAME_PUNCTUATION_TO_REMOVE = ".()-&" # Added hyphen and ampersand
+
+def _normalize_team_name_for_match(name_lower: str) -> str:
+    """Normalized comparison form of a lowercased team name (common suffixes, punctuation and spaces removed)."""
+    for suffix in TEAM_NAME_SUFFIXES_TO_REMOVE:
+        name_lower = name_lower.replace(suffix, "")
+    for punc in TEAM_NAME_PUNCTUATION_TO_REMOVE:
+        name_lower = name_lower.replace(punc, "")
+    return name_lower.strip().replace(" ", "") # Also remove internal spaces for comparison
+
+class TeamNameResolver:
+    """Precompiled hash indexes over a team name mapping: exact keys, canonical values, lowercased keys and
+    normalized keys/values. Built once and rebuilt automatically if the mapping grows. Results of the
+    case-insensitive/normalized/unmapped fallback paths are memoized, so each unknown name is only warned about once.
+    """
+    def __init__(self, mapping: Dict[str, str], team_details: Dict[str, Dict[str, Any]]):
+        self.mapping, self.team_details = mapping, team_details
+        self._build_indexes()
+
+    def _build_indexes(self):
+        """Builds the indexes from a copy of the mapping and publishes them in one assignment, so a concurrent
+        resolve() sees either the old or the new set (never a partly rebuilt one tagged with the new size)."""
+        mapping_items = list(self.mapping.items())
+        lower_index: Dict[str, str] = {}
+        normalized_index: Dict[str, str] = {}
+        # setdefault keeps the first match in mapping order, like the original linear scans
+        for map_key, canonical_val in mapping_items:
+            lower_index.setdefault(map_key.lower(), canonical_val)
+            normalized_index.setdefault(_normalize_team_name_for_match(map_key.lower()), canonical_val)
+            normalized_index.setdefault(_normalize_team_name_for_match(canonical_val.lower()), canonical_val)
+        # (mapping size, canonical values, lowercased index, normalized index, fallback memo)
+        self._indexes = (len(mapping_items), {canonical_val for _, canonical_val in mapping_items}, lower_index, normalized_index, {})
+
+    def resolve(self, name_from_source: str) -> str:
+        if len(self.mapping) != self._indexes[0]: self._build_indexes()
+        _, canonical_values, lower_index, normalized_index, fallback_memo = self._indexes
+        name_from_source_stripped = name_from_source.strip()
+        if not name_from_source_stripped:
+            return "N/A_EmptyName"
+
+        # Direct match
+        if name_from_source_stripped in self.mapping:
+            return self.mapping[name_from_source_stripped]
+        if name_from_source in self.mapping: # try original if stripped didn't match
+            return self.mapping[name_from_source]
+
+        # Check if it's already a canonical name (value in mapping)
+        if name_from_source_stripped in canonical_values:
+            return name_from_source_stripped
+        if name_from_source in canonical_values:
+            return name_from_source
+
+        if name_from_source_stripped in fallback_memo:
+            return fallback_memo[name_from_source_stripped]
+
+        # Case-insensitive match, then normalized comparison (remove common suffixes and punctuation)
+        name_lower = name_from_source_stripped.lower()
+        temp_name_norm = _normalize_team_name_for_match(name_lower)
+        resolved = lower_index.get(name_lower) or normalized_index.get(temp_name_norm)
+        if resolved is not None:
+            fallback_memo[name_from_source_stripped] = resolved
+            return resolved
+
+        # Fallback: if user provided TEAM_DETAILS and name_from_source matches a key there
+        if name_from_source_stripped in self.team_details:
+            # This implies name_from_source_stripped is already canonical if it's a key in TEAM_DETAILS
+            # Let's ensure it's also in TEAM_NAME_MAPPING pointing to itself
+            if name_from_source_stripped not in self.mapping or self.mapping[name_from_source_stripped] != name_from_source_stripped:
+                 print(f"Warning: Team name '{name_from_source_stripped}' is a TEAM_DETAILS key but missing self-map in TEAM_NAME_MAPPING. Adding.")
+                 self.mapping[name_from_source_stripped] = name_from_source_stripped # Auto-correct mapping
+            return name_from_source_stripped
+
+        print(f"Warning (Canonical Name): Team name '{name_from_source}' (normalized: '{temp_name_norm}') not reliably mapped, using '{name_from_source_stripped}'.")
+        fallback_memo[name_from_source_stripped] = name_from_source_stripped
         return name_from_source_stripped
 
+_TEAM_NAME_RESOLVERS: Dict[int, TeamNameResolver] = {} # Key: id(mapping)
 
-    print(f"Warning (Canonical Name): Team name '{name_from_source}' (normalized: '{temp_name_norm}') not reliably mapped, using '{name_from_source_stripped}'.")
-    return name_from_source_stripped
+def get_team_name_resolver(mapping: Dict[str, str]) -> TeamNameResolver:
+    """Returns the (cached) resolver for a mapping dict."""
+    resolver = _TEAM_NAME_RESOLVERS.get(id(mapping))
+    if resolver is None or resolver.mapping is not mapping:
+        resolver = TeamNameResolver(mapping, TEAM_DETAILS)
+        _TEAM_NAME_RESOLVERS[id(mapping)] = resolver
+    return resolver
+
+def get_canonical_team_name_robust(name_from_source: str, mapping: Dict[str, str]) -> str:
+    """Gets the canonical team name using the provided mapping. Enhanced for robustness."""
+    return get_team_name_resolver(mapping).resolve(name_from_source)
 
 
 def _populate_fixture_id_gw_lookup(raw_data_string: str, team_mapping: Dict[str, str]):
     """Parses raw tab-separated fixture data string and populates FIXTURE_ID_GW_LOOKUP."""
     global FIXTURE_ID_GW_LOOKUP
-    FIXTURE_ID_GW_LOOKUP = {} # Reset
+    FIXTURE_ID_GW_LOOKUP = build_fixture_id_gw_lookup(raw_data_string, team_mapping) # Published once complete
+
+def build_fixture_id_gw_lookup(raw_data_string: str, team_mapping: Dict[str, str]) -> Dict[Tuple[str, str, str], Dict[str, str]]:
+    """Parses raw tab-separated fixture data string into a FIXTURE_ID_GW_LOOKUP-style dict."""
+    fixture_lookup = {}
     data_io = io.StringIO(raw_data_string)
     reader = csv.reader(data_io, delimiter='\t')
     try:
         header = next(reader) # Skips the header row
     except StopIteration:
         print("Error: Fixture ID/GW data string is empty or header is missing.")
-        return
+        return fixture_lookup
 
     # Expected header: fixture_id	stage_name	starting_at	home_team_name	away_team_name	group_name	home_team_id	away_team_id	GW
     col_indices = {name: i for i, name in enumerate(header)}
@@ -280,7 +341,7 @@ def _populate_fixture_id_gw_lookup(raw_data_string: str, team_mapping: Dict[str,
     required_cols = ['fixture_id', 'home_team_name', 'away_team_name', 'starting_at', 'GW']
     if not all(col in col_indices for col in required_cols):
         print(f"Error: Missing one or more required columns in fixture data header for ID/GW lookup. Expected: {required_cols}")
-        return
+        return fixture_lookup
 
     for i, row in enumerate(reader):
         if len(row) < len(header): # Ensure enough columns as per header
@@ -312,10 +373,10 @@ def _populate_fixture_id_gw_lookup(raw_data_string: str, team_mapping: Dict[str,
                  continue
 
             lookup_key = (canonical_home, canonical_away, fixture_date_str)
-            if lookup_key in FIXTURE_ID_GW_LOOKUP:
+            if lookup_key in fixture_lookup:
                 print(f"Warning: Duplicate key {lookup_key} in FIXTURE_ID_GW_LOOKUP. Overwriting with fixture_id {fixture_id_fixture}.")
 
-            FIXTURE_ID_GW_LOOKUP[lookup_key] = {
+            fixture_lookup[lookup_key] = {
                 "fixture_id": fixture_id_fixture,
                 "GW": gw_fixture
             }
@@ -326,10 +387,20 @@ def _populate_fixture_id_gw_lookup(raw_data_string: str, team_mapping: Dict[str,
             print(f"Error processing fixture row {i+2} for ID/GW lookup: {row} - {e}")
             continue
 
-    print(f"INFO: Fixture ID/GW lookup populated with {len(FIXTURE_ID_GW_LOOKUP)} entries.")
+    print(f"INFO: Fixture ID/GW lookup populated with {len(fixture_lookup)} entries.")
+    return fixture_lookup
 
-# Populate the lookup at script start
-_populate_fixture_id_gw_lookup(FULL_FIXTURE_DATA_RAW, TEAM_NAME_MAPPING)
+def get_fixture_id_gw_lookup() -> Dict[Tuple[str, str, str], Dict[str, str]]:
+    """FIXTURE_ID_GW_LOOKUP, populated from FULL_FIXTURE_DATA_RAW on first access and memoized."""
+    if 'FIXTURE_ID_GW_LOOKUP' not in globals():
+        with _FIXTURE_ID_GW_LOOKUP_LOCK:
+            if 'FIXTURE_ID_GW_LOOKUP' not in globals(): _populate_fixture_id_gw_lookup(FULL_FIXTURE_DATA_RAW, TEAM_NAME_MAPPING)
+    return FIXTURE_ID_GW_LOOKUP
+
+def __getattr__(name):
+    # Module attribute fallback (PEP 562): point_calculator.FIXTURE_ID_GW_LOOKUP builds the lookup on first access
+    if name == 'FIXTURE_ID_GW_LOOKUP': return get_fixture_id_gw_lookup()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def parse_html_for_odds(file_path):
@@ -338,8 +409,10 @@ def parse_html_for_odds(file_path):
         print(f"Info (HTML Outright): File not found: {file_path}")
         return teams_data
     try:
+        from bs4 import BeautifulSoup # Deferred: only needed when the HTML odds file is parsed
         with open(file_path, 'r', encoding='utf-8') as f: html_content = f.read()
-        soup = BeautifulSoup(html_content, 'html.parser')
+        with metrics.stage_timer('outright_html_parse'):
+            soup = BeautifulSoup(html_content, 'html.parser')
         for row in soup.select('div[data-testid="outrights-table-row"]'):
             team_name_el = row.select_one('div[data-testid="outrights-participant-name"] p')
             odds_el = row.select_one('div[data-testid="add-to-coupon-button"] p')
@@ -429,74 +502,25 @@ def normalize_tournament_implied_probs(df_odds, all_fixture_teams_canonical):
             strength_scores[team_c] = default_strength
     return strength_scores
 
-def get_venue_impact(home_team_canonical, away_team_canonical, stadium):
-    HOME_VENUES = {"Hard Rock Stadium, Miami Gardens, FL": "Inter Miami CF", "Lumen Field, Seattle, WA": "Seattle Sounders FC"}
-    venue_team_canonical = None
-    for venue_stadium, venue_home_team in HOME_VENUES.items():
-        if stadium.strip().lower() == venue_stadium.strip().lower():
-            venue_team_canonical = get_canonical_team_name_robust(venue_home_team, TEAM_NAME_MAPPING) # Map venue team too
-            break
-
-    if venue_team_canonical == home_team_canonical: return -12, 8
-    if venue_team_canonical == away_team_canonical: return 8, -12
-    return 0, 0
-
-def calculate_fatigue_impact(team_canonical, match_date_obj, last_match_info, cross_country_travel=False):
-    if not last_match_info or not last_match_info.get('date'): return 0
-    rest_days = (match_date_obj - last_match_info['date']).days
-    if rest_days < 0 :
-        print(f"Warning (Fatigue): Negative rest days for {team_canonical}. Max fatigue assigned.")
-        return 15
-    if rest_days >= 7: fatigue = -10
-    elif rest_days >= 5: fatigue = -5
-    elif rest_days >= 3: fatigue = 0
-    elif rest_days == 2: fatigue = 8
-    else: fatigue = 15
-    return fatigue + 5 if cross_country_travel else fatigue
-
-def calculate_outright_fdr_components(fixture, team_strengths, match_history_context):
-    home_c, away_c, date_dt, stadium = fixture['home_team_canonical'], fixture['away_team_canonical'], fixture['date_dt'], fixture['stadium']
-    home_strength, away_strength = team_strengths.get(home_c, 10.0), team_strengths.get(away_c, 10.0)
-    h_base_fdr_component, a_base_fdr_component = away_strength, home_strength
-    ven_h_impact, ven_a_impact = get_venue_impact(home_c, away_c, stadium)
-
-    east_coasts = ["Hard Rock Stadium, Miami Gardens, FL", "MetLife Stadium, East Rutherford, NJ", "Lincoln Financial Field, Philadelphia, PA", "GEODIS Park, Nashville, TN", "Bank of America Stadium, Charlotte, NC", "Mercedes-Benz Stadium, Atlanta, GA", "Inter&Co Stadium, Orlando, FL", "Audi Field, Washington, D.C.", "Camping World Stadium, Orlando, FL", "TQL Stadium, Cincinnati, OH"]
-    west_coasts = ["Lumen Field, Seattle, WA", "Rose Bowl Stadium, Pasadena, CA"]
-
-    east_coasts_lower = [s.lower().strip() for s in east_coasts]
-    west_coasts_lower = [s.lower().strip() for s in west_coasts]
-    current_stadium_lower = stadium.lower().strip()
-
-    cc_h, cc_a = False, False
-    last_h_info, last_a_info = match_history_context.get(home_c), match_history_context.get(away_c)
-    if last_h_info and last_h_info.get('venue'):
-        last_h_venue_lower = last_h_info['venue'].lower().strip()
-        cc_h = (current_stadium_lower in east_coasts_lower and last_h_venue_lower in west_coasts_lower) or \
-               (current_stadium_lower in west_coasts_lower and last_h_venue_lower in east_coasts_lower)
-    if last_a_info and last_a_info.get('venue'):
-        last_a_venue_lower = last_a_info['venue'].lower().strip()
-        cc_a = (current_stadium_lower in east_coasts_lower and last_a_venue_lower in west_coasts_lower) or \
-               (current_stadium_lower in west_coasts_lower and last_a_venue_lower in east_coasts_lower)
-
-    fat_h_impact = calculate_fatigue_impact(home_c, date_dt, last_h_info, cc_h)
-    fat_a_impact = calculate_fatigue_impact(away_c, date_dt, last_a_info, cc_a)
-
-    h_fdr_out = (OUTRIGHT_COMPONENT_WEIGHTS['base_strength_from_odds'] * h_base_fdr_component +
-                 OUTRIGHT_COMPONENT_WEIGHTS['venue_impact'] * ven_h_impact +
-                 OUTRIGHT_COMPONENT_WEIGHTS['fatigue'] * fat_h_impact)
-    a_fdr_out = (OUTRIGHT_COMPONENT_WEIGHTS['base_strength_from_odds'] * a_base_fdr_component +
-                 OUTRIGHT_COMPONENT_WEIGHTS['venue_impact'] * ven_a_impact +
-                 OUTRIGHT_COMPONENT_WEIGHTS['fatigue'] * fat_a_impact)
-    h_fdr_out_scaled = np.clip(h_fdr_out / 1.5 + 25, 1, 99)
-    a_fdr_out_scaled = np.clip(a_fdr_out / 1.5 + 25, 1, 99)
-    return {'home_fdr_outright': h_fdr_out_scaled, 'away_fdr_outright': a_fdr_out_scaled,
-            'home_strength_metric': home_strength, 'away_strength_metric': away_strength,
-            'venue_impact_home': ven_h_impact, 'venue_impact_away': ven_a_impact,
-            'fatigue_impact_home': fat_h_impact, 'fatigue_impact_away': fat_a_impact}
-
-def create_base_fixtures_with_canonical_names(team_map: Dict[str, str], fixture_id_gw_provider: Dict[Tuple[str,str,str], Dict[str,str]]):
+# Venues for the outright FDR components, matched on normalized (stripped, lowercased) stadium names
+HOME_VENUES = {"Hard Rock Stadium, Miami Gardens, FL": "Inter Miami CF", "Lumen Field, Seattle, WA": "Seattle Sounders FC"}
+EAST_COAST_STADIUMS = ["Hard Rock Stadium, Miami Gardens, FL", "MetLife Stadium, East Rutherford, NJ", "Lincoln Financial Field, Philadelphia, PA", "GEODIS Park, Nashville, TN", "Bank of America Stadium, Charlotte, NC", "Mercedes-Benz Stadium, Atlanta, GA", "Inter&Co Stadium, Orlando, FL", "Audi Field, Washington, D.C.", "Camping World Stadium, Orlando, FL", "TQL Stadium, Cincinnati, OH"]
+WEST_COAST_STADIUMS = ["Lumen Field, Seattle, WA", "Rose Bowl Stadium, Pasadena, CA"]
+COAST_EAST, COAST_WEST = 1, 2 # 0 = unknown coast
+
+def normalize_stadium_name(stadium):
+    return stadium.strip().lower()
+
+STADIUM_COASTS = {**{normalize_stadium_name(s): COAST_EAST for s in EAST_COAST_STADIUMS}, **{normalize_stadium_name(s): COAST_WEST for s in WEST_COAST_STADIUMS}}
+
+def get_venue_home_teams(team_map):
+    """Normalized stadium -> canonical name of the team playing at home there."""
+    return {normalize_stadium_name(stadium): get_canonical_team_name_robust(home_team, team_map) for stadium, home_team in HOME_VENUES.items()}
+
+def create_base_fixtures_with_canonical_names(team_map: Dict[str, str], fixture_id_gw_provider: Dict[Tuple[str,str,str], Dict[str,str]], fixtures_raw=None):
     # This list contains stadium, specific time formatting needed for existing logic
-    user_provided_fixtures_raw = [
+    # fixtures_raw (same dict layout) replaces it, e.g. for synthetic schedules in benchmark.py
+    user_provided_fixtures_raw = fixtures_raw if fixtures_raw is not None else [
         {'home_team': 'Al Ahly FC', 'away_team': 'Inter Miami CF', 'date': '2025-06-15', 'time': '12:00 AM', 'stadium': 'Hard Rock Stadium, Miami Gardens, FL', 'group': 'A'}, # Adjusted time from 0:00:00
         {'home_team': 'SE Palmeiras', 'away_team': 'FC Porto', 'date': '2025-06-15', 'time': '10:00 PM', 'stadium': 'MetLife Stadium, East Rutherford, NJ', 'group': 'A'}, # Adjusted from 22:00
         {'home_team': 'Paris Saint-Germain', 'away_team': 'Atlético de Madrid', 'date': '2025-06-15', 'time': '07:00 PM', 'stadium': 'Rose Bowl Stadium, Pasadena, CA', 'group': 'B'}, # Adjusted from 19:00
@@ -629,14 +653,6 @@ def create_base_fixtures_with_canonical_names(team_map: Dict[str, str], fixture_
     return final_fixtures_list
 
 
-def create_last_match_dates_history(sorted_fixtures_canonical):
-    history_list_for_each_match, team_last_match_tracker = [], { tc: None for fix in sorted_fixtures_canonical for tc in (fix['home_team_canonical'], fix['away_team_canonical'])}
-    for fix in sorted_fixtures_canonical:
-        home_c, away_c = fix['home_team_canonical'], fix['away_team_canonical']
-        history_list_for_each_match.append({home_c: team_last_match_tracker[home_c].copy() if team_last_match_tracker[home_c] else None, away_c: team_last_match_tracker[away_c].copy() if team_last_match_tracker[away_c] else None})
-        team_last_match_tracker[home_c], team_last_match_tracker[away_c] = {'date': fix['date_dt'], 'venue': fix['stadium']}, {'date': fix['date_dt'], 'venue': fix['stadium']}
-    return history_list_for_each_match
-
 def parse_cs_match_string_for_canonical_teams(match_str, team_map):
     separators = [' vs ', ' - ', ' @ ']
     parts = None
@@ -662,6 +678,69 @@ def parse_cs_match_string_for_canonical_teams(match_str, team_map):
     return (None, None) if "Unknown" in [h_canonical, a_canonical] or h_canonical.startswith("N/A_") or a_canonical.startswith("N/A_") else (h_canonical, a_canonical)
 
 
+CS_SCORE_PATTERN = re.compile(r"^(\d+)-(\d+)$")
+
+class ScoreMatrix:
+    """Correct-score odds for one fixture, parsed once into dense goal-index arrays.
+
+    home_goals/away_goals/probs are parallel arrays (one entry per valid "h-a" scoreline) and probs is
+    normalized over the bookmaker's inverse odds. The transposed view `T` swaps home and away without
+    copying the arrays, for fixtures whose odds were listed with the teams the other way round.
+    """
+    __slots__ = ('home_goals', 'away_goals', 'probs', 'total_inv_odds', '_matrix')
+
+    def __init__(self, home_goals, away_goals, probs, total_inv_odds, matrix=None):
+        self.home_goals, self.away_goals, self.probs = home_goals, away_goals, probs
+        self.total_inv_odds = total_inv_odds
+        self._matrix = matrix
+
+    @classmethod
+    def from_odds(cls, cs_odds_dict):
+        """Parses an {"h-a": decimal_odds} dict, keeping scorelines with odds > 1.0."""
+        h_goals, a_goals, inv_odds = [], [], []
+        for score_str, odd_val in (cs_odds_dict or {}).items():
+            try:
+                score_match, odd_f = CS_SCORE_PATTERN.match(str(score_str)), float(odd_val)
+            except (TypeError, ValueError): continue
+            if score_match and odd_f > 1.0:
+                h_goals.append(int(score_match.group(1))); a_goals.append(int(score_match.group(2))); inv_odds.append(1.0 / odd_f)
+        inv_odds = np.array(inv_odds, dtype=float)
+        total_inv_odds = float(inv_odds.sum()) if len(inv_odds) else 0.0
+        probs = inv_odds / total_inv_odds if total_inv_odds > 0 else inv_odds
+        return cls(np.array(h_goals, dtype=np.int16), np.array(a_goals, dtype=np.int16), probs, total_inv_odds)
+
+    def __len__(self):
+        return len(self.probs)
+
+    def __eq__(self, other):
+        if not isinstance(other, ScoreMatrix): return NotImplemented
+        return (np.array_equal(self.home_goals, other.home_goals) and np.array_equal(self.away_goals, other.away_goals)
+                and np.array_equal(self.probs, other.probs))
+
+    __hash__ = None
+
+    @property
+    def matrix(self):
+        """Dense (home_goals x away_goals) probability grid, built on first access."""
+        if self._matrix is None:
+            if not len(self): self._matrix = np.zeros((1, 1))
+            else:
+                self._matrix = np.zeros((int(self.home_goals.max()) + 1, int(self.away_goals.max()) + 1))
+                np.add.at(self._matrix, (self.home_goals, self.away_goals), self.probs)
+        return self._matrix
+
+    @property
+    def T(self):
+        return ScoreMatrix(self.away_goals, self.home_goals, self.probs, self.total_inv_odds, self.matrix.T)
+
+def get_fixture_score_matrix(cs_lookup, home_c, away_c, date_s):
+    """Returns the fixture's ScoreMatrix oriented home-first, or None if no CS odds were loaded for it."""
+    score_matrix = cs_lookup.get((home_c, away_c, date_s))
+    if score_matrix is not None: return score_matrix
+    reversed_matrix = cs_lookup.get((away_c, home_c, date_s))
+    return reversed_matrix.T if reversed_matrix is not None else None
+
+
 def load_correct_score_data_for_fdr(json_fp, team_map):
     cs_data_lookup = {}
     if not os.path.exists(json_fp):
@@ -681,32 +760,21 @@ def load_correct_score_data_for_fdr(json_fp, team_map):
             if not re.match(r"^\d{4}-\d{2}-\d{2}$", entry['date']):
                 print(f"Warning (CS Load): Skip '{entry['match']}' due to invalid date format: {entry['date']}"); continue
 
-            cs_data_lookup[(h_canonical, a_canonical, entry['date'])] = entry['correct_score_odds']
+            if not entry['correct_score_odds'] or not isinstance(entry['correct_score_odds'], dict):
+                print(f"Warning (CS Load): Skip '{entry['match']}' due to empty correct score odds."); continue
+
+            cs_data_lookup[(h_canonical, a_canonical, entry['date'])] = ScoreMatrix.from_odds(entry['correct_score_odds'])
             loaded_count +=1
         print(f"✅ Loaded {loaded_count} matches from CS JSON: {json_fp}")
     except Exception as e: print(f"Error loading CS data from {json_fp}: {e}")
     return cs_data_lookup
 
 
-def calculate_correct_score_fdr_values(cs_odds_dict):
-    if not cs_odds_dict or not isinstance(cs_odds_dict, dict) or not cs_odds_dict: return 50.0, 50.0, 0.333, 0.334, 0.333
-    total_inv_odds, valid_odds_parsed = 0.0, []
-    for score_str, odd_val in cs_odds_dict.items():
-        try:
-            odd_f = float(odd_val)
-            if odd_f > 1.0:
-                parts = str(score_str).split('-')
-                if len(parts) == 2:
-                    valid_odds_parsed.append({'h_g': int(parts[0]), 'a_g': int(parts[1]), 'inv_odd': 1.0 / odd_f})
-                    total_inv_odds += (1.0 / odd_f)
-        except: continue
-    if total_inv_odds <= 1e-6 or not valid_odds_parsed: return 50.0, 50.0, 0.333, 0.334, 0.333
-    P_h, P_d, P_a = 0.0, 0.0, 0.0
-    for item in valid_odds_parsed:
-        prob_norm = item['inv_odd'] / total_inv_odds
-        if item['h_g'] > item['a_g']: P_h += prob_norm
-        elif item['h_g'] < item['a_g']: P_a += prob_norm
-        else: P_d += prob_norm
+def calculate_correct_score_fdr_values(score_matrix):
+    if isinstance(score_matrix, dict): score_matrix = ScoreMatrix.from_odds(score_matrix)
+    if score_matrix is None or not len(score_matrix) or score_matrix.total_inv_odds <= 1e-6: return 50.0, 50.0, 0.333, 0.334, 0.333
+    h_g, a_g, probs = score_matrix.home_goals, score_matrix.away_goals, score_matrix.probs
+    P_h, P_d, P_a = float(probs[h_g > a_g].sum()), float(probs[h_g == a_g].sum()), float(probs[h_g < a_g].sum())
     sum_probs = P_h + P_d + P_a
     if sum_probs > 1e-6: P_h /= sum_probs; P_d /= sum_probs; P_a /= sum_probs
     else: P_h, P_d, P_a = 0.333, 0.334, 0.333
@@ -714,37 +782,17 @@ def calculate_correct_score_fdr_values(cs_odds_dict):
     h_fdr_cs, a_fdr_cs = np.clip(100.0 - (h_exp_pts / 3.0) * 100.0, 1, 99), np.clip(100.0 - (a_exp_pts / 3.0) * 100.0, 1, 99)
     return h_fdr_cs, a_fdr_cs, P_h, P_d, P_a
 
-def calculate_match_afd_dfd_from_cs_odds(cs_odds_dict):
-    if not cs_odds_dict or not isinstance(cs_odds_dict, dict) or not cs_odds_dict: return None, None, None, None
-    total_inv_odds, valid_odds_parsed = 0.0, []
-    for score_str, odd_val in cs_odds_dict.items():
-        try:
-            odd_f = float(odd_val)
-            if odd_f > 1.0:
-                parts = str(score_str).split('-')
-                if len(parts) == 2:
-                    valid_odds_parsed.append({'h_g': int(parts[0]), 'a_g': int(parts[1]), 'inv_odd': 1.0 / odd_f})
-                    total_inv_odds += (1.0 / odd_f)
-        except: continue
-    if total_inv_odds <= 1e-6 or not valid_odds_parsed: return None, None, None, None
-    xG_h, xG_a = 0.0, 0.0
-    for item in valid_odds_parsed:
-        prob_norm = item['inv_odd'] / total_inv_odds
-        xG_h += item['h_g'] * prob_norm; xG_a += item['a_g'] * prob_norm
+def calculate_match_afd_dfd_from_cs_odds(score_matrix):
+    if isinstance(score_matrix, dict): score_matrix = ScoreMatrix.from_odds(score_matrix)
+    if score_matrix is None or not len(score_matrix) or score_matrix.total_inv_odds <= 1e-6: return None, None, None, None
+    xG_h, xG_a = float(score_matrix.home_goals @ score_matrix.probs), float(score_matrix.away_goals @ score_matrix.probs)
     h_afd, h_dfd = (100.0 / xG_h) if xG_h > 0.01 else 999.0, xG_a * 100.0
     a_afd, a_dfd = (100.0 / xG_a) if xG_a > 0.01 else 999.0, xG_h * 100.0
     return round(h_afd,1), round(h_dfd,1), round(a_afd,1), round(a_dfd,1)
 
-def determine_match_tiers_and_competitiveness(home_fdr, away_fdr, tier_map_display_dict):
-    fdr_diff, lower_fdr_is_home = abs(home_fdr - away_fdr), home_fdr <= away_fdr
-    if fdr_diff <= 6: r_low, r_high, comp_label = "Hard", "Hard", "Minimal"
-    elif fdr_diff <= 15: r_low, r_high, comp_label = "Moderate", "Hard", "Medium"
-    elif fdr_diff <= 20: r_low, r_high, comp_label = "Easy", "Hard", "Large"
-    elif fdr_diff <= 30: r_low, r_high, comp_label = "Easy", "Very Hard", "Substantial"
-    else: r_low, r_high, comp_label = "Very Easy", "Very Hard", "Massive"
-    f_low, f_high = tier_map_display_dict.get(r_low, "Average Difficulty"), tier_map_display_dict.get(r_high, "Difficult")
-    h_tier, a_tier = (f_low if lower_fdr_is_home else f_high), (f_high if lower_fdr_is_home else f_low)
-    return h_tier, a_tier, round(fdr_diff, 1), comp_label
+# (max FDR difference, raw tier of the lower-FDR side, raw tier of the higher-FDR side, competitiveness label)
+MATCH_TIER_BANDS = [(6, "Hard", "Hard", "Minimal"), (15, "Moderate", "Hard", "Medium"), (20, "Easy", "Hard", "Large"),
+                    (30, "Easy", "Very Hard", "Substantial"), (math.inf, "Very Easy", "Very Hard", "Massive")]
 
 def get_player_position_category(position_str):
     pos_l = str(position_str).lower()
@@ -767,8 +815,7 @@ def calculate_player_points_for_specific_score(p_stats, team_goals, team_concede
         player_expected_assists_this_match = (player_assists_season / team_assists_season) * team_goals
         player_expected_assists_this_match = max(0, min(player_expected_assists_this_match, team_goals - player_expected_goals_this_match))
     else: player_expected_assists_this_match = 0.0
-    goal_points_map = {'Goalkeeper': 10, 'Defender': 6, 'Midfielder': 5, 'Forward': 4}
-    points += player_expected_goals_this_match * goal_points_map.get(pos_cat, 4)
+    points += player_expected_goals_this_match * POSITION_GOAL_POINTS.get(pos_cat, 4)
     points += player_expected_assists_this_match * 3.0
     if team_conceded == 0:
         if pos_cat in ['Goalkeeper', 'Defender']: points += 4.0
@@ -776,6 +823,53 @@ def calculate_player_points_for_specific_score(p_stats, team_goals, team_concede
     if pos_cat in ['Goalkeeper', 'Defender']: points -= (team_conceded // 2) * 1.0
     return points
 
+def score_probs_to_matrix(score_probs):
+    """Converts an {"h-a": prob} dict into a dense (home_goals x away_goals) probability matrix."""
+    parsed = [(int(s.split('-')[0]), int(s.split('-')[1]), p) for s, p in score_probs.items() if '-' in s]
+    if not parsed: return np.zeros((1, 1))
+    prob_matrix = np.zeros((max(h for h, _, _ in parsed) + 1, max(a for _, a, _ in parsed) + 1))
+    for h_g, a_g, p in parsed: prob_matrix[h_g, a_g] += p
+    return prob_matrix
+
+def calculate_expected_points_vectorized(players_df, score_prob_matrix, team_goals_season, team_assists_season):
+    """Vectorized equivalent of summing calculate_player_points_for_specific_score(...) * prob over a score grid.
+
+    score_prob_matrix[g, c] is the probability of the player's team scoring g and conceding c, so pass the
+    transposed matrix for away players. Builds a (players x goals x conceded) points tensor and reduces it
+    against the matrix in one pass; returns one expected-points value per row of players_df.
+    """
+    if players_df.empty: return np.zeros(0)
+    points = calculate_points_tensor(players_df, *score_prob_matrix.shape, team_goals_season, team_assists_season)
+    return np.einsum('pgc,gc->p', points, score_prob_matrix)
+
+def calculate_points_tensor(players_df, n_goals, n_conceded, team_goals_season, team_assists_season):
+    """(players x goals x conceded) fantasy points of each player for every scoreline of an n_goals x n_conceded grid.
+    Entry [:, g, c] doesn't depend on the grid size, so a larger tensor can be sliced for smaller grids."""
+    pos_cats = players_df['PositionCategory']
+    player_goals = players_df['Goals'].to_numpy(dtype=float)[:, None, None]
+    player_assists = players_df['Assists'].to_numpy(dtype=float)[:, None, None]
+    goal_pts = pos_cats.map(POSITION_GOAL_POINTS).fillna(4).to_numpy(dtype=float)[:, None, None]
+    cs_pts = pos_cats.map(POSITION_CLEAN_SHEET_POINTS).fillna(0.0).to_numpy(dtype=float)[:, None, None]
+    concede_penalised = pos_cats.isin(['Goalkeeper', 'Defender']).to_numpy()[:, None, None]
+
+    team_goals = np.arange(n_goals, dtype=float)[None, :, None]
+    team_conceded = np.arange(n_conceded)[None, None, :]
+
+    if team_goals_season > 0: exp_goals = np.where(team_goals > 0, (player_goals / team_goals_season) * team_goals, 0.0)
+    else: exp_goals = np.zeros((len(players_df), n_goals, 1))
+    if team_assists_season > 0:
+        exp_assists = np.where(team_goals > 0, (player_assists / team_assists_season) * team_goals, 0.0)
+        # max(0, min(x, cap)) with Python's NaN semantics, like the scalar path (a NaN x becomes 0, a NaN cap keeps x)
+        exp_assists = np.where(team_goals - exp_goals < exp_assists, team_goals - exp_goals, exp_assists)
+        exp_assists = np.where(exp_assists > 0, exp_assists, 0.0)
+    else: exp_assists = np.zeros((len(players_df), n_goals, 1))
+
+    points = 2.0 + exp_goals * goal_pts
+    points = points + exp_assists * 3.0
+    points = points + np.where(team_conceded == 0, cs_pts, 0.0)
+    points = points - np.where(concede_penalised, (team_conceded // 2) * 1.0, 0.0)
+    return points
+
 def estimate_xg_from_fdr_outrights(h_fdr, a_fdr, avg_goals=AVERAGE_TOTAL_GOALS_IN_MATCH):
     if pd.isna(h_fdr) or pd.isna(a_fdr): return avg_goals / 2, avg_goals / 2
     h_proxy, a_proxy = 1/(h_fdr+0.1), 1/(a_fdr+0.1)
@@ -783,121 +877,343 @@ def estimate_xg_from_fdr_outrights(h_fdr, a_fdr, avg_goals=AVERAGE_TOTAL_GOALS_I
     h_ratio = h_proxy / total_proxy if total_proxy > 1e-9 else 0.5
     return max(0.1, h_ratio*avg_goals), max(0.1, (1-h_ratio)*avg_goals)
 
-def get_score_probabilities_poisson(xg_h, xg_a, max_g=MAX_POISSON_GOALS):
-    probs, h_probs, a_probs = {}, [poisson.pmf(i, xg_h) for i in range(max_g+1)], [poisson.pmf(i, xg_a) for i in range(max_g+1)]
-    for hg in range(max_g+1):
-        for ag in range(max_g+1): probs[f"{hg}-{ag}"] = h_probs[hg] * a_probs[ag]
-    total_p = sum(probs.values())
-    return {s: p/total_p for s,p in probs.items()} if total_p > 1e-9 else {"0-0":1.0}
-
-# --- Main Calculation Logic Function ---
-def generate_all_player_points_data():
-    print("--- Starting FIFA Club World Cup 2025 Analysis (Calculation Engine v2) ---")
-
-    # --- FDR Calculations ---
-    print("--- Calculating Fixture Difficulty Ratings (FDRs) ---")
-    # create_base_fixtures now uses the global FIXTURE_ID_GW_LOOKUP
-    all_base_fixtures = create_base_fixtures_with_canonical_names(TEAM_NAME_MAPPING, FIXTURE_ID_GW_LOOKUP)
-    if not all_base_fixtures:
-        print("CRITICAL: No base fixtures loaded in calculation engine.")
-        return None, "No base fixtures loaded."
-
-    all_involved_teams_canonical = set(t for fix in all_base_fixtures for t in (fix['home_team_canonical'], fix['away_team_canonical']))
-    df_outright_odds_data = get_tournament_outright_odds_data(HTML_ODDS_FP, MD_ODDS_FP, TEAM_NAME_MAPPING)
-    team_strength_metrics = normalize_tournament_implied_probs(df_outright_odds_data, all_involved_teams_canonical)
-    match_history_contexts = create_last_match_dates_history(all_base_fixtures)
-    cs_odds_lookup_for_fdr = load_correct_score_data_for_fdr(CS_JSON_FP, TEAM_NAME_MAPPING)
-
-    fdr_results_list = []
-    for i, fixture_details in enumerate(all_base_fixtures):
-        history_ctx = match_history_contexts[i]
-        home_c, away_c, date_s = fixture_details['home_team_canonical'], fixture_details['away_team_canonical'], fixture_details['date_str']
-
-        # Get fixture_id and GW from fixture_details
-        fixture_id_val = fixture_details.get('fixture_id', 'N/A_ID')
-        gw_val = fixture_details.get('GW', 'N/A_GW')
-
-        outright_calcs = calculate_outright_fdr_components(fixture_details, team_strength_metrics, history_ctx)
-        h_fdr_out, a_fdr_out = outright_calcs['home_fdr_outright'], outright_calcs['away_fdr_outright']
+def poisson_goal_pmf(xg, max_g=MAX_POISSON_GOALS, tail_mode=POISSON_TAIL_MODE):
+    """(... x max_g+1) Poisson goal pmfs for an array of xG values. With tail_mode='lump' the last entry is P(goals >= max_g)."""
+    from scipy.stats import poisson # Deferred: scipy.stats dominates import time
+    xg = np.asarray(xg, dtype=float)[..., None]
+    pmf = poisson.pmf(np.arange(max_g + 1), xg)
+    if tail_mode == 'lump': pmf[..., -1] = poisson.sf(max_g - 1, xg[..., 0])
+    return pmf
+
+def poisson_score_grids(xg_h, xg_a, max_g=MAX_POISSON_GOALS, tail_mode=POISSON_TAIL_MODE):
+    """Normalized (... x max_g+1 x max_g+1) home-goals x away-goals probability grids for arrays of (xg_h, xg_a) pairs, in one call.
+    A grid whose truncated mass is ~0 (absurd xG) becomes a certain 0-0, like get_score_probabilities_poisson always did."""
+    grids = poisson_goal_pmf(xg_h, max_g, tail_mode)[..., :, None] * poisson_goal_pmf(xg_a, max_g, tail_mode)[..., None, :]
+    totals = grids.sum(axis=(-2, -1), keepdims=True)
+    grids = np.divide(grids, totals, out=np.zeros_like(grids), where=totals > 1e-9)
+    grids[..., 0, 0] = np.where(totals[..., 0, 0] > 1e-9, grids[..., 0, 0], 1.0)
+    return grids
+
+@functools.lru_cache(maxsize=POISSON_GRID_MEMO_SIZE)
+def _get_memoized_poisson_grid(xg_h, xg_a, max_g, tail_mode):
+    grid = poisson_score_grids(xg_h, xg_a, max_g, tail_mode)
+    grid.setflags(write=False) # Shared by every caller with the same key
+    return grid
+
+def get_poisson_score_grid(xg_h, xg_a, max_g=MAX_POISSON_GOALS, tail_mode=POISSON_TAIL_MODE):
+    """Memoized single-fixture Poisson score grid (read-only), keyed on xG rounded to POISSON_XG_DECIMALS."""
+    return _get_memoized_poisson_grid(round(float(xg_h), POISSON_XG_DECIMALS), round(float(xg_a), POISSON_XG_DECIMALS), max_g, tail_mode)
 
-        method, h_fdr_cs, a_fdr_cs, P_h, P_d, P_a, h_afd, h_dfd, a_afd, a_dfd = "OutrightFDR", None,None,None,None,None,None,None,None,None
-        fixture_key_cs_order1 = (home_c, away_c, date_s); fixture_key_cs_order2 = (away_c, home_c, date_s)
-        cs_match_odds = cs_odds_lookup_for_fdr.get(fixture_key_cs_order1) or cs_odds_lookup_for_fdr.get(fixture_key_cs_order2)
-
-        if cs_match_odds:
-            h_fdr_cs_calc,a_fdr_cs_calc,P_h_calc,P_d_calc,P_a_calc = calculate_correct_score_fdr_values(cs_match_odds)
-            h_afd_calc,h_dfd_calc,a_afd_calc,a_dfd_calc = calculate_match_afd_dfd_from_cs_odds(cs_match_odds)
-            if fixture_key_cs_order2 in cs_odds_lookup_for_fdr and fixture_key_cs_order1 not in cs_odds_lookup_for_fdr :
-                 h_fdr_cs, a_fdr_cs, P_h, P_d, P_a = a_fdr_cs_calc, h_fdr_cs_calc, P_a_calc, P_d_calc, P_h_calc
-                 h_afd, h_dfd, a_afd, a_dfd = a_afd_calc, a_dfd_calc, h_afd_calc, h_dfd_calc
-            else:
-                 h_fdr_cs, a_fdr_cs, P_h, P_d, P_a = h_fdr_cs_calc, a_fdr_cs_calc, P_h_calc, P_d_calc, P_a_calc
-                 h_afd, h_dfd, a_afd, a_dfd = h_afd_calc, h_dfd_calc, a_afd_calc, a_dfd_calc
-            final_h_fdr = FINAL_FDR_WEIGHTS['outright']*h_fdr_out + FINAL_FDR_WEIGHTS['correct_score']*h_fdr_cs
-            final_a_fdr = FINAL_FDR_WEIGHTS['outright']*a_fdr_out + FINAL_FDR_WEIGHTS['correct_score']*a_fdr_cs
-            method = "CombinedFDR"
-        else: final_h_fdr, final_a_fdr = h_fdr_out, a_fdr_out
-
-        final_h_fdr, final_a_fdr = np.clip(final_h_fdr,1,99), np.clip(final_a_fdr,1,99)
-        h_tier, a_tier, fdr_diff, comp_label = determine_match_tiers_and_competitiveness(final_h_fdr, final_a_fdr, TIER_DISPLAY_MAPPING)
-        home_details, away_details = TEAM_DETAILS.get(home_c,DEFAULT_TEAM_DETAIL), TEAM_DETAILS.get(away_c,DEFAULT_TEAM_DETAIL)
-        home_team_api_id, away_team_api_id = home_details.get('api_id'), away_details.get('api_id')
-
-        fdr_results_list.append({
-            'fixture_id': fixture_id_val, # Added
-            'GW': gw_val,                 # Added
-            'date_str':date_s, 'time_str':fixture_details['time_str'], 'group':fixture_details['group'], 'stadium':fixture_details['stadium'],
-            'home_team_canonical':home_c, 'home_team_short_code':home_details['short_code'], 'home_team_api_id':home_team_api_id, 'home_team_logo':home_details['image'],
-            'away_team_canonical':away_c, 'away_team_short_code':away_details['short_code'], 'away_team_api_id':away_team_api_id, 'away_team_logo':away_details['image'],
-            'final_home_fdr':round(final_h_fdr,1), 'final_away_fdr':round(final_a_fdr,1),
-            'home_tier_display':h_tier, 'away_tier_display':a_tier, 'fdr_difference':fdr_diff, 'match_competitiveness_label':comp_label,
-            'fdr_calculation_method':method, 'home_fdr_outright':round(h_fdr_out,1) if h_fdr_out is not None else None,
-            'away_fdr_outright':round(a_fdr_out,1) if a_fdr_out is not None else None, 'home_fdr_cs':round(h_fdr_cs,1) if h_fdr_cs is not None else None,
-            'away_fdr_cs':round(a_fdr_cs,1) if a_fdr_cs is not None else None, 'home_strength_metric':round(outright_calcs['home_strength_metric'],1),
-            'away_strength_metric':round(outright_calcs['away_strength_metric'],1), 'venue_impact_home':outright_calcs['venue_impact_home'],
-            'venue_impact_away':outright_calcs['venue_impact_away'], 'fatigue_impact_home':outright_calcs['fatigue_impact_home'],
-            'fatigue_impact_away':outright_calcs['fatigue_impact_away'], 'prob_home_win_cs':P_h, 'prob_draw_cs':P_d, 'prob_away_win_cs':P_a,
-            'home_afd_cs':h_afd, 'home_dfd_cs':h_dfd, 'away_afd_cs':a_afd, 'away_dfd_cs':a_dfd
-        })
-    fdr_final_df = pd.DataFrame(fdr_results_list)
-    if fdr_final_df.empty:
-        print("CRITICAL: No FDR results generated in calculation engine.")
-        return None, "No FDR results generated."
-
-    # --- Player Points Calculations ---
-    print("--- Calculating Player Fantasy Points ---")
+def get_score_probabilities_poisson(xg_h, xg_a, max_g=MAX_POISSON_GOALS):
+    """{"h-a": prob} view of get_poisson_score_grid."""
+    return {f"{hg}-{ag}": p for (hg, ag), p in np.ndenumerate(get_poisson_score_grid(xg_h, xg_a, max_g))}
+
+# --- Input Fingerprinting (for result caching) ---
+_FILE_DIGEST_MEMO: Dict[str, Tuple[int, int, str]] = {} # Key: file path, Value: (mtime_ns, size, sha256)
+
+def _get_file_digest(file_path):
+    """Returns (mtime_ns, size, sha256) for a file, only re-hashing the content when mtime or size changed."""
+    stat = os.stat(file_path)
+    memo = _FILE_DIGEST_MEMO.get(file_path)
+    if memo and memo[0] == stat.st_mtime_ns and memo[1] == stat.st_size: return memo
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''): sha.update(chunk)
+    memo = (stat.st_mtime_ns, stat.st_size, sha.hexdigest())
+    _FILE_DIGEST_MEMO[file_path] = memo
+    return memo
+
+def get_calculation_constants():
+    """The tunable constants that affect the calculation output."""
+    return {
+        'OUTRIGHT_COMPONENT_WEIGHTS': OUTRIGHT_COMPONENT_WEIGHTS, 'FINAL_FDR_WEIGHTS': FINAL_FDR_WEIGHTS,
+        'AVERAGE_TOTAL_GOALS_IN_MATCH': AVERAGE_TOTAL_GOALS_IN_MATCH, 'MAX_POISSON_GOALS': MAX_POISSON_GOALS, 'POISSON_TAIL_MODE': POISSON_TAIL_MODE,
+        'POSITION_GOAL_POINTS': POSITION_GOAL_POINTS, 'POSITION_CLEAN_SHEET_POINTS': POSITION_CLEAN_SHEET_POINTS,
+    }
+
+@functools.lru_cache(maxsize=None)
+def get_engine_version():
+    """Digest of this module's source as loaded. Results persisted across restarts (snapshots) record it, so output of
+    different calculation code is never served as current."""
+    with open(os.path.abspath(__file__), 'rb') as f: return hashlib.sha256(f.read()).hexdigest()[:16]
+
+def compute_inputs_fingerprint(data_dir=DATA_DIR):
+    """Fingerprint of every input to generate_all_player_points_data: mtime, size and content hash of each file
+    under data_dir plus the calculation constants. Any change to an input yields a different fingerprint."""
+    fingerprint = hashlib.sha256()
+    if os.path.isdir(data_dir):
+        for root, dirs, files in os.walk(data_dir):
+            dirs.sort()
+            for file_name in sorted(files):
+                file_path = os.path.join(root, file_name)
+                try: mtime_ns, size, sha = _get_file_digest(file_path)
+                except OSError: continue # File removed while walking
+                fingerprint.update(f"{os.path.relpath(file_path, data_dir)}|{mtime_ns}|{size}|{sha}\n".encode('utf-8'))
+    fingerprint.update(json.dumps(get_calculation_constants(), sort_keys=True).encode('utf-8'))
+    return fingerprint.hexdigest()
+
+# --- Columnar Bundles (typed on-disk tables) ---
+# A bundle is a directory with one .npy file per column (memory-mappable) plus a manifest.json describing
+# how to rebuild each column exactly. Object columns are only stored when every value is str, int or float
+# (plus None/NaN); anything else makes write_columnar_bundle decline, so a bundle always round-trips exactly.
+COLUMNAR_BUNDLE_VERSION = 1
+
+def _encode_bundle_column(series):
+    """Returns (encoding, values_array, null_mask) for a column, or None if it can't be stored exactly."""
+    if series.dtype != object and not pd.api.types.is_string_dtype(series.dtype):
+        if not (pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series)): return None
+        return 'native', series.to_numpy(), None
+    values = series.tolist()
+    null_mask = np.array([v is None or (type(v) is float and math.isnan(v)) for v in values], dtype=bool)
+    value_types = {type(v) for v, is_null in zip(values, null_mask) if not is_null}
+    if value_types <= {str}: return 'str', np.array(['' if is_null else v for v, is_null in zip(values, null_mask)], dtype=str), null_mask
+    if value_types == {int}: return 'int', np.array([0 if is_null else v for v, is_null in zip(values, null_mask)], dtype=np.int64), null_mask
+    if value_types == {float}: return 'float', np.array([0.0 if is_null else v for v, is_null in zip(values, null_mask)], dtype=float), null_mask
+    return None
+
+def write_columnar_bundle(df, bundle_dir, metadata=None):
+    """Atomically writes df as a columnar bundle. Returns False (writing nothing) if a column can't be encoded."""
+    encoded_columns = []
+    for col in df.columns:
+        encoded = _encode_bundle_column(df[col])
+        if encoded is None:
+            print(f"Info (Columnar Bundle): Column '{col}' ({df[col].dtype}) can't be stored exactly. Skipping bundle {bundle_dir}.")
+            return False
+        encoded_columns.append((col, str(df[col].dtype)) + encoded)
+
+    tmp_dir = f"{bundle_dir}.tmp{os.getpid()}-{threading.get_ident()}" # Unique per writer (process and thread)
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    manifest = {'version': COLUMNAR_BUNDLE_VERSION, 'pandas_version': pd.__version__, 'n_rows': len(df), 'columns': [], 'metadata': metadata or {}}
+    for i, (col, dtype_name, encoding, values_array, null_mask) in enumerate(encoded_columns):
+        np.save(os.path.join(tmp_dir, f"col{i}.npy"), values_array, allow_pickle=False)
+        if null_mask is not None: np.save(os.path.join(tmp_dir, f"col{i}_null.npy"), null_mask, allow_pickle=False)
+        manifest['columns'].append({'name': col, 'file': f"col{i}", 'dtype': dtype_name, 'encoding': encoding, 'has_nulls': null_mask is not None})
+    with open(os.path.join(tmp_dir, 'manifest.json'), 'w', encoding='utf-8') as f: json.dump(manifest, f)
+    shutil.rmtree(bundle_dir, ignore_errors=True)
+    try: os.replace(tmp_dir, bundle_dir)
+    except OSError: # e.g. another writer published the same bundle first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return True
+
+def read_columnar_bundle(bundle_dir):
+    """Reads a columnar bundle (numeric columns memory-mapped). Returns (df, metadata), or (None, None) if absent/invalid."""
+    manifest_fp = os.path.join(bundle_dir, 'manifest.json')
+    if not os.path.exists(manifest_fp): return None, None
+    try:
+        with open(manifest_fp, 'r', encoding='utf-8') as f: manifest = json.load(f)
+        if manifest.get('version') != COLUMNAR_BUNDLE_VERSION or manifest.get('pandas_version') != pd.__version__: return None, None
+        columns = {}
+        for col_info in manifest['columns']:
+            values_array = np.load(os.path.join(bundle_dir, col_info['file'] + '.npy'), mmap_mode='r', allow_pickle=False)
+            if col_info['encoding'] != 'native':
+                values_array = values_array.astype(object)
+                if col_info['has_nulls']:
+                    values_array[np.load(os.path.join(bundle_dir, col_info['file'] + '_null.npy'), allow_pickle=False)] = None
+                if col_info['dtype'] != 'object': values_array = pd.array(values_array, dtype=col_info['dtype']) # e.g. pandas 'str' columns
+            columns[col_info['name']] = values_array
+        df = pd.DataFrame(columns, index=pd.RangeIndex(manifest['n_rows']))
+        return df, manifest['metadata']
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Warning (Columnar Bundle): Could not read {bundle_dir}: {e}")
+        return None, None
+
+# --- Calculation Stages ---
+# Player stats workbook columns carried through to the output
+PLAYER_API_ID_COL = 'Player API ID'
+PLAYER_ID_COL_EXCEL = 'player_id' # This seems to be your internal MongoDB ID from the merge script
+PLAYER_DISPLAY_NAME_COL = 'player_display_name'
+PLAYER_PRICE_COL = 'player_price'
+PLAYER_IMAGE_COL = 'player_image'
+
+# MODIFIED: Added 'OpponentTeamShortCode' to output columns
+PLAYER_OUTPUT_COLUMNS = [
+    'Player Name', 'Team Name', 'Team API ID', 'Team Short Code',
+    'OpponentTeamApiId', 'OpponentTeamShortCode',
+    'Player API ID', 'player_id', PLAYER_DISPLAY_NAME_COL, PLAYER_PRICE_COL, PLAYER_IMAGE_COL, 'TotalPoints'
+]
+FIXTURE_GROUP_COLUMNS = ['fixture_id', 'GW', 'MatchIdentifier', 'Date']
+
+# --- FDR stage (all fixtures at once, as arrays) ---
+def get_previous_match_indices(fixtures):
+    """Index of the home and of the away team's previous fixture in schedule order (-1 for a team's first match)."""
+    n_fixtures = len(fixtures)
+    side_teams = np.array([fix['home_team_canonical'] for fix in fixtures] + [fix['away_team_canonical'] for fix in fixtures], dtype=object)
+    side_fixtures = np.tile(np.arange(n_fixtures), 2)
+    order = np.argsort(side_fixtures, kind='stable') # Schedule order; a fixture's two teams differ, so their order doesn't matter
+    previous = pd.Series(side_fixtures[order]).groupby(side_teams[order]).shift(1).fillna(-1).astype(int).to_numpy()
+    previous_by_side = np.empty(2 * n_fixtures, dtype=int)
+    previous_by_side[order] = previous
+    return previous_by_side[:n_fixtures], previous_by_side[n_fixtures:]
+
+def calculate_fatigue_impacts(team_names, rest_days, cross_country, has_last_match):
+    """Fatigue impact per team from rest days since its last match (+5 for an east/west coast trip); 0 without a last match."""
+    fatigue = np.select([rest_days >= 7, rest_days >= 5, rest_days >= 3, rest_days == 2], [-10, -5, 0, 8], default=15) + np.where(cross_country, 5, 0)
+    negative_rest = has_last_match & (rest_days < 0)
+    for i in np.flatnonzero(negative_rest): print(f"Warning (Fatigue): Negative rest days for {team_names[i]}. Max fatigue assigned.")
+    return np.where(has_last_match, np.where(negative_rest, 15, fatigue), 0)
+
+def calculate_outright_fdr_arrays(fixtures, team_strengths, selected_indices=None):
+    """Outright FDR and its components (opponent strength, venue and fatigue impact) for every fixture as arrays.
+    Rest days and travel come from the whole schedule; with selected_indices only those fixtures are returned."""
+    previous_home, previous_away = get_previous_match_indices(fixtures)
+    if selected_indices is None: selected_indices = np.arange(len(fixtures))
+    selected_indices = np.asarray(selected_indices, dtype=int)
+    dates = np.array([fix['date_dt'] for fix in fixtures], dtype='datetime64[D]')
+    stadium_coasts = np.array([STADIUM_COASTS.get(normalize_stadium_name(fix['stadium']), 0) for fix in fixtures])
+    venue_home_teams = get_venue_home_teams(TEAM_NAME_MAPPING)
+
+    selected = [fixtures[i] for i in selected_indices]
+    home_teams = np.array([fix['home_team_canonical'] for fix in selected], dtype=object)
+    away_teams = np.array([fix['away_team_canonical'] for fix in selected], dtype=object)
+    venue_teams = np.array([venue_home_teams.get(normalize_stadium_name(fix['stadium'])) for fix in selected], dtype=object)
+    venue_is_home, venue_is_away = venue_teams == home_teams, venue_teams == away_teams
+    outright = {'home_strength_metric': [team_strengths.get(team_c, 10.0) for team_c in home_teams],
+                'away_strength_metric': [team_strengths.get(team_c, 10.0) for team_c in away_teams],
+                'venue_impact_home': np.where(venue_is_home, -12, np.where(venue_is_away, 8, 0)),
+                'venue_impact_away': np.where(venue_is_home, 8, np.where(venue_is_away, -12, 0))}
+    for side, team_names, previous in (('home', home_teams, previous_home[selected_indices]), ('away', away_teams, previous_away[selected_indices])):
+        has_last_match = previous >= 0
+        rest_days = (dates[selected_indices] - dates[previous]).astype(int) # previous = -1 rows are masked out below
+        current_coast, last_coast = stadium_coasts[selected_indices], stadium_coasts[previous]
+        cross_country = has_last_match & (current_coast > 0) & (last_coast > 0) & (current_coast != last_coast)
+        outright[f'fatigue_impact_{side}'] = calculate_fatigue_impacts(team_names, rest_days, cross_country, has_last_match)
+
+    weights = np.array([[OUTRIGHT_COMPONENT_WEIGHTS[key] for key in OUTRIGHT_WEIGHT_KEYS]])
+    for side, components in get_outright_fdr_components(outright).items():
+        outright[f'{side}_fdr_outright'] = weight_outright_fdr_components(components, weights)[0]
+    return outright
+
+def get_outright_fdr_components(outright):
+    """Stacked [base strength, venue impact, fatigue impact] x fixtures per side, from calculate_outright_fdr_arrays output."""
+    return {'home': np.array([outright['away_strength_metric'], outright['venue_impact_home'], outright['fatigue_impact_home']], dtype=float),
+            'away': np.array([outright['home_strength_metric'], outright['venue_impact_away'], outright['fatigue_impact_away']], dtype=float)}
+
+def calculate_fdr_frame(fixtures, team_strengths, cs_odds_lookup, selected_indices=None):
+    """fdr_final_df (one row per fixture) computed over arrays. Only the correct-score lookups run per fixture.
+    With selected_indices only those fixtures get rows."""
+    if selected_indices is None: selected_indices = range(len(fixtures))
+    selected = [fixtures[i] for i in selected_indices]
+    if not selected: return pd.DataFrame()
+    outright = calculate_outright_fdr_arrays(fixtures, team_strengths, selected_indices)
+    h_fdr_out, a_fdr_out = outright['home_fdr_outright'], outright['away_fdr_outright']
+
+    cs_columns = {key: [None] * len(selected) for key in ('home_fdr_cs', 'away_fdr_cs', 'prob_home_win_cs', 'prob_draw_cs', 'prob_away_win_cs',
+                                                          'home_afd_cs', 'home_dfd_cs', 'away_afd_cs', 'away_dfd_cs')}
+    has_cs = np.zeros(len(selected), dtype=bool)
+    for i, fix in enumerate(selected):
+        fixture_score_matrix = get_fixture_score_matrix(cs_odds_lookup, fix['home_team_canonical'], fix['away_team_canonical'], fix['date_str'])
+        if fixture_score_matrix is None: continue
+        has_cs[i] = True
+        (cs_columns['home_fdr_cs'][i], cs_columns['away_fdr_cs'][i], cs_columns['prob_home_win_cs'][i], cs_columns['prob_draw_cs'][i],
+         cs_columns['prob_away_win_cs'][i]) = calculate_correct_score_fdr_values(fixture_score_matrix)
+        cs_columns['home_afd_cs'][i], cs_columns['home_dfd_cs'][i], cs_columns['away_afd_cs'][i], cs_columns['away_dfd_cs'][i] = calculate_match_afd_dfd_from_cs_odds(fixture_score_matrix)
+    h_fdr_cs = np.array([np.nan if v is None else v for v in cs_columns['home_fdr_cs']], dtype=float)
+    a_fdr_cs = np.array([np.nan if v is None else v for v in cs_columns['away_fdr_cs']], dtype=float)
+    final_h_fdr = np.clip(np.where(has_cs, FINAL_FDR_WEIGHTS['outright'] * h_fdr_out + FINAL_FDR_WEIGHTS['correct_score'] * h_fdr_cs, h_fdr_out), 1, 99)
+    final_a_fdr = np.clip(np.where(has_cs, FINAL_FDR_WEIGHTS['outright'] * a_fdr_out + FINAL_FDR_WEIGHTS['correct_score'] * a_fdr_cs, a_fdr_out), 1, 99)
+
+    fdr_diff = np.abs(final_h_fdr - final_a_fdr)
+    band_index = np.minimum(np.searchsorted([band[0] for band in MATCH_TIER_BANDS[:-1]], fdr_diff, side='left'), len(MATCH_TIER_BANDS) - 1)
+    low_tiers = np.array([TIER_DISPLAY_MAPPING.get(band[1], "Average Difficulty") for band in MATCH_TIER_BANDS], dtype=object)[band_index]
+    high_tiers = np.array([TIER_DISPLAY_MAPPING.get(band[2], "Difficult") for band in MATCH_TIER_BANDS], dtype=object)[band_index]
+    lower_fdr_is_home = final_h_fdr <= final_a_fdr
+
+    home_details = [TEAM_DETAILS.get(fix['home_team_canonical'], DEFAULT_TEAM_DETAIL) for fix in selected]
+    away_details = [TEAM_DETAILS.get(fix['away_team_canonical'], DEFAULT_TEAM_DETAIL) for fix in selected]
+    return pd.DataFrame({
+        'fixture_id': [fix.get('fixture_id', 'N/A_ID') for fix in selected], 'GW': [fix.get('GW', 'N/A_GW') for fix in selected],
+        'date_str': [fix['date_str'] for fix in selected], 'time_str': [fix['time_str'] for fix in selected],
+        'group': [fix['group'] for fix in selected], 'stadium': [fix['stadium'] for fix in selected],
+        'home_team_canonical': [fix['home_team_canonical'] for fix in selected], 'home_team_short_code': [d['short_code'] for d in home_details],
+        'home_team_api_id': [d.get('api_id') for d in home_details], 'home_team_logo': [d['image'] for d in home_details],
+        'away_team_canonical': [fix['away_team_canonical'] for fix in selected], 'away_team_short_code': [d['short_code'] for d in away_details],
+        'away_team_api_id': [d.get('api_id') for d in away_details], 'away_team_logo': [d['image'] for d in away_details],
+        'final_home_fdr': np.round(final_h_fdr, 1), 'final_away_fdr': np.round(final_a_fdr, 1),
+        'home_tier_display': np.where(lower_fdr_is_home, low_tiers, high_tiers).tolist(), 'away_tier_display': np.where(lower_fdr_is_home, high_tiers, low_tiers).tolist(),
+        'fdr_difference': np.round(fdr_diff, 1), 'match_competitiveness_label': [MATCH_TIER_BANDS[b][3] for b in band_index],
+        'fdr_calculation_method': np.where(has_cs, "CombinedFDR", "OutrightFDR").tolist(),
+        'home_fdr_outright': np.round(h_fdr_out, 1), 'away_fdr_outright': np.round(a_fdr_out, 1),
+        'home_fdr_cs': [None if v is None else round(v, 1) for v in cs_columns['home_fdr_cs']],
+        'away_fdr_cs': [None if v is None else round(v, 1) for v in cs_columns['away_fdr_cs']],
+        'home_strength_metric': [round(v, 1) for v in outright['home_strength_metric']], 'away_strength_metric': [round(v, 1) for v in outright['away_strength_metric']],
+        'venue_impact_home': outright['venue_impact_home'], 'venue_impact_away': outright['venue_impact_away'],
+        'fatigue_impact_home': outright['fatigue_impact_home'], 'fatigue_impact_away': outright['fatigue_impact_away'],
+        'prob_home_win_cs': cs_columns['prob_home_win_cs'], 'prob_draw_cs': cs_columns['prob_draw_cs'], 'prob_away_win_cs': cs_columns['prob_away_win_cs'],
+        'home_afd_cs': cs_columns['home_afd_cs'], 'home_dfd_cs': cs_columns['home_dfd_cs'], 'away_afd_cs': cs_columns['away_afd_cs'], 'away_dfd_cs': cs_columns['away_dfd_cs'],
+    })
+
+# Columns of the cleaned player table used by the calculation (and stored in the columnar cache)
+PLAYER_STATS_COLUMNS = [
+    'Player Name', PLAYER_API_ID_COL, PLAYER_ID_COL_EXCEL, PLAYER_DISPLAY_NAME_COL, PLAYER_PRICE_COL, PLAYER_IMAGE_COL,
+    'Position', 'Team_Canonical', 'PositionCategory', 'Goals', 'Assists'
+]
+
+def _get_player_stats_cache_key(player_stats_fp):
+    """Key for the player stats cache: workbook size + content hash, the team mapping/details used to canonicalize it,
+    and the cleaning version and columns of the cached table."""
+    _, size, sha = _get_file_digest(player_stats_fp)
+    mapping_digest = hashlib.sha256(json.dumps([TEAM_NAME_MAPPING, TEAM_DETAILS], sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    key_source = f"{PLAYER_STATS_CACHE_VERSION}|{PLAYER_STATS_COLUMNS}|{os.path.abspath(player_stats_fp)}|{size}|{sha}|{mapping_digest}"
+    return hashlib.sha256(key_source.encode('utf-8')).hexdigest()[:24]
+
+def load_player_stats(player_stats_fp, use_cache=True):
+    """Loads the cleaned player stats table. Returns (player_df, error_message).
+
+    The cleaned table is kept as a columnar bundle under PLAYER_STATS_CACHE_DIR and only rebuilt from the
+    workbook when its content (or TEAM_NAME_MAPPING/TEAM_DETAILS, or PLAYER_STATS_CACHE_VERSION) changes; otherwise typed
+    columns are loaded directly.
+    """
+    cache_key = None
+    if use_cache and os.path.exists(player_stats_fp):
+        cache_key = _get_player_stats_cache_key(player_stats_fp)
+        player_df, _ = read_columnar_bundle(os.path.join(PLAYER_STATS_CACHE_DIR, cache_key))
+        metrics.record_cache('player_stats_bundle', player_df is not None)
+        if player_df is not None:
+            print(f"Info: Loaded {len(player_df)} players for '{player_stats_fp}' from columnar cache.")
+            return player_df, None
+
+    player_df, err_msg = _load_player_stats_from_excel(player_stats_fp)
+    if err_msg or cache_key is None: return player_df, err_msg
     try:
-        player_df_raw = pd.read_excel(PLAYER_STATS_FP, sheet_name='Sheet1')
-        print(f"Info: Columns found in '{PLAYER_STATS_FP}': {player_df_raw.columns.tolist()}")
+        if write_columnar_bundle(player_df, os.path.join(PLAYER_STATS_CACHE_DIR, cache_key)):
+            for stale_entry in os.listdir(PLAYER_STATS_CACHE_DIR):
+                if stale_entry != cache_key and '.tmp' not in stale_entry: shutil.rmtree(os.path.join(PLAYER_STATS_CACHE_DIR, stale_entry), ignore_errors=True)
+            print(f"Info: Rebuilt player stats columnar cache for '{player_stats_fp}'.")
+    except OSError as e: print(f"Warning: Could not write player stats cache to '{PLAYER_STATS_CACHE_DIR}': {e}")
+    return player_df, None
+
+def _load_player_stats_from_excel(player_stats_fp):
+    """Reads and cleans the player stats workbook. Returns (player_df, error_message)."""
+    try:
+        with metrics.stage_timer('player_stats_read_excel'):
+            player_df_raw = pd.read_excel(player_stats_fp, sheet_name='Sheet1')
+        print(f"Info: Columns found in '{player_stats_fp}': {player_df_raw.columns.tolist()}")
         player_team_column_name = 'Team Name'
         if player_team_column_name not in player_df_raw.columns:
             player_team_column_name = 'Team'
             if player_team_column_name not in player_df_raw.columns:
-                err_msg = f"CRITICAL: Excel file '{PLAYER_STATS_FP}' missing team column (tried 'Team Name' and 'Team')."
+                err_msg = f"CRITICAL: Excel file '{player_stats_fp}' missing team column (tried 'Team Name' and 'Team')."
                 print(err_msg); return None, err_msg
 
-        print(f"Info: Using column '{player_team_column_name}' for player teams from '{PLAYER_STATS_FP}'.")
-        player_df_raw['Team_Canonical'] = player_df_raw[player_team_column_name].apply(
-            lambda x: get_canonical_team_name_robust(str(x).strip(), TEAM_NAME_MAPPING)
-        )
-
-        player_api_id_col = 'Player API ID'
-        player_id_col_excel = 'player_id' # This seems to be your internal MongoDB ID from the merge script
-        player_display_name_col = 'player_display_name'
-        player_price_col = 'player_price'
-        player_image_col = 'player_image'
+        print(f"Info: Using column '{player_team_column_name}' for player teams from '{player_stats_fp}'.")
+        # Resolve each distinct team string once rather than once per player row
+        player_team_names = player_df_raw[player_team_column_name].astype(str).str.strip()
+        team_name_resolver = get_team_name_resolver(TEAM_NAME_MAPPING)
+        player_df_raw['Team_Canonical'] = player_team_names.map({name: team_name_resolver.resolve(name) for name in player_team_names.unique()})
 
         cols_from_excel_to_ensure = [
-            player_api_id_col, player_id_col_excel, player_display_name_col,
-            player_price_col, player_image_col, 'Position', 'Goals', 'Assists', 'Player Name'
+            PLAYER_API_ID_COL, PLAYER_ID_COL_EXCEL, PLAYER_DISPLAY_NAME_COL,
+            PLAYER_PRICE_COL, PLAYER_IMAGE_COL, 'Position', 'Goals', 'Assists', 'Player Name'
         ]
         for col_name in cols_from_excel_to_ensure:
             if col_name not in player_df_raw.columns:
-                print(f"Warning: Column '{col_name}' not found in '{PLAYER_STATS_FP}'. It will be created with null values.")
+                print(f"Warning: Column '{col_name}' not found in '{player_stats_fp}'. It will be created with null values.")
                 player_df_raw[col_name] = None
-            elif col_name in [player_api_id_col, player_id_col_excel]:
+            elif col_name in [PLAYER_API_ID_COL, PLAYER_ID_COL_EXCEL]:
                 player_df_raw[col_name] = player_df_raw[col_name].astype(str).str.strip().replace({'nan': None, 'None': None, '':None, 'NA':None})
-            elif col_name == player_price_col:
+            elif col_name == PLAYER_PRICE_COL:
                 if pd.api.types.is_numeric_dtype(player_df_raw[col_name]):
                     player_df_raw[col_name] = player_df_raw[col_name].astype(object).where(player_df_raw[col_name].notna(), None)
                 else:
@@ -907,187 +1223,208 @@ def generate_all_player_points_data():
         essential_cols_check = ['Position', 'Goals', 'Assists', 'Player Name', 'Team_Canonical']
         for col in essential_cols_check:
             if col not in player_df.columns or player_df[col].isnull().all():
-                 err_msg = f"CRITICAL: Essential column '{col}' is missing or all null in '{PLAYER_STATS_FP}' after processing."
+                 err_msg = f"CRITICAL: Essential column '{col}' is missing or all null in '{player_stats_fp}' after processing."
                  print(err_msg); return None, err_msg
 
         player_df['PositionCategory'] = player_df['Position'].apply(get_player_position_category)
         player_df['Goals'] = pd.to_numeric(player_df['Goals'], errors='coerce').fillna(0).astype(int)
         player_df['Assists'] = pd.to_numeric(player_df['Assists'], errors='coerce').fillna(0).astype(int)
+        player_df = player_df[PLAYER_STATS_COLUMNS].reset_index(drop=True)
 
     except FileNotFoundError:
-        err_msg = f"CRITICAL: Player stats file not found at '{PLAYER_STATS_FP}'."
+        err_msg = f"CRITICAL: Player stats file not found at '{player_stats_fp}'."
         print(err_msg); return None, err_msg
     except Exception as e:
-        err_msg = f"CRITICAL: Could not load player stats from '{PLAYER_STATS_FP}': {e}."
+        err_msg = f"CRITICAL: Could not load player stats from '{player_stats_fp}': {e}."
         print(err_msg); return None, err_msg
-
-    team_goals_season_overall = player_df.groupby('Team_Canonical')['Goals'].sum().to_dict()
-    team_assists_season_overall = player_df.groupby('Team_Canonical')['Assists'].sum().to_dict()
-
-    player_points_results_list = []
-    for idx, fdr_match_row in fdr_final_df.iterrows():
-        home_c, away_c, date_s = fdr_match_row['home_team_canonical'], fdr_match_row['away_team_canonical'], fdr_match_row['date_str']
-
-        # Get fixture_id and GW for this match
-        fixture_id_val = fdr_match_row['fixture_id']
-        gw_val = fdr_match_row['GW']
-        match_id_str = f"{home_c} vs {away_c} ({date_s})" # Human-readable identifier
-
-        home_team_api_id_for_match = fdr_match_row['home_team_api_id']
-        away_team_api_id_for_match = fdr_match_row['away_team_api_id']
-        
-        # Details for player's team and opponent team
-        home_team_details = TEAM_DETAILS.get(home_c, DEFAULT_TEAM_DETAIL)
-        away_team_details = TEAM_DETAILS.get(away_c, DEFAULT_TEAM_DETAIL)
-
-        current_match_home_players = player_df[player_df['Team_Canonical'] == home_c]
-        current_match_away_players = player_df[player_df['Team_Canonical'] == away_c]
-
-        score_probs, points_calc_method = {}, ""
-        fixture_key_cs_order1 = (home_c, away_c, date_s)
-        fixture_key_cs_order2 = (away_c, home_c, date_s)
-        cs_match_odds = cs_odds_lookup_for_fdr.get(fixture_key_cs_order1) or cs_odds_lookup_for_fdr.get(fixture_key_cs_order2)
-
-        if cs_match_odds:
-            raw_probs = {}
-            scores_flipped_for_calc = fixture_key_cs_order2 in cs_odds_lookup_for_fdr and fixture_key_cs_order1 not in cs_odds_lookup_for_fdr
-            for score, odd_val in cs_match_odds.items():
-                try:
-                    s_str, o_f = str(score), float(odd_val)
-                    if o_f > 0 and re.match(r"^\d+-\d+$", s_str):
-                        raw_probs[s_str] = 1.0 / o_f
-                except: continue
-            total_raw_p = sum(raw_probs.values())
-            if total_raw_p > 1e-9:
-                if scores_flipped_for_calc:
-                     score_probs = {f"{s.split('-')[1]}-{s.split('-')[0]}": p/total_raw_p for s,p in raw_probs.items()}
-                else:
-                     score_probs = {s: p/total_raw_p for s,p in raw_probs.items()}
-            else: score_probs = {"0-0":1.0}
-            points_calc_method = "CS_Odds"
-            if not score_probs or (len(score_probs) == 1 and "0-0" in score_probs and total_raw_p <= 1e-9) :
-                 h_fdr, a_fdr = fdr_match_row['home_fdr_outright'], fdr_match_row['away_fdr_outright'] # Use outright FDR for xG
-                 xg_h, xg_a = estimate_xg_from_fdr_outrights(h_fdr, a_fdr)
-                 score_probs = get_score_probabilities_poisson(xg_h, xg_a)
-                 points_calc_method = f"Poisson_Fallback_InvalidCS (xG:{xg_h:.1f}-{xg_a:.1f})"
-        else:
-            h_fdr, a_fdr = fdr_match_row['home_fdr_outright'], fdr_match_row['away_fdr_outright'] # Use outright FDR for xG
-            xg_h, xg_a = estimate_xg_from_fdr_outrights(h_fdr, a_fdr)
-            score_probs = get_score_probabilities_poisson(xg_h, xg_a)
-            points_calc_method = f"Poisson (xG:{xg_h:.1f}-{xg_a:.1f})"
-
-        if not score_probs: print(f"Warning: No score probabilities for {match_id_str}. Skipping players."); continue
-
-        team_h_goals_s, team_h_assists_s = team_goals_season_overall.get(home_c,1) or 1, team_assists_season_overall.get(home_c,1) or 1
-        # home_team_details is already defined above
-        for _, p_row in current_match_home_players.iterrows():
-            exp_pts = sum(calculate_player_points_for_specific_score(p_row, int(s.split('-')[0]), int(s.split('-')[1]), team_h_goals_s, team_h_assists_s) * prob for s,prob in score_probs.items() if '-' in s)
-            player_points_results_list.append({
-                'fixture_id': fixture_id_val, 
-                'GW': gw_val,                 
-                'MatchIdentifier': match_id_str,
-                'Date': date_s,
-                'Player Name': p_row.get('Player Name'),
-                'Team Name': home_c,
-                'Team API ID': home_team_details.get('api_id'),
-                'Team Short Code': home_team_details.get('short_code'),
-                'OpponentTeamApiId': away_team_api_id_for_match,
-                'OpponentTeamShortCode': away_team_details.get('short_code'), # MODIFIED: Opponent is away_team
-                'Player API ID': p_row.get(player_api_id_col),
-                'player_id': p_row.get(player_id_col_excel),
-                'player_display_name': p_row.get(player_display_name_col),
-                'player_price': p_row.get(player_price_col),
-                'player_image': p_row.get(player_image_col),
-                'ExpectedPoints': exp_pts,
-                'PointsCalcMethod': points_calc_method
-            })
-
-        team_a_goals_s, team_a_assists_s = team_goals_season_overall.get(away_c,1) or 1, team_assists_season_overall.get(away_c,1) or 1
-        # away_team_details is already defined above
-        for _, p_row in current_match_away_players.iterrows():
-            exp_pts = sum(calculate_player_points_for_specific_score(p_row, int(s.split('-')[1]), int(s.split('-')[0]), team_a_goals_s, team_a_assists_s) * prob for s,prob in score_probs.items() if '-' in s)
-            player_points_results_list.append({
-                'fixture_id': fixture_id_val, 
-                'GW': gw_val,                 
+    return player_df, None
+
+def calculate_fixture_player_rows(fdr_match_row, players_by_team, team_goals_season_overall, team_assists_season_overall, cs_odds_lookup):
+    """Calculates the expected-points rows for both squads in one fixture (one row of fdr_final_df)."""
+    home_c, away_c, date_s = fdr_match_row['home_team_canonical'], fdr_match_row['away_team_canonical'], fdr_match_row['date_str']
+
+    # Get fixture_id and GW for this match
+    fixture_id_val = fdr_match_row['fixture_id']
+    gw_val = fdr_match_row['GW']
+    match_id_str = f"{home_c} vs {away_c} ({date_s})" # Human-readable identifier
+
+    home_team_api_id_for_match = fdr_match_row['home_team_api_id']
+    away_team_api_id_for_match = fdr_match_row['away_team_api_id']
+
+    # Details for player's team and opponent team
+    home_team_details = TEAM_DETAILS.get(home_c, DEFAULT_TEAM_DETAIL)
+    away_team_details = TEAM_DETAILS.get(away_c, DEFAULT_TEAM_DETAIL)
+
+    empty_players = players_by_team.get(None)
+    current_match_home_players = players_by_team.get(home_c, empty_players)
+    current_match_away_players = players_by_team.get(away_c, empty_players)
+
+    fixture_score_matrix = get_fixture_score_matrix(cs_odds_lookup, home_c, away_c, date_s)
+
+    if fixture_score_matrix is not None and fixture_score_matrix.total_inv_odds > 1e-9:
+        score_prob_matrix = fixture_score_matrix.matrix
+        points_calc_method = "CS_Odds"
+    else:
+        h_fdr, a_fdr = fdr_match_row['home_fdr_outright'], fdr_match_row['away_fdr_outright'] # Use outright FDR for xG
+        xg_h, xg_a = estimate_xg_from_fdr_outrights(h_fdr, a_fdr)
+        score_prob_matrix = get_poisson_score_grid(xg_h, xg_a)
+        points_calc_method = f"Poisson_Fallback_InvalidCS (xG:{xg_h:.1f}-{xg_a:.1f})" if fixture_score_matrix is not None else f"Poisson (xG:{xg_h:.1f}-{xg_a:.1f})"
+
+    fixture_rows = []
+    side_specs = [
+        (current_match_home_players, home_c, home_team_details, away_team_api_id_for_match, away_team_details, score_prob_matrix),
+        (current_match_away_players, away_c, away_team_details, home_team_api_id_for_match, home_team_details, score_prob_matrix.T),
+    ]
+    for side_players, team_c, team_details, opp_api_id, opp_details, side_prob_matrix in side_specs:
+        team_goals_s, team_assists_s = team_goals_season_overall.get(team_c,1) or 1, team_assists_season_overall.get(team_c,1) or 1
+        side_exp_pts = calculate_expected_points_vectorized(side_players, side_prob_matrix, team_goals_s, team_assists_s)
+        side_columns = zip(side_players['Player Name'].tolist(), side_players[PLAYER_API_ID_COL].tolist(), side_players[PLAYER_ID_COL_EXCEL].tolist(),
+                           side_players[PLAYER_DISPLAY_NAME_COL].tolist(), side_players[PLAYER_PRICE_COL].tolist(), side_players[PLAYER_IMAGE_COL].tolist(),
+                           side_exp_pts.tolist())
+        for p_name, p_api_id, p_id, p_display_name, p_price, p_image, exp_pts in side_columns:
+            fixture_rows.append({
+                'fixture_id': fixture_id_val,
+                'GW': gw_val,
                 'MatchIdentifier': match_id_str,
                 'Date': date_s,
-                'Player Name': p_row.get('Player Name'),
-                'Team Name': away_c,
-                'Team API ID': away_team_details.get('api_id'),
-                'Team Short Code': away_team_details.get('short_code'),
-                'OpponentTeamApiId': home_team_api_id_for_match,
-                'OpponentTeamShortCode': home_team_details.get('short_code'), # MODIFIED: Opponent is home_team
-                'Player API ID': p_row.get(player_api_id_col),
-                'player_id': p_row.get(player_id_col_excel),
-                'player_display_name': p_row.get(player_display_name_col),
-                'player_price': p_row.get(player_price_col),
-                'player_image': p_row.get(player_image_col),
+                'Player Name': p_name,
+                'Team Name': team_c,
+                'Team API ID': team_details.get('api_id'),
+                'Team Short Code': team_details.get('short_code'),
+                'OpponentTeamApiId': opp_api_id,
+                'OpponentTeamShortCode': opp_details.get('short_code'),
+                'Player API ID': p_api_id,
+                'player_id': p_id,
+                'player_display_name': p_display_name,
+                'player_price': p_price,
+                'player_image': p_image,
                 'ExpectedPoints': exp_pts,
                 'PointsCalcMethod': points_calc_method
             })
+    return fixture_rows
 
-    if not player_points_results_list:
-        print("Warning: No player points were calculated.")
-        return [], "No player points calculated."
-    player_points_df = pd.DataFrame(player_points_results_list)
-    if player_points_df.empty:
-        print("Warning: Player points DataFrame is empty after processing. No data to return.")
-        return [], "Player points DataFrame is empty after processing."
-
-    player_points_df['ExpectedPoints'] = pd.to_numeric(player_points_df['ExpectedPoints'], errors='coerce').fillna(0.0)
-    player_points_df['BonusPoints'] = 0
-    
+def get_bonus_group_columns(player_points_df):
     group_cols_for_bonus = ['fixture_id', 'GW']
     if 'fixture_id' in player_points_df.columns and player_points_df['fixture_id'].astype(str).str.contains("N/A_ID", na=False).any():
         print("Warning: Fallback fixture_ids detected. Using MatchIdentifier for bonus point grouping uniqueness.")
         group_cols_for_bonus = ['MatchIdentifier']
+    return group_cols_for_bonus
 
+def assign_bonus_points(player_points_df, group_cols_for_bonus):
+    """Awards 3/2/1 bonus points to the top three ExpectedPoints in each match group (in place).
+    One group-wise ranking pass; tied players are ranked in row order, like the scenario path."""
+    bonus_ranks = player_points_df.groupby(group_cols_for_bonus)['ExpectedPoints'].rank(method='first', ascending=False)
+    player_points_df['BonusPoints'] = (4 - bonus_ranks).clip(lower=0).fillna(0).astype(int) # Rank 1/2/3 -> 3/2/1, rest (and ungrouped NaN keys) -> 0
 
-    for _, match_group_df in player_points_df.groupby(group_cols_for_bonus):
-        sorted_match_players = match_group_df.sort_values('ExpectedPoints', ascending=False)
-        if len(sorted_match_players) >= 1: player_points_df.loc[sorted_match_players.index[0], 'BonusPoints'] = 3
-        if len(sorted_match_players) >= 2: player_points_df.loc[sorted_match_players.index[1], 'BonusPoints'] = 2
-        if len(sorted_match_players) >= 3: player_points_df.loc[sorted_match_players.index[2], 'BonusPoints'] = 1
-
+def finalize_player_points(player_points_df, group_cols_for_bonus):
+    """Adds BonusPoints and TotalPoints to the raw expected-points rows (in place)."""
+    player_points_df['ExpectedPoints'] = pd.to_numeric(player_points_df['ExpectedPoints'], errors='coerce').fillna(0.0)
+    assign_bonus_points(player_points_df, group_cols_for_bonus)
     player_points_df['TotalPoints'] = round(player_points_df['ExpectedPoints'] + player_points_df['BonusPoints'], 2)
 
-    grouped_data = []
-    # MODIFIED: Added 'OpponentTeamShortCode' to output columns
-    player_output_columns = [
-        'Player Name', 'Team Name', 'Team API ID', 'Team Short Code', 
-        'OpponentTeamApiId', 'OpponentTeamShortCode', 
-        'Player API ID', 'player_id', player_display_name_col, player_price_col, player_image_col, 'TotalPoints'
-    ]
-    for col in player_output_columns: 
+def group_player_points_by_fixture(player_points_df):
+    """Cleans the output columns (NaN -> None) and groups the players into one dict per fixture."""
+    fixture_groups, output_values = _prepare_fixture_output(player_points_df)
+    return [_fixture_records(group_key, positions, output_values) for group_key, positions in fixture_groups]
+
+def clean_player_output_columns(player_points_df):
+    """NaN (and 'nan'/'None'/''/'NA' strings) -> None in the output columns, in place; missing columns are added as None."""
+    for col in PLAYER_OUTPUT_COLUMNS:
         if col not in player_points_df.columns:
             print(f"Final Check Warning: Column '{col}' missing from player_points_df. Adding with None.")
             player_points_df[col] = None
-        else: 
+        else:
             if pd.api.types.is_numeric_dtype(player_points_df[col]):
                  player_points_df[col] = player_points_df[col].astype(object).where(player_points_df[col].notna(), None)
             elif player_points_df[col].dtype == 'object':
                  player_points_df[col] = player_points_df[col].replace({np.nan: None, 'nan': None, 'None': None, '':None, 'NA':None})
 
-
-    for (fix_id_grp, gw_grp, match_id_grp, date_grp), group_df_iterable in player_points_df.groupby(['fixture_id', 'GW', 'MatchIdentifier', 'Date']):
-        group_df = group_df_iterable.copy()
-        for col in player_output_columns:
-            if col in group_df.columns:
-                if pd.api.types.is_numeric_dtype(group_df[col]):
-                    group_df[col] = group_df[col].astype(object).where(group_df[col].notna(), None)
-                elif group_df[col].dtype == 'object':
-                    group_df[col] = group_df[col].replace({np.nan: None, 'nan': None, 'None': None, '':None, 'NA':None})
-            else: group_df[col] = None
-
-        match_info = {
-            "fixture_id": fix_id_grp,        
-            "GW": gw_grp,                    
-            "MatchIdentifier": match_id_grp, 
-            "Date": date_grp,                
-            "players": group_df[player_output_columns].to_dict(orient='records')
-        }
-        grouped_data.append(match_info)
-
+def _prepare_fixture_output(player_points_df):
+    """Cleans the output columns once. Returns ([(fixture group key, row positions)] in groupby order, [values list per output column])."""
+    clean_player_output_columns(player_points_df)
+    fixture_groups = list(player_points_df.groupby(FIXTURE_GROUP_COLUMNS).indices.items())
+    return fixture_groups, [player_points_df[col].tolist() for col in PLAYER_OUTPUT_COLUMNS]
+
+def _fixture_records(group_key, positions, output_values):
+    fix_id_grp, gw_grp, match_id_grp, date_grp = group_key
+    return {
+        "fixture_id": fix_id_grp,
+        "GW": gw_grp,
+        "MatchIdentifier": match_id_grp,
+        "Date": date_grp,
+        "players": [dict(zip(PLAYER_OUTPUT_COLUMNS, row)) for row in zip(*([values[i] for i in positions] for values in output_values))]
+    }
+
+def iter_player_points_by_fixture(player_points_df):
+    """Generator version of group_player_points_by_fixture_json: yields (fixture dict, fixture JSON fragment) per
+    fixture, same values and order. Output columns are sliced one fixture group at a time, so the first fixture is
+    ready without first copying every output column into a list."""
+    clean_player_output_columns(player_points_df)
+    output_df = player_points_df[PLAYER_OUTPUT_COLUMNS]
+    for group_key, positions in player_points_df.groupby(FIXTURE_GROUP_COLUMNS).indices.items():
+        output_values = [values.tolist() for _, values in output_df.iloc[positions].items()]
+        players_json = ','.join(_JSON_PLAYER_TEMPLATE % row for row in zip(*([encode_json_value(value) for value in values] for values in output_values)))
+        yield _fixture_records(group_key, range(len(positions)), output_values), _JSON_FIXTURE_TEMPLATE % (*map(encode_json_value, group_key), players_json)
+
+# --- JSON output (written straight from the column arrays) ---
+_JSON_FIXTURE_TEMPLATE = '{"fixture_id":%s,"GW":%s,"MatchIdentifier":%s,"Date":%s,"players":[%s]}'
+_JSON_PLAYER_TEMPLATE = '{' + ','.join(json.dumps(col, ensure_ascii=False).replace('%', '%%') + ':%s' for col in PLAYER_OUTPUT_COLUMNS) + '}'
+
+def encode_json_value(value):
+    """Compact JSON for one cleaned output value; NaN/inf and None -> null, numpy scalars as their Python values."""
+    if value is None: return 'null'
+    if type(value) is str: return json.encoder.encode_basestring(value) # Same escaping as json.dumps(ensure_ascii=False)
+    if hasattr(value, 'item'): value = value.item()
+    if isinstance(value, float) and not math.isfinite(value): return 'null'
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+def group_player_points_by_fixture_json(player_points_df):
+    """group_player_points_by_fixture plus each fixture's compact JSON text. Returns (grouped_data, json_fragments).
+    The cleanup runs once on the full frame and every output column is JSON-encoded once, then joined per fixture."""
+    fixture_groups, output_values = _prepare_fixture_output(player_points_df)
+    player_json = [_JSON_PLAYER_TEMPLATE % row for row in zip(*([encode_json_value(value) for value in values] for values in output_values))]
+    grouped_data, json_fragments = [], []
+    for group_key, positions in fixture_groups:
+        grouped_data.append(_fixture_records(group_key, positions, output_values))
+        json_fragments.append(_JSON_FIXTURE_TEMPLATE % (*map(encode_json_value, group_key), ','.join(player_json[i] for i in positions)))
+    return grouped_data, json_fragments
+
+def join_fixture_json(json_fragments):
+    """UTF-8 JSON array body from per-fixture JSON fragments."""
+    return ('[' + ','.join(json_fragments) + ']').encode('utf-8')
+
+# Precompressed forms of the JSON body, keyed by Content-Encoding; br only with the optional brotli package
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '9')) # 11 is ~25% smaller but ~100x slower
+
+def compress_json_body(body):
+    """{content coding: compressed body} for gzip and, if brotli is installed, br. Same body -> same bytes (gzip mtime=0)."""
+    with metrics.stage_timer('compress_json_body'):
+        encoded_bodies = {'gzip': gzip.compress(body, GZIP_LEVEL, mtime=0)}
+        try: import brotli
+        except ImportError: return encoded_bodies
+        encoded_bodies['br'] = brotli.compress(bytes(body), quality=BROTLI_QUALITY)
+    return encoded_bodies
+
+def encode_fixture_json_parts(match_info):
+    """Returns (fixture JSON up to its players array, [each player's JSON]) for one grouped fixture dict.
+    head + ','.join(players) + ']}' is the fixture's group_player_points_by_fixture_json fragment."""
+    head = _JSON_FIXTURE_TEMPLATE[:-len('%s]}')] % tuple(encode_json_value(match_info[col]) for col in FIXTURE_GROUP_COLUMNS)
+    return head, [_JSON_PLAYER_TEMPLATE % tuple(encode_json_value(player[col]) for col in PLAYER_OUTPUT_COLUMNS) for player in match_info['players']]
+
+def record_fdr_metrics(fdr_results_list):
+    metrics.record_rows('fdr', len(fdr_results_list))
+    for method, count in pd.Series([fdr_row['fdr_calculation_method'] for fdr_row in fdr_results_list], dtype=object).value_counts().items():
+        metrics.record_method('fdr', method, count)
+
+def record_points_metrics(fixture_player_rows):
+    """Counts player rows and each fixture's points method (the xG suffix stripped, e.g. Poisson_Fallback_InvalidCS).
+    Recorded from the returned rows so fixtures evaluated on the process pool are counted too."""
+    metrics.record_rows('points_loop', sum(len(fixture_rows) for fixture_rows in fixture_player_rows))
+    for fixture_rows in fixture_player_rows:
+        if fixture_rows: metrics.record_method('points', fixture_rows[0]['PointsCalcMethod'].split(' ')[0])
+
+def print_points_method_counts(player_points_df):
     print("\nPlayer points calculated using methods for matches (from point_calculator):")
     if 'PointsCalcMethod' in player_points_df.columns:
         if 'fixture_id' in player_points_df.columns and 'GW' in player_points_df.columns and 'MatchIdentifier' in player_points_df.columns:
@@ -1101,8 +1438,629 @@ def generate_all_player_points_data():
 
     else: print("Could not log method counts as 'PointsCalcMethod' column was not in the final player DataFrame.")
 
-    print(f"Successfully generated grouped player point data for {len(grouped_data)} matches in calculation engine.")
-    return grouped_data, None
+# --- Parallel Fixture Evaluation ---
+_PROCESS_POOLS: Dict[str, Dict[str, Any]] = {} # Key: pool name, Value: {'key', 'workers', 'executor'}
+_PROCESS_POOLS_LOCK = threading.Lock()
+_FIXTURE_WORKER_CONTEXT: Dict[str, Any] = {} # Set once per worker process by _init_fixture_worker
+
+def _init_fixture_worker(players_by_team, team_goals_season_overall, team_assists_season_overall):
+    """ProcessPoolExecutor initializer: receives the player table once per worker instead of once per task."""
+    _FIXTURE_WORKER_CONTEXT.update(players_by_team=players_by_team, team_goals_season_overall=team_goals_season_overall,
+                                   team_assists_season_overall=team_assists_season_overall)
+
+def _calculate_fixture_player_rows_batch(fdr_match_rows, cs_odds_lookup):
+    ctx = _FIXTURE_WORKER_CONTEXT
+    return [calculate_fixture_player_rows(fdr_match_row, ctx['players_by_team'], ctx['team_goals_season_overall'], ctx['team_assists_season_overall'], cs_odds_lookup)
+            for fdr_match_row in fdr_match_rows]
+
+def get_process_pool(pool_name, workers, pool_key=None, initializer=None, initargs=()):
+    """Returns the named worker pool, replacing it when pool_key or workers change (pool_key should identify initargs)."""
+    with _PROCESS_POOLS_LOCK:
+        pool = _PROCESS_POOLS.get(pool_name)
+        if pool is not None and (pool['key'], pool['workers']) == (pool_key, workers): return pool['executor']
+        if pool is not None: pool['executor'].shutdown(wait=False, cancel_futures=True)
+        # spawn, not fork: the API server calls this from worker threads, and forking a threaded process is unsafe
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=initializer, initargs=initargs)
+        _PROCESS_POOLS[pool_name] = {'key': pool_key, 'workers': workers, 'executor': executor}
+        return executor
+
+def shutdown_process_pools(pool_name=None):
+    """Shuts down the named pool, or all of them."""
+    with _PROCESS_POOLS_LOCK:
+        for name in ([pool_name] if pool_name else list(_PROCESS_POOLS)):
+            pool = _PROCESS_POOLS.pop(name, None)
+            if pool is not None: pool['executor'].shutdown(wait=True, cancel_futures=True)
+
+def calculate_player_rows_for_fixtures(fdr_match_rows, players_by_team, team_goals_season_overall, team_assists_season_overall, cs_odds_lookup,
+                                       pool_key=None, workers=None):
+    """calculate_fixture_player_rows for each FDR row, in order. With more than one worker (default FIXTURE_WORKERS) the
+    fixtures are split into batches on a process pool; falls back to serial if the pool can't be used."""
+    workers = FIXTURE_WORKERS if workers is None else workers
+    workers = min(workers, len(fdr_match_rows))
+    if workers > 1:
+        batch_count = min(len(fdr_match_rows), workers * FIXTURE_BATCHES_PER_WORKER)
+        batch_bounds = np.linspace(0, len(fdr_match_rows), batch_count + 1).astype(int)
+        batches = [fdr_match_rows[start:end] for start, end in zip(batch_bounds[:-1], batch_bounds[1:])]
+        try:
+            executor = get_process_pool('fixtures', workers, pool_key, _init_fixture_worker, (players_by_team, team_goals_season_overall, team_assists_season_overall))
+            batch_results = executor.map(_calculate_fixture_player_rows_batch, batches, [cs_odds_lookup] * len(batches))
+            return [fixture_rows for batch_rows in batch_results for fixture_rows in batch_rows]
+        except (BrokenProcessPool, OSError, RuntimeError) as e:
+            print(f"Warning: Parallel fixture evaluation failed ({e}). Falling back to serial.")
+            shutdown_process_pools('fixtures')
+    return [calculate_fixture_player_rows(fdr_match_row, players_by_team, team_goals_season_overall, team_assists_season_overall, cs_odds_lookup)
+            for fdr_match_row in fdr_match_rows]
+
+# --- Incremental Recomputation ---
+# State of the last full/incremental run, used to recompute only the fixtures whose correct-score odds changed.
+_INCREMENTAL_STATE: Dict[str, Any] = {}
+
+def get_static_inputs_key():
+    """Digest of every input except the correct-score JSON: outright odds, player stats and the constants.
+    While it is unchanged, a fixture's results only depend on its own correct-score odds."""
+    file_digests = []
+    for file_path in (HTML_ODDS_FP, MD_ODDS_FP, PLAYER_STATS_FP):
+        try: file_digests.append((file_path,) + _get_file_digest(file_path))
+        except OSError: file_digests.append((file_path, None))
+    return json.dumps([file_digests, get_calculation_constants(), FULL_FIXTURE_DATA_RAW], sort_keys=True, default=str)
+
+def diff_cs_lookups(old_lookup, new_lookup):
+    """Returns the set of (home, away, date) keys that were added, removed or whose odds changed."""
+    changed_keys = set(old_lookup.keys()) ^ set(new_lookup.keys())
+    changed_keys.update(key for key in set(old_lookup.keys()) & set(new_lookup.keys()) if old_lookup[key] != new_lookup[key])
+    return changed_keys
+
+def _generate_incremental_player_points_data(state):
+    """Recomputes FDR rows, score grids, player rows and bonus points only for fixtures whose CS odds changed,
+    then splices the regrouped fixtures into the previous output. Output is identical to a full recompute."""
+    global _INCREMENTAL_STATE
+    with metrics.stage_timer('correct_score_load'):
+        cs_odds_lookup = load_correct_score_data_for_fdr(CS_JSON_FP, TEAM_NAME_MAPPING)
+    metrics.record_rows('correct_score_load', len(cs_odds_lookup))
+    changed_keys = diff_cs_lookups(state['cs_odds_lookup'], cs_odds_lookup)
+    all_base_fixtures = state['all_base_fixtures']
+    affected_indices = [i for i, fix in enumerate(all_base_fixtures)
+                        if (fix['home_team_canonical'], fix['away_team_canonical'], fix['date_str']) in changed_keys
+                        or (fix['away_team_canonical'], fix['home_team_canonical'], fix['date_str']) in changed_keys]
+    print(f"Info (Incremental): {len(changed_keys)} CS entries changed, recomputing {len(affected_indices)} of {len(all_base_fixtures)} fixtures.")
+    metrics.record_rows('incremental_recompute', len(affected_indices))
+    if not affected_indices:
+        _INCREMENTAL_STATE = dict(state, cs_odds_lookup=cs_odds_lookup)
+        return state['grouped_data'], state['grouped_json'], None
+
+    fdr_results_list = list(state['fdr_results_list'])
+    with metrics.stage_timer('fdr'):
+        affected_fdr_df = calculate_fdr_frame(all_base_fixtures, state['team_strength_metrics'], cs_odds_lookup, affected_indices)
+        for i, fdr_row in zip(affected_indices, affected_fdr_df.to_dict(orient='records')): fdr_results_list[i] = fdr_row
+        fdr_final_df = pd.DataFrame(fdr_results_list)
+    record_fdr_metrics([fdr_results_list[i] for i in affected_indices])
+
+    fixture_player_rows = list(state['fixture_player_rows'])
+    changed_rows = []
+    affected_fdr_rows = [fdr_match_row for _, fdr_match_row in fdr_final_df.iloc[affected_indices].iterrows()]
+    with metrics.stage_timer('points_loop'):
+        affected_player_rows = calculate_player_rows_for_fixtures(affected_fdr_rows, state['players_by_team'], state['team_goals_season_overall'],
+                                                                  state['team_assists_season_overall'], cs_odds_lookup, pool_key=state['static_inputs_key'])
+    record_points_metrics(affected_player_rows)
+    for i, fixture_rows in zip(affected_indices, affected_player_rows):
+        fixture_player_rows[i] = fixture_rows
+        changed_rows.extend(fixture_rows)
+
+    grouped_data, grouped_json = list(state['grouped_data']), list(state['grouped_json'])
+    if changed_rows:
+        # Cast to the full run's dtypes so NaN/None and int/float cleanup matches a full recompute exactly
+        changed_df = pd.DataFrame(changed_rows).astype(state['player_points_dtypes'])
+        with metrics.stage_timer('bonus'):
+            finalize_player_points(changed_df, state['bonus_group_cols'])
+        group_positions = {tuple(match_info[c] for c in FIXTURE_GROUP_COLUMNS): pos for pos, match_info in enumerate(grouped_data)}
+        with metrics.stage_timer('grouping'):
+            for match_info, match_json in zip(*group_player_points_by_fixture_json(changed_df)):
+                pos = group_positions[tuple(match_info[c] for c in FIXTURE_GROUP_COLUMNS)]
+                grouped_data[pos], grouped_json[pos] = match_info, match_json
+
+    # Swap in a new state dict rather than mutating, so concurrent calculations each see a consistent state
+    _INCREMENTAL_STATE = dict(state, cs_odds_lookup=cs_odds_lookup, fdr_results_list=fdr_results_list, fixture_player_rows=fixture_player_rows,
+                              grouped_data=grouped_data, grouped_json=grouped_json)
+    print(f"Successfully updated grouped player point data for {len(affected_indices)} matches incrementally.")
+    return grouped_data, grouped_json, None
+
+# --- What-If Scenarios (batch evaluation of constant/odds overrides) ---
+OUTRIGHT_WEIGHT_KEYS = ('base_strength_from_odds', 'venue_impact', 'fatigue') # Order of the stacked outright components
+SCENARIO_WEIGHT_OVERRIDES = {'OUTRIGHT_COMPONENT_WEIGHTS': OUTRIGHT_COMPONENT_WEIGHTS, 'FINAL_FDR_WEIGHTS': FINAL_FDR_WEIGHTS}
+SCENARIO_OVERRIDE_KEYS = set(SCENARIO_WEIGHT_OVERRIDES) | {'AVERAGE_TOTAL_GOALS_IN_MATCH', 'correct_score_odds', 'name'}
+_SCENARIO_INPUTS: Dict[str, Any] = {} # Preloaded inputs shared by every scenario, keyed on compute_inputs_fingerprint()
+
+def _parse_finite_number(value):
+    """float(value) for finite numbers (JSON numbers or numeric strings); ValueError otherwise (incl. nan/inf/overflow and booleans)."""
+    if isinstance(value, bool): raise ValueError(f"{value!r} is not a number")
+    number = float(value)
+    if not math.isfinite(number): raise ValueError(f"{value!r} is not a finite number")
+    return number
+
+def parse_scenarios(scenarios):
+    """Validates a list of override dicts. Returns (parsed_scenarios, error_message).
+
+    Each scenario may override OUTRIGHT_COMPONENT_WEIGHTS / FINAL_FDR_WEIGHTS (partially; missing keys keep the
+    module value), AVERAGE_TOTAL_GOALS_IN_MATCH (> 0), and correct_score_odds: {fixture_id: {"h-a": decimal_odds}}
+    for known fixture_ids, with scorelines given home-first and decimal odds > 1 (an empty dict removes the
+    fixture's odds). Every number must be finite.
+    """
+    if not isinstance(scenarios, list) or not scenarios: return None, "Scenarios must be a non-empty list."
+    known_fixture_ids = {str(fixture_info['fixture_id']) for fixture_info in get_fixture_id_gw_lookup().values()}
+    parsed_scenarios = []
+    for i, scenario in enumerate(scenarios):
+        if not isinstance(scenario, dict): return None, f"Scenario {i} must be an object."
+        unknown_keys = set(scenario) - SCENARIO_OVERRIDE_KEYS
+        if unknown_keys: return None, f"Scenario {i} has unknown overrides: {sorted(unknown_keys)}."
+        parsed = {'name': scenario.get('name', i)}
+        for const_name, module_weights in SCENARIO_WEIGHT_OVERRIDES.items():
+            weight_overrides = scenario.get(const_name) or {}
+            if not isinstance(weight_overrides, dict) or set(weight_overrides) - set(module_weights):
+                return None, f"Scenario {i}: {const_name} overrides must be a subset of {sorted(module_weights)}."
+            try: parsed[const_name] = {key: _parse_finite_number(weight_overrides.get(key, default)) for key, default in module_weights.items()}
+            except (TypeError, ValueError, OverflowError): return None, f"Scenario {i}: {const_name} values must be finite numbers."
+        try: parsed['AVERAGE_TOTAL_GOALS_IN_MATCH'] = _parse_finite_number(scenario.get('AVERAGE_TOTAL_GOALS_IN_MATCH', AVERAGE_TOTAL_GOALS_IN_MATCH))
+        except (TypeError, ValueError, OverflowError): parsed['AVERAGE_TOTAL_GOALS_IN_MATCH'] = None
+        if parsed['AVERAGE_TOTAL_GOALS_IN_MATCH'] is None or parsed['AVERAGE_TOTAL_GOALS_IN_MATCH'] <= 0:
+            return None, f"Scenario {i}: AVERAGE_TOTAL_GOALS_IN_MATCH must be a finite number > 0."
+        odds_overrides = scenario.get('correct_score_odds') or {}
+        if not isinstance(odds_overrides, dict) or not all(isinstance(odds, dict) for odds in odds_overrides.values()):
+            return None, f"Scenario {i}: correct_score_odds must map fixture_id to an {{\"h-a\": odds}} object."
+        parsed['correct_score_odds'] = {}
+        for fixture_id, odds in odds_overrides.items():
+            if str(fixture_id) not in known_fixture_ids: return None, f"Scenario {i}: correct_score_odds has unknown fixture_id '{fixture_id}'."
+            for score_str, odd_val in odds.items():
+                try: valid_odds = CS_SCORE_PATTERN.match(str(score_str)) is not None and _parse_finite_number(odd_val) > 1.0
+                except (TypeError, ValueError, OverflowError): valid_odds = False
+                if not valid_odds:
+                    return None, f"Scenario {i}: correct_score_odds for '{fixture_id}' must map \"h-a\" scorelines to decimal odds > 1 (got {score_str!r}: {odd_val!r})."
+            parsed['correct_score_odds'][str(fixture_id)] = odds
+        parsed_scenarios.append(parsed)
+    return parsed_scenarios, None
+
+def load_scenario_inputs():
+    """Loads (or reuses) everything scenarios share: fixtures, weight-independent outright FDR components,
+    correct-score matrices, squads and their points tensors. Returns (scenario_inputs, error_message)."""
+    global _SCENARIO_INPUTS
+    fingerprint = compute_inputs_fingerprint()
+    metrics.record_cache('scenario_inputs', _SCENARIO_INPUTS.get('fingerprint') == fingerprint)
+    if _SCENARIO_INPUTS.get('fingerprint') == fingerprint: return _SCENARIO_INPUTS, None
+
+    all_base_fixtures = create_base_fixtures_with_canonical_names(TEAM_NAME_MAPPING, get_fixture_id_gw_lookup())
+    if not all_base_fixtures: return None, "No base fixtures loaded."
+    all_involved_teams_canonical = set(t for fix in all_base_fixtures for t in (fix['home_team_canonical'], fix['away_team_canonical']))
+    df_outright_odds_data = get_tournament_outright_odds_data(HTML_ODDS_FP, MD_ODDS_FP, TEAM_NAME_MAPPING)
+    team_strength_metrics = normalize_tournament_implied_probs(df_outright_odds_data, all_involved_teams_canonical)
+    cs_odds_lookup = load_correct_score_data_for_fdr(CS_JSON_FP, TEAM_NAME_MAPPING)
+    player_df, err_msg = load_player_stats(PLAYER_STATS_FP)
+    if err_msg: return None, err_msg
+    team_goals_season_overall = player_df.groupby('Team_Canonical')['Goals'].sum().to_dict()
+    team_assists_season_overall = player_df.groupby('Team_Canonical')['Assists'].sum().to_dict()
+    players_by_team = {team_c: team_players for team_c, team_players in player_df.groupby('Team_Canonical', sort=False)}
 
+    # Outright components stacked per side: [base strength, venue impact, fatigue impact] x fixtures
+    outright_components = get_outright_fdr_components(calculate_outright_fdr_arrays(all_base_fixtures, team_strength_metrics))
+    fixtures, player_roster = [], []
+    for fixture_details in all_base_fixtures:
+        home_c, away_c, date_s = fixture_details['home_team_canonical'], fixture_details['away_team_canonical'], fixture_details['date_str']
+        score_matrix = get_fixture_score_matrix(cs_odds_lookup, home_c, away_c, date_s)
+        sides = []
+        for team_c, opp_c in ((home_c, away_c), (away_c, home_c)):
+            side_players = players_by_team.get(team_c, player_df.iloc[0:0])
+            team_details = TEAM_DETAILS.get(team_c, DEFAULT_TEAM_DETAIL)
+            sides.append({'players': side_players, 'team_goals_season': team_goals_season_overall.get(team_c, 1) or 1,
+                          'team_assists_season': team_assists_season_overall.get(team_c, 1) or 1, 'points_tensors': {}})
+            for p_name, p_id in zip(side_players['Player Name'].tolist(), side_players[PLAYER_ID_COL_EXCEL].tolist()):
+                player_roster.append({'fixture_id': fixture_details.get('fixture_id', 'N/A_ID'), 'player_id': None if pd.isna(p_id) else p_id,
+                                      'Player Name': p_name, 'Team Short Code': team_details.get('short_code')})
+        fixtures.append({'fixture_id': fixture_details.get('fixture_id', 'N/A_ID'), 'GW': fixture_details.get('GW', 'N/A_GW'),
+                         'home_team': home_c, 'away_team': away_c, 'group': fixture_details['group'],
+                         'MatchIdentifier': f"{home_c} vs {away_c} ({date_s})", 'Date': date_s, 'score_matrix': score_matrix,
+                         'cs_fdr': calculate_correct_score_fdr_values(score_matrix)[:2] if score_matrix is not None else None, 'sides': sides})
+
+    _SCENARIO_INPUTS = {'fingerprint': fingerprint, 'fixtures': fixtures, 'player_roster': player_roster, 'outright_components': outright_components,
+                        'team_strength_metrics': team_strength_metrics}
+    return _SCENARIO_INPUTS, None
+
+def weight_outright_fdr_components(components, outright_weights):
+    """(scenarios x fixtures) outright FDRs from stacked [base, venue, fatigue] components and (scenarios x 3) weights.
+    The one place outright components are weighted and scaled to the 1-99 FDR range."""
+    weighted = outright_weights[:, 0, None] * components[0] + outright_weights[:, 1, None] * components[1] + outright_weights[:, 2, None] * components[2]
+    return np.clip(weighted / 1.5 + 25, 1, 99)
+
+def poisson_goal_pmfs(h_fdr_outright, a_fdr_outright, avg_goals=AVERAGE_TOTAL_GOALS_IN_MATCH):
+    """Vectorized estimate_xg_from_fdr_outrights + Poisson pmfs: returns home and away (... x MAX_POISSON_GOALS+1) goal pmfs.
+    FDRs are rounded to 0.1 first, as the FDR row does before the single-fixture path estimates xG from it."""
+    h_proxy, a_proxy = 1 / (np.round(h_fdr_outright, 1) + 0.1), 1 / (np.round(a_fdr_outright, 1) + 0.1)
+    h_ratio = h_proxy / (h_proxy + a_proxy)
+    return poisson_goal_pmf(np.maximum(0.1, h_ratio * avg_goals)), poisson_goal_pmf(np.maximum(0.1, (1 - h_ratio) * avg_goals))
+
+def _get_side_expected_points(side, score_prob_matrices):
+    """Expected points of one squad for a (scenarios x goals x conceded) stack of probability grids."""
+    if side['players'].empty: return np.zeros((len(score_prob_matrices), 0))
+    grid_shape = score_prob_matrices.shape[1:]
+    points = side['points_tensors'].get(grid_shape)
+    if points is None:
+        points = calculate_points_tensor(side['players'], *grid_shape, side['team_goals_season'], side['team_assists_season'])
+        side['points_tensors'][grid_shape] = points
+    return np.einsum('pgc,sgc->sp', points, score_prob_matrices)
+
+def evaluate_scenarios(parsed_scenarios):
+    """Evaluates a batch of parse_scenarios() output in one pass over the shared inputs. Returns (result, error_message).
+
+    result holds the 'fixtures' and 'players' rosters once, and per scenario the final FDRs (one per fixture) and
+    ExpectedPoints/BonusPoints/TotalPoints (one per roster player). Outright FDRs, xG and Poisson grids are computed
+    for all scenarios at once; each fixture's squads are then scored against the stacked grids in a single einsum.
+    """
+    scenario_inputs, err_msg = load_scenario_inputs()
+    if err_msg: return None, err_msg
+    fixtures, n_scenarios = scenario_inputs['fixtures'], len(parsed_scenarios)
+    outright_weights = np.array([[sc['OUTRIGHT_COMPONENT_WEIGHTS'][key] for key in OUTRIGHT_WEIGHT_KEYS] for sc in parsed_scenarios])
+    final_weights = np.array([[sc['FINAL_FDR_WEIGHTS']['outright'], sc['FINAL_FDR_WEIGHTS']['correct_score']] for sc in parsed_scenarios])
+    avg_goals = np.array([sc['AVERAGE_TOTAL_GOALS_IN_MATCH'] for sc in parsed_scenarios])[:, None]
+
+    fdr_outright = {side_name: weight_outright_fdr_components(components, outright_weights)
+                    for side_name, components in scenario_inputs['outright_components'].items()}
+    home_goal_pmf, away_goal_pmf = poisson_goal_pmfs(fdr_outright['home'], fdr_outright['away'], avg_goals)
+
+    final_fdr = {'home': np.empty((n_scenarios, len(fixtures))), 'away': np.empty((n_scenarios, len(fixtures)))}
+    expected_points = []
+    for f, fixture in enumerate(fixtures):
+        # Each scenario's score matrix for this fixture: the loaded one unless its odds are overridden
+        score_matrices = [fixture['score_matrix']] * n_scenarios
+        cs_fdrs = [fixture['cs_fdr']] * n_scenarios
+        for s, scenario in enumerate(parsed_scenarios):
+            odds_override = scenario['correct_score_odds'].get(str(fixture['fixture_id']))
+            if odds_override is not None:
+                score_matrices[s] = ScoreMatrix.from_odds(odds_override) if odds_override else None
+                cs_fdrs[s] = calculate_correct_score_fdr_values(score_matrices[s])[:2] if score_matrices[s] is not None else None
+
+        for side_name, side_index in (('home', 0), ('away', 1)):
+            side_fdr_out = fdr_outright[side_name][:, f]
+            side_cs_fdr = np.array([np.nan if cs_fdr is None else cs_fdr[side_index] for cs_fdr in cs_fdrs])
+            combined_fdr = final_weights[:, 0] * side_fdr_out + final_weights[:, 1] * side_cs_fdr
+            final_fdr[side_name][:, f] = np.round(np.clip(np.where(np.isnan(side_cs_fdr), side_fdr_out, combined_fdr), 1, 99), 1)
+
+        fixture_points = [np.empty((n_scenarios, len(side['players']))) for side in fixture['sides']]
+        uses_cs = np.array([score_matrix is not None and score_matrix.total_inv_odds > 1e-9 for score_matrix in score_matrices])
+        poisson_rows = np.flatnonzero(~uses_cs)
+        if len(poisson_rows):
+            poisson_grids = home_goal_pmf[poisson_rows, f, :, None] * away_goal_pmf[poisson_rows, f, None, :]
+            poisson_grids = poisson_grids / poisson_grids.sum(axis=(1, 2), keepdims=True) # xG >= 0.1, so the grid never sums to 0
+            fixture_points[0][poisson_rows] = _get_side_expected_points(fixture['sides'][0], poisson_grids)
+            fixture_points[1][poisson_rows] = _get_side_expected_points(fixture['sides'][1], poisson_grids.transpose(0, 2, 1))
+        # Scenarios sharing a score matrix (usually the loaded one) are scored once
+        cs_rows_by_matrix = {}
+        for s in np.flatnonzero(uses_cs): cs_rows_by_matrix.setdefault(id(score_matrices[s]), []).append(s)
+        for cs_rows in cs_rows_by_matrix.values():
+            cs_grid = score_matrices[cs_rows[0]].matrix[None]
+            fixture_points[0][cs_rows] = _get_side_expected_points(fixture['sides'][0], cs_grid)
+            fixture_points[1][cs_rows] = _get_side_expected_points(fixture['sides'][1], cs_grid.transpose(0, 2, 1))
+        expected_points.append(np.concatenate(fixture_points, axis=1))
+
+    # Bonus 3/2/1 for the top three ExpectedPoints of each fixture and scenario (ties keep roster order)
+    bonus_points = []
+    for fixture_exp_pts in expected_points:
+        fixture_bonus = np.zeros(fixture_exp_pts.shape, dtype=int)
+        top_three = np.argsort(-fixture_exp_pts, axis=1, kind='stable')[:, :3]
+        np.put_along_axis(fixture_bonus, top_three, np.array([3, 2, 1])[:top_three.shape[1]][None, :], axis=1)
+        bonus_points.append(fixture_bonus)
+    expected_points, bonus_points = np.concatenate(expected_points, axis=1), np.concatenate(bonus_points, axis=1)
+    total_points = np.round(expected_points + bonus_points, 2)
+
+    return {
+        'fixtures': [{key: fixture[key] for key in FIXTURE_GROUP_COLUMNS} for fixture in fixtures],
+        'players': scenario_inputs['player_roster'],
+        'scenarios': [{'name': scenario['name'], 'final_home_fdr': final_fdr['home'][s].tolist(), 'final_away_fdr': final_fdr['away'][s].tolist(),
+                       'ExpectedPoints': expected_points[s].tolist(), 'BonusPoints': bonus_points[s].tolist(), 'TotalPoints': total_points[s].tolist()}
+                      for s, scenario in enumerate(parsed_scenarios)],
+    }, None
+
+# --- Tournament Simulation (Monte Carlo over group results and the knockout bracket) ---
+KNOCKOUT_ROUNDS = ['Round of 16', 'Quarter-finals', 'Semi-finals', 'Final']
+# Round-of-16 ties in bracket order (winners of adjacent ties meet in the next round): ((group, position), (group, position))
+KNOCKOUT_BRACKET = [(('E', 1), ('F', 2)), (('G', 1), ('H', 2)), (('A', 1), ('B', 2)), (('C', 1), ('D', 2)),
+                    (('B', 1), ('A', 2)), (('D', 1), ('C', 2)), (('F', 1), ('E', 2)), (('H', 1), ('G', 2))]
+SIMULATION_CHUNK_SIZE = 25_000 # Simulations per chunk; each chunk gets its own child seed, so results don't depend on workers
+SIMULATION_WORKERS = int(os.environ.get('SIMULATION_WORKERS', '1')) # Processes for simulation chunks; 0/1 = serial
+
+def build_simulation_inputs(scenario_inputs):
+    """Arrays the simulator samples from: group fixtures' score-grid CDFs and knockout advance probabilities.
+
+    Group fixtures use their correct-score grid when valid and the Poisson grid from the outright FDRs otherwise.
+    Knockout ties are on neutral ground (no venue/fatigue component), level ties after 90 minutes going either way.
+    """
+    fixtures = scenario_inputs['fixtures']
+    teams = sorted({team_c for fixture in fixtures for team_c in (fixture['home_team'], fixture['away_team'])},
+                   key=lambda team_c: (min(fixture['group'] for fixture in fixtures if team_c in (fixture['home_team'], fixture['away_team'])), team_c))
+    team_index = {team_c: i for i, team_c in enumerate(teams)}
+    groups = sorted({fixture['group'] for fixture in fixtures})
+    group_teams = [sorted({team_index[fixture[side]] for fixture in fixtures if fixture['group'] == group for side in ('home_team', 'away_team')})
+                   for group in groups]
+    if any(len(members) < 2 for members in group_teams) or any(group not in groups for tie in KNOCKOUT_BRACKET for group, _ in tie):
+        return None, "Group stage doesn't match the knockout bracket."
+
+    default_weights = np.array([[OUTRIGHT_COMPONENT_WEIGHTS[key] for key in OUTRIGHT_WEIGHT_KEYS]])
+    home_fdr = weight_outright_fdr_components(scenario_inputs['outright_components']['home'], default_weights)[0]
+    away_fdr = weight_outright_fdr_components(scenario_inputs['outright_components']['away'], default_weights)[0]
+    home_goal_pmf, away_goal_pmf = poisson_goal_pmfs(home_fdr, away_fdr)
+    fixture_grids = []
+    for f, fixture in enumerate(fixtures):
+        score_matrix = fixture['score_matrix']
+        if score_matrix is not None and score_matrix.total_inv_odds > 1e-9: fixture_grids.append(score_matrix.matrix)
+        else:
+            poisson_grid = np.outer(home_goal_pmf[f], away_goal_pmf[f])
+            fixture_grids.append(poisson_grid / poisson_grid.sum())
+
+    # Neutral knockout grids, [team, opponent] oriented team-first: base strength component only
+    strengths = np.array([scenario_inputs['team_strength_metrics'].get(team_c, 10.0) for team_c in teams])
+    no_impact = np.zeros((len(teams), len(teams)))
+    team_fdr = weight_outright_fdr_components(np.stack([np.broadcast_to(strengths[None, :], no_impact.shape), no_impact, no_impact]).reshape(3, -1), default_weights)
+    team_fdr = team_fdr.reshape(no_impact.shape)
+    team_goal_pmf, opp_goal_pmf = poisson_goal_pmfs(team_fdr, team_fdr.T)
+    knockout_grids = team_goal_pmf[:, :, :, None] * opp_goal_pmf[:, :, None, :]
+    knockout_grids = knockout_grids / knockout_grids.sum(axis=(2, 3), keepdims=True)
+    goal_diff = np.subtract.outer(np.arange(MAX_POISSON_GOALS + 1), np.arange(MAX_POISSON_GOALS + 1))
+    advance_probs = (knockout_grids * (goal_diff > 0)).sum(axis=(2, 3)) + 0.5 * (knockout_grids * (goal_diff == 0)).sum(axis=(2, 3))
+
+    return {
+        'teams': teams, 'groups': groups, 'group_teams': group_teams, 'fixture_grids': fixture_grids, 'knockout_grids': knockout_grids,
+        'fixture_teams': np.array([(team_index[fixture['home_team']], team_index[fixture['away_team']]) for fixture in fixtures]),
+        'fixture_cdfs': [np.cumsum(grid.ravel()) for grid in fixture_grids], 'advance_probs': advance_probs,
+        'bracket_slots': [(groups.index(group), position - 1) for tie in KNOCKOUT_BRACKET for group, position in tie],
+    }, None
+
+def _simulate_tournament_chunk(sim_inputs, n_simulations, seed_sequence):
+    """Simulates n_simulations tournaments. Returns (rounds x teams x opponents) knockout matchup counts and champion counts."""
+    rng = np.random.default_rng(seed_sequence)
+    n_teams = len(sim_inputs['teams'])
+    points, goal_diff, goals_for = (np.zeros((n_simulations, n_teams), dtype=np.int32) for _ in range(3))
+    for (home_i, away_i), grid, cdf in zip(sim_inputs['fixture_teams'], sim_inputs['fixture_grids'], sim_inputs['fixture_cdfs']):
+        cells = np.minimum(np.searchsorted(cdf, rng.random(n_simulations) * cdf[-1], side='right'), len(cdf) - 1)
+        home_goals, away_goals = np.divmod(cells, grid.shape[1])
+        points[:, home_i] += 3 * (home_goals > away_goals) + (home_goals == away_goals)
+        points[:, away_i] += 3 * (away_goals > home_goals) + (home_goals == away_goals)
+        goal_diff[:, home_i] += home_goals - away_goals; goal_diff[:, away_i] += away_goals - home_goals
+        goals_for[:, home_i] += home_goals; goals_for[:, away_i] += away_goals
+
+    # Standings: points, goal difference, goals scored, then drawing of lots (head-to-head isn't modelled)
+    rank_key = points * 1e6 + (goal_diff + 500) * 1e3 + goals_for + rng.random((n_simulations, n_teams))
+    group_positions = []
+    for members in sim_inputs['group_teams']:
+        members = np.array(members)
+        group_positions.append(members[np.argsort(-rank_key[:, members], axis=1)[:, :2]])
+    alive = np.stack([group_positions[group_i][:, position] for group_i, position in sim_inputs['bracket_slots']], axis=1)
+
+    matchup_counts = np.zeros((len(KNOCKOUT_ROUNDS), n_teams, n_teams), dtype=np.int64)
+    for round_i in range(len(KNOCKOUT_ROUNDS)):
+        team_a, team_b = alive[:, 0::2], alive[:, 1::2]
+        matchup_counts[round_i] = (np.bincount((team_a * n_teams + team_b).ravel(), minlength=n_teams * n_teams)
+                                   + np.bincount((team_b * n_teams + team_a).ravel(), minlength=n_teams * n_teams)).reshape(n_teams, n_teams)
+        alive = np.where(rng.random(team_a.shape) < sim_inputs['advance_probs'][team_a, team_b], team_a, team_b)
+    return matchup_counts, np.bincount(alive[:, 0], minlength=n_teams)
+
+def simulate_tournament(n_simulations=100_000, seed=None, workers=None):
+    """Monte Carlo simulation of the group stage and knockout bracket. Returns (result, error_message).
+
+    Group results are sampled from each fixture's score grid; knockout ties are sampled from the neutral advance
+    probabilities. Each player's knockout expected points weight their expected points against every possible
+    opponent by how often that tie occurred, so only the bracket (not the scorelines) carries sampling noise.
+    Points exclude bonus. Chunks run on a process pool when workers (default SIMULATION_WORKERS) > 1; with the
+    same seed the result is identical for any worker count. Without one a seed is drawn and returned in result['seed'].
+    """
+    if n_simulations < 1: return None, "n_simulations must be at least 1."
+    scenario_inputs, err_msg = load_scenario_inputs()
+    if err_msg: return None, err_msg
+    sim_inputs, err_msg = build_simulation_inputs(scenario_inputs)
+    if err_msg: return None, err_msg
+
+    # An unseeded run draws its own seed and echoes it back. 53 bits stay exact in clients that parse JSON numbers as doubles
+    if seed is None: seed = secrets.randbits(53)
+    seed_sequence = np.random.SeedSequence(seed)
+    chunk_sizes = [min(SIMULATION_CHUNK_SIZE, n_simulations - start) for start in range(0, n_simulations, SIMULATION_CHUNK_SIZE)]
+    chunk_seeds = seed_sequence.spawn(len(chunk_sizes))
+    workers = min(SIMULATION_WORKERS if workers is None else workers, len(chunk_sizes))
+    chunk_results = None
+    if workers > 1:
+        try:
+            executor = get_process_pool('simulation', workers)
+            chunk_results = list(executor.map(_simulate_tournament_chunk, [sim_inputs] * len(chunk_sizes), chunk_sizes, chunk_seeds))
+        except (BrokenProcessPool, OSError, RuntimeError) as e:
+            print(f"Warning: Parallel simulation failed ({e}). Falling back to serial.")
+            shutdown_process_pools('simulation')
+    if chunk_results is None: chunk_results = [_simulate_tournament_chunk(sim_inputs, size, chunk_seed) for size, chunk_seed in zip(chunk_sizes, chunk_seeds)]
+    matchup_freq = sum(counts for counts, _ in chunk_results) / n_simulations
+    champion_freq = sum(champions for _, champions in chunk_results) / n_simulations
+
+    teams, team_index = sim_inputs['teams'], {team_c: i for i, team_c in enumerate(sim_inputs['teams'])}
+    knockout_matches = matchup_freq.sum(axis=(0, 2))
+    team_rows = []
+    for i, team_c in enumerate(teams):
+        round_probs = {round_name: round(float(matchup_freq[round_i, i].sum()), 4) for round_i, round_name in enumerate(KNOCKOUT_ROUNDS)}
+        round_probs['Champion'] = round(float(champion_freq[i]), 4)
+        team_rows.append({'team': team_c, 'short_code': TEAM_DETAILS.get(team_c, DEFAULT_TEAM_DETAIL).get('short_code'),
+                          'group': sim_inputs['groups'][next(g for g, members in enumerate(sim_inputs['group_teams']) if i in members)],
+                          'round_probabilities': round_probs, 'ExpectedMatches': round(float(knockout_matches[i]) + sum(
+                              1 for home_i, away_i in sim_inputs['fixture_teams'] if i in (home_i, away_i)), 4)})
+
+    # Per-player expected points: fixed group fixtures + knockout opponents weighted by tie frequency
+    player_rows, team_sides = [], {}
+    for fixture, grid in zip(scenario_inputs['fixtures'], sim_inputs['fixture_grids']):
+        for side, side_grid in zip(fixture['sides'], (grid, grid.T)):
+            team_c = fixture['home_team'] if side is fixture['sides'][0] else fixture['away_team']
+            group_pts = _get_side_expected_points(side, side_grid[None])[0]
+            if team_c in team_sides: team_sides[team_c]['group_points'] = team_sides[team_c]['group_points'] + group_pts
+            else: team_sides[team_c] = {'side': side, 'group_points': group_pts}
+    for team_c, team_side in team_sides.items():
+        i, side = team_index[team_c], team_side['side']
+        if side['players'].empty: continue
+        vs_opponent_pts = _get_side_expected_points(side, sim_inputs['knockout_grids'][i]) # (opponents x players)
+        knockout_pts = (matchup_freq[:, i, :] @ vs_opponent_pts).sum(axis=0)
+        short_code = TEAM_DETAILS.get(team_c, DEFAULT_TEAM_DETAIL).get('short_code')
+        for p_name, p_id, group_pts, ko_pts in zip(side['players']['Player Name'].tolist(), side['players'][PLAYER_ID_COL_EXCEL].tolist(),
+                                                   team_side['group_points'].tolist(), knockout_pts.tolist()):
+            player_rows.append({'player_id': None if pd.isna(p_id) else p_id, 'Player Name': p_name, 'Team Short Code': short_code,
+                                'ExpectedMatches': team_rows[i]['ExpectedMatches'], 'GroupExpectedPoints': round(group_pts, 2),
+                                'KnockoutExpectedPoints': round(ko_pts, 2), 'ExpectedPoints': round(group_pts + ko_pts, 2)})
+
+    return {'n_simulations': n_simulations, 'seed': seed, 'rounds': KNOCKOUT_ROUNDS + ['Champion'],
+            'teams': team_rows, 'players': player_rows}, None
+
+# --- Main Calculation Logic Function ---
+def _calculate_player_points_frame(static_inputs_key=None, fixture_filter=None):
+    """Runs every stage up to bonus and total points. Returns (run_state, error_message).
+
+    run_state holds the intermediate results kept in _INCREMENTAL_STATE plus the finalized 'player_points_df'.
+    It is None when fixtures/FDRs/player stats failed to load and {} when no player points were calculated.
+    If fixture_filter(fixture_details) is given, only the fixtures it accepts get FDR rows and player points
+    (rest-day history still comes from the full schedule).
+    """
+    static_inputs_key = static_inputs_key or get_static_inputs_key()
+
+    # --- FDR Calculations ---
+    print("--- Calculating Fixture Difficulty Ratings (FDRs) ---")
+    # create_base_fixtures uses the fixture_id/GW lookup (built on first use)
+    with metrics.stage_timer('fixture_build'):
+        all_base_fixtures = create_base_fixtures_with_canonical_names(TEAM_NAME_MAPPING, get_fixture_id_gw_lookup())
+    metrics.record_rows('fixture_build', len(all_base_fixtures))
+    if not all_base_fixtures:
+        print("CRITICAL: No base fixtures loaded in calculation engine.")
+        return None, "No base fixtures loaded."
+
+    all_involved_teams_canonical = set(t for fix in all_base_fixtures for t in (fix['home_team_canonical'], fix['away_team_canonical']))
+    with metrics.stage_timer('outright_odds'):
+        df_outright_odds_data = get_tournament_outright_odds_data(HTML_ODDS_FP, MD_ODDS_FP, TEAM_NAME_MAPPING)
+        team_strength_metrics = normalize_tournament_implied_probs(df_outright_odds_data, all_involved_teams_canonical)
+    metrics.record_rows('outright_odds', len(df_outright_odds_data))
+    with metrics.stage_timer('correct_score_load'):
+        cs_odds_lookup_for_fdr = load_correct_score_data_for_fdr(CS_JSON_FP, TEAM_NAME_MAPPING)
+    metrics.record_rows('correct_score_load', len(cs_odds_lookup_for_fdr))
+    selected_indices = None
+    if fixture_filter is not None:
+        selected_indices = [i for i, fixture_details in enumerate(all_base_fixtures) if fixture_filter(fixture_details)]
+        if not selected_indices: return {}, "No fixtures match the requested slice."
+
+    with metrics.stage_timer('fdr'):
+        # Rest days/travel are taken from the full schedule before the fixtures are narrowed to the slice
+        fdr_final_df = calculate_fdr_frame(all_base_fixtures, team_strength_metrics, cs_odds_lookup_for_fdr, selected_indices)
+        fdr_results_list = fdr_final_df.to_dict(orient='records')
+    if selected_indices is not None: all_base_fixtures = [all_base_fixtures[i] for i in selected_indices]
+    record_fdr_metrics(fdr_results_list)
+    if fdr_final_df.empty:
+        print("CRITICAL: No FDR results generated in calculation engine.")
+        return None, "No FDR results generated."
 
+    # --- Player Points Calculations ---
+    print("--- Calculating Player Fantasy Points ---")
+    with metrics.stage_timer('player_stats'):
+        player_df, err_msg = load_player_stats(PLAYER_STATS_FP)
+    if err_msg: return None, err_msg
+    metrics.record_rows('player_stats', len(player_df))
+
+    team_goals_season_overall = player_df.groupby('Team_Canonical')['Goals'].sum().to_dict()
+    team_assists_season_overall = player_df.groupby('Team_Canonical')['Assists'].sum().to_dict()
+    players_by_team = {team_c: team_players for team_c, team_players in player_df.groupby('Team_Canonical', sort=False)}
+    players_by_team[None] = player_df.iloc[0:0] # Empty squad for teams without players
+
+    with metrics.stage_timer('points_loop'):
+        fixture_player_rows = calculate_player_rows_for_fixtures([fdr_match_row for _, fdr_match_row in fdr_final_df.iterrows()], players_by_team,
+                                                                 team_goals_season_overall, team_assists_season_overall, cs_odds_lookup_for_fdr, pool_key=static_inputs_key)
+    record_points_metrics(fixture_player_rows)
+    player_points_results_list = [row for fixture_rows in fixture_player_rows for row in fixture_rows]
+
+    if not player_points_results_list:
+        print("Warning: No player points were calculated.")
+        return {}, "No player points calculated."
+    player_points_df = pd.DataFrame(player_points_results_list)
+    if player_points_df.empty:
+        print("Warning: Player points DataFrame is empty after processing. No data to return.")
+        return {}, "Player points DataFrame is empty after processing."
+
+    player_points_dtypes = player_points_df.dtypes.to_dict()
+    bonus_group_cols = get_bonus_group_columns(player_points_df)
+    with metrics.stage_timer('bonus'):
+        finalize_player_points(player_points_df, bonus_group_cols)
+
+    return {
+        'static_inputs_key': static_inputs_key, 'all_base_fixtures': all_base_fixtures,
+        'team_strength_metrics': team_strength_metrics, 'cs_odds_lookup': cs_odds_lookup_for_fdr, 'fdr_results_list': fdr_results_list,
+        'players_by_team': players_by_team, 'team_goals_season_overall': team_goals_season_overall,
+        'team_assists_season_overall': team_assists_season_overall, 'fixture_player_rows': fixture_player_rows,
+        'player_points_dtypes': player_points_dtypes, 'bonus_group_cols': bonus_group_cols, 'player_points_df': player_points_df,
+    }, None
+
+def generate_all_player_points_data(incremental=False, with_json=False, on_fixture_json=None):
+    """Calculates expected player points for every fixture. Returns (grouped_data, error_message), or
+    (grouped_data, json_body, error_message) with with_json=True, json_body being the UTF-8 JSON of grouped_data.
+
+    With incremental=True and unchanged outright odds, player stats and constants since the previous run,
+    only the fixtures whose correct-score odds changed are recomputed.
+    on_fixture_json(fixture JSON fragment) is called for each fixture, in result order, as soon as its group is
+    finalized (for streaming responses while the rest of the result is assembled).
+    """
+    grouped_data, json_fragments, err_msg = _generate_grouped_player_points(incremental, on_fixture_json)
+    if with_json: return grouped_data, (None if json_fragments is None else join_fixture_json(json_fragments)), err_msg
+    return grouped_data, err_msg
+
+def _generate_grouped_player_points(incremental, on_fixture_json=None):
+    """Returns (grouped_data, per-fixture JSON fragments, error_message)."""
+    print("--- Starting FIFA Club World Cup 2025 Analysis (Calculation Engine v2) ---")
+    global _INCREMENTAL_STATE
+    static_inputs_key = get_static_inputs_key()
+    if incremental: metrics.record_cache('incremental_state', _INCREMENTAL_STATE.get('static_inputs_key') == static_inputs_key)
+    if incremental and _INCREMENTAL_STATE.get('static_inputs_key') == static_inputs_key:
+        grouped_data, grouped_json, err_msg = _generate_incremental_player_points_data(_INCREMENTAL_STATE)
+        for match_json in (grouped_json if on_fixture_json and not err_msg else []): on_fixture_json(match_json)
+        return grouped_data, grouped_json, err_msg
+
+    run_state, err_msg = _calculate_player_points_frame(static_inputs_key)
+    if err_msg: return (None, None) if run_state is None else ([], []), err_msg
+
+    player_points_df = run_state.pop('player_points_df')
+    with metrics.stage_timer('grouping'):
+        if on_fixture_json is None: grouped_data, grouped_json = group_player_points_by_fixture_json(player_points_df)
+        else:
+            grouped_data, grouped_json = [], []
+            for match_info, match_json in iter_player_points_by_fixture(player_points_df):
+                grouped_data.append(match_info); grouped_json.append(match_json)
+                on_fixture_json(match_json)
+    print_points_method_counts(player_points_df)
+    run_state['grouped_data'], run_state['grouped_json'] = grouped_data, grouped_json
+    _INCREMENTAL_STATE = run_state
 
+    print(f"Successfully generated grouped player point data for {len(grouped_data)} matches in calculation engine.")
+    return grouped_data, grouped_json, None
+
+def generate_player_points_slice(fixture_id=None, gw=None, team_short_code=None, player_id=None):
+    """Calculates player points only for the fixtures matching every given filter. Returns (grouped_data, error_message).
+
+    grouped_data has the same shape as generate_all_player_points_data's output, restricted to the matching fixtures;
+    with team_short_code/player_id each fixture's players are also restricted to that team/player. Bonus points
+    are still ranked over the whole fixture, so every row matches the full calculation.
+    """
+    print(f"--- Calculating player points slice (fixture_id={fixture_id}, GW={gw}, team={team_short_code}, player_id={player_id}) ---")
+    slice_teams = None
+    if team_short_code is not None:
+        slice_teams = {team_c for team_c, details in TEAM_DETAILS.items() if details['short_code'] == team_short_code.upper()}
+    if player_id is not None:
+        player_df, err_msg = load_player_stats(PLAYER_STATS_FP)
+        if err_msg: return None, err_msg
+        player_teams = set(player_df.loc[player_df[PLAYER_ID_COL_EXCEL].astype(str) == str(player_id), 'Team_Canonical'])
+        slice_teams = player_teams if slice_teams is None else slice_teams & player_teams
+    if slice_teams is not None and not slice_teams: return [], None
+
+    def fixture_filter(fixture_details):
+        return ((fixture_id is None or str(fixture_details['fixture_id']) == str(fixture_id))
+                and (gw is None or str(fixture_details['GW']) == str(gw))
+                and (slice_teams is None or fixture_details['home_team_canonical'] in slice_teams or fixture_details['away_team_canonical'] in slice_teams))
+
+    run_state, err_msg = _calculate_player_points_frame(fixture_filter=fixture_filter)
+    if run_state == {}: return [], None # No fixtures/players in the slice
+    if err_msg: return None, err_msg
+
+    player_points_df = run_state['player_points_df']
+    if team_short_code is not None: player_points_df = player_points_df[player_points_df['Team Short Code'] == team_short_code.upper()].copy()
+    if player_id is not None: player_points_df = player_points_df[player_points_df['player_id'].astype(str) == str(player_id)].copy()
+    grouped_data = group_player_points_by_fixture(player_points_df)
+    print(f"Successfully generated player point data slice for {len(grouped_data)} matches.")
+    return grouped_data, None
@@ -0,0 +1,73 @@
+# profiling.py
+# Opt-in cProfile runs for single requests, kept in a bounded on-disk ring of .prof (raw pstats) + .json (summary) files.
+import cProfile
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import uuid
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(".cache", "profiles"))
+PROFILE_RING_SIZE = int(os.getenv("PROFILE_RING_SIZE", "20")) # Oldest profiles are deleted beyond this many
+PROFILE_TOP_FUNCTIONS = 25
+PROFILE_ID_PATTERN = re.compile(r"^\d{13}-[0-9a-f]{8}$")
+_ring_lock = threading.Lock()
+
+def _function_label(func_key):
+    file_name, line_no, func_name = func_key
+    return func_name if file_name == "~" else f"{os.path.basename(file_name)}:{line_no}({func_name})" # "~" = builtins
+
+def summarize_stats(stats: pstats.Stats, top_n=PROFILE_TOP_FUNCTIONS):
+    """Hottest functions by own time (tottime) and by inclusive time (cumtime)."""
+    rows = [{"function": _function_label(func_key), "ncalls": ncalls, "tottime": round(tottime, 6), "cumtime": round(cumtime, 6)}
+            for func_key, (_, ncalls, tottime, cumtime, _) in stats.stats.items()]
+    return {"total_calls": stats.total_calls, "total_seconds": round(stats.total_tt, 6),
+            "top_by_tottime": sorted(rows, key=lambda row: row["tottime"], reverse=True)[:top_n],
+            "top_by_cumtime": sorted(rows, key=lambda row: row["cumtime"], reverse=True)[:top_n]}
+
+def run_profiled(label, func, *args, **kwargs):
+    """Runs func(*args, **kwargs) under cProfile in the calling thread and stores the profile in the ring.
+    Returns (func's return value, summary dict with the profile id). Work done in other threads/processes isn't profiled."""
+    profiler = cProfile.Profile()
+    started_at = time.time()
+    profiler.enable()
+    try: result = func(*args, **kwargs)
+    finally: profiler.disable()
+    profile_id = f"{int(started_at * 1000):013d}-{uuid.uuid4().hex[:8]}" # Sorts by start time
+    summary = {"profile_id": profile_id, "label": label, "started_at": started_at, "wall_seconds": round(time.time() - started_at, 6),
+               **summarize_stats(pstats.Stats(profiler))}
+    _store_profile(profile_id, profiler, summary)
+    return result, summary
+
+def _store_profile(profile_id, profiler, summary):
+    with _ring_lock:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(PROFILE_DIR, f"{profile_id}.prof"))
+        tmp_fp = os.path.join(PROFILE_DIR, f".{profile_id}.json.tmp")
+        with open(tmp_fp, "w", encoding="utf-8") as f: json.dump(summary, f)
+        os.replace(tmp_fp, os.path.join(PROFILE_DIR, f"{profile_id}.json"))
+        for stale_id in list_profile_ids()[:-PROFILE_RING_SIZE] if PROFILE_RING_SIZE > 0 else []:
+            for ext in (".json", ".prof"):
+                try: os.remove(os.path.join(PROFILE_DIR, stale_id + ext))
+                except FileNotFoundError: pass
+
+def list_profile_ids():
+    """Stored profile ids, oldest first."""
+    if not os.path.isdir(PROFILE_DIR): return []
+    return sorted(name[:-5] for name in os.listdir(PROFILE_DIR) if name.endswith(".json") and PROFILE_ID_PATTERN.match(name[:-5]))
+
+def load_profile_summary(profile_id):
+    """The stored summary, or None for unknown (or malformed) ids."""
+    if not PROFILE_ID_PATTERN.match(profile_id): return None
+    try:
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), "r", encoding="utf-8") as f: return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError): return None
+
+def get_profile_stats_path(profile_id):
+    """Path of the raw .prof file (for pstats/snakeviz), or None."""
+    if not PROFILE_ID_PATTERN.match(profile_id): return None
+    stats_fp = os.path.join(PROFILE_DIR, f"{profile_id}.prof")
+    return stats_fp if os.path.exists(stats_fp) else None
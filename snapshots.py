@@ -0,0 +1,187 @@
+# snapshots.py
+# Memory-mapped snapshots of the player-points result, shared read-only by every uvicorn worker.
+# One process builds each generation (under an exclusive file lock); the others map it instead of recomputing.
+import fcntl
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from itertools import groupby
+
+import events
+import point_calculator
+
+SNAPSHOTS_ENABLED = os.getenv("RESULT_SNAPSHOTS", "").lower() in ("1", "true", "yes")
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(point_calculator.CACHE_DIR, "snapshots"))
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "2")) # Older generations are deleted (workers still mapping them keep their pages)
+SNAPSHOT_VERSION = 3
+PAYLOAD_FILE = "payload.json" # The UTF-8 JSON body, byte for byte what the main endpoint serves
+ENCODED_PAYLOAD_FILES = {"gzip": "payload.json.gz", "br": "payload.json.br"} # Its precompressed forms (point_calculator.compress_json_body)
+# Index columns (.npy, memory-mapped). Spans are byte offsets into the payload:
+# fixture_spans rows are (fixture start, end of the fixture's JSON before its first player, fixture end), player_spans rows (start, end).
+# player_keys/player_total_points (NaN for None) let workers diff results (events.result_digest) without decoding the payload.
+SNAPSHOT_COLUMNS = ("fixture_ids", "fixture_gws", "fixture_spans", "player_fixture", "player_spans", "player_teams", "player_ids",
+                    "player_keys", "player_total_points")
+# Query index -> (level, column); keys are matched like app._build_result_indexes builds them
+QUERY_COLUMNS = {"fixture_id": ("fixture", "fixture_ids"), "gw": ("fixture", "fixture_gws"),
+                 "team_short_code": ("player", "player_teams"), "player_id": ("player", "player_ids")}
+_open_lock = threading.Lock()
+_last_opened = None
+
+class Snapshot:
+    """One mapped generation. body is a read-only view of the payload; queries slice fixture/player JSON out of it."""
+
+    def __init__(self, snapshot_dir, manifest):
+        import numpy as np
+        self.snapshot_dir, self.generation, self.fingerprint = snapshot_dir, manifest["generation"], manifest["fingerprint"]
+        self.n_fixtures, self.n_players = manifest["n_fixtures"], manifest["n_players"]
+        # Everything is mapped up front, so pruning the directory later doesn't affect this worker
+        self._payload = _map_file(os.path.join(snapshot_dir, PAYLOAD_FILE), manifest["payload_bytes"])
+        self.body = memoryview(self._payload)
+        self.encoded_bodies = {coding: memoryview(_map_file(os.path.join(snapshot_dir, ENCODED_PAYLOAD_FILES[coding]), size))
+                               for coding, size in manifest["encoded_payload_bytes"].items()}
+        self._columns = {col: np.load(os.path.join(snapshot_dir, f"{col}.npy"), mmap_mode="r", allow_pickle=False) for col in SNAPSHOT_COLUMNS}
+        self._data = None
+
+    def iter_fixture_json(self):
+        """Each fixture's JSON (bytes), in result order."""
+        for start, _, end in self._columns["fixture_spans"].tolist(): yield self._payload[start:end]
+
+    def iter_digest_items(self):
+        """(fixture_id, fixture JSON bytes, [(player key, TotalPoints)]) per fixture, for events.result_digest."""
+        player_points = zip(self._columns["player_fixture"].tolist(), self._columns["player_keys"].tolist(), self._columns["player_total_points"].tolist())
+        points_by_fixture = {fixture_i: [(key, total_points) for _, key, total_points in rows] for fixture_i, rows in groupby(player_points, key=lambda row: row[0])}
+        for fixture_i, (fixture_id, fixture_json) in enumerate(zip(self._columns["fixture_ids"].tolist(), self.iter_fixture_json())):
+            yield fixture_id, fixture_json, points_by_fixture.get(fixture_i, [])
+
+    def query(self, index_name, key):
+        """JSON (bytes) of the fixtures matching one index key; team/player matches only carry that team's/player's rows."""
+        import numpy as np
+        level, col = QUERY_COLUMNS[index_name]
+        if not key: return []
+        rows = np.flatnonzero(self._columns[col] == key).tolist()
+        fixture_spans = self._columns["fixture_spans"]
+        if level == "fixture": return [self._payload[fixture_spans[i, 0]:fixture_spans[i, 2]] for i in rows]
+        player_fixture, player_spans = self._columns["player_fixture"], self._columns["player_spans"]
+        matches = []
+        for fixture_i, fixture_rows in groupby(rows, key=lambda row: int(player_fixture[row])):
+            players_json = b",".join(self._payload[player_spans[row, 0]:player_spans[row, 1]] for row in fixture_rows)
+            matches.append(self._payload[fixture_spans[fixture_i, 0]:fixture_spans[fixture_i, 1]] + players_json + b"]}")
+        return matches
+
+    def load_data(self):
+        """The grouped result as Python objects, decoded from the payload on first use (per worker)."""
+        if self._data is None: self._data = json.loads(self._payload[:])
+        return self._data
+
+def _map_file(file_path, expected_size):
+    with open(file_path, "rb") as f: mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mapped) != expected_size: raise ValueError(f"{os.path.basename(file_path)} is {len(mapped)} bytes, expected {expected_size}")
+    return mapped
+
+def _generation_dir(generation):
+    return os.path.join(SNAPSHOT_DIR, f"gen-{generation:08d}")
+
+@contextmanager
+def builder_lock():
+    """Exclusive lock across processes (and threads) for building a snapshot; blocks until acquired."""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    with open(os.path.join(SNAPSHOT_DIR, ".build.lock"), "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try: yield
+        finally: fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def read_current():
+    """The CURRENT pointer ({"generation", "fingerprint", "engine_version"}), or None if no snapshot was published."""
+    try:
+        with open(os.path.join(SNAPSHOT_DIR, "CURRENT"), "r", encoding="utf-8") as f: return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError): return None
+
+def open_current(fingerprint=None):
+    """Maps the published snapshot (reusing this process's mapping of the same generation). Returns None if there is
+    none, it was built for a different input fingerprint or by different calculation code, or it can't be read."""
+    global _last_opened
+    current = read_current()
+    if current is None or (fingerprint is not None and current.get("fingerprint") != fingerprint): return None
+    if current.get("engine_version") != point_calculator.get_engine_version(): return None
+    with _open_lock:
+        if _last_opened is not None and _last_opened.generation == current["generation"]: return _last_opened
+        snapshot_dir = _generation_dir(current["generation"])
+        try:
+            with open(os.path.join(snapshot_dir, "manifest.json"), "r", encoding="utf-8") as f: manifest = json.load(f)
+            if manifest.get("version") != SNAPSHOT_VERSION or manifest.get("engine_version") != point_calculator.get_engine_version(): return None
+            _last_opened = Snapshot(snapshot_dir, manifest)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Warning (Snapshots): Could not open {snapshot_dir}: {e}")
+            return None
+        return _last_opened
+
+def write_snapshot(fingerprint, grouped_data):
+    """Writes grouped_data (point_calculator's grouped result) as the next generation, publishes it in CURRENT and
+    prunes old generations. Call under builder_lock(). Returns the mapped Snapshot, or None if it couldn't be written."""
+    import numpy as np
+    current = read_current()
+    generation = (current["generation"] if current else 0) + 1
+    snapshot_dir = _generation_dir(generation)
+    tmp_dir = f"{snapshot_dir}.tmp{os.getpid()}"
+    columns = {col: [] for col in SNAPSHOT_COLUMNS}
+    pieces, offset = [b"["], 1
+    for fixture_i, match_info in enumerate(grouped_data):
+        if fixture_i: pieces.append(b","); offset += 1
+        head, players_json = point_calculator.encode_fixture_json_parts(match_info)
+        head = head.encode("utf-8")
+        fixture_start = offset
+        pieces.append(head); offset += len(head)
+        for player_i, (player, player_json) in enumerate(zip(match_info["players"], players_json)):
+            if player_i: pieces.append(b","); offset += 1
+            player_json = player_json.encode("utf-8")
+            columns["player_spans"].append((offset, offset + len(player_json)))
+            pieces.append(player_json); offset += len(player_json)
+            columns["player_fixture"].append(fixture_i)
+            columns["player_teams"].append(str(player["Team Short Code"]).upper())
+            columns["player_ids"].append("" if player["player_id"] is None else str(player["player_id"]))
+            columns["player_keys"].append(events.get_player_key(player))
+            columns["player_total_points"].append(float("nan") if player["TotalPoints"] is None else float(player["TotalPoints"]))
+        pieces.append(b"]}"); offset += 2
+        columns["fixture_spans"].append((fixture_start, fixture_start + len(head), offset))
+        columns["fixture_ids"].append(str(match_info["fixture_id"]))
+        columns["fixture_gws"].append(str(match_info["GW"]))
+    pieces.append(b"]")
+    value_dtypes = {"player_fixture": np.int32, "player_total_points": np.float64}
+    arrays = {col: np.array(values, dtype=np.int64).reshape(-1, 3 if col == "fixture_spans" else 2) if col.endswith("_spans")
+              else np.array(values, dtype=value_dtypes.get(col, str)) for col, values in columns.items()}
+    payload = b"".join(pieces)
+    encoded_payloads = point_calculator.compress_json_body(payload)
+    engine_version = point_calculator.get_engine_version()
+    manifest = {"version": SNAPSHOT_VERSION, "engine_version": engine_version, "generation": generation, "fingerprint": fingerprint, "created_at": time.time(),
+                "n_fixtures": len(columns["fixture_ids"]), "n_players": len(columns["player_ids"]), "payload_bytes": len(payload),
+                "encoded_payload_bytes": {coding: len(encoded) for coding, encoded in encoded_payloads.items()}}
+    try:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        with open(os.path.join(tmp_dir, PAYLOAD_FILE), "wb") as f: f.write(payload)
+        for coding, encoded in encoded_payloads.items():
+            with open(os.path.join(tmp_dir, ENCODED_PAYLOAD_FILES[coding]), "wb") as f: f.write(encoded)
+        for col, values_array in arrays.items(): np.save(os.path.join(tmp_dir, f"{col}.npy"), values_array, allow_pickle=False)
+        with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f: json.dump(manifest, f)
+        os.replace(tmp_dir, snapshot_dir)
+        current_tmp_fp = os.path.join(SNAPSHOT_DIR, f".CURRENT.tmp{os.getpid()}")
+        with open(current_tmp_fp, "w", encoding="utf-8") as f: json.dump({"generation": generation, "fingerprint": fingerprint, "engine_version": engine_version}, f)
+        os.replace(current_tmp_fp, os.path.join(SNAPSHOT_DIR, "CURRENT"))
+    except OSError as e:
+        print(f"Warning (Snapshots): Could not write generation {generation} to '{SNAPSHOT_DIR}': {e}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return None
+    print(f"Info (Snapshots): Published generation {generation} ({manifest['n_fixtures']} fixtures, {manifest['payload_bytes']} bytes).")
+    _prune_generations(generation)
+    return open_current(fingerprint)
+
+def _prune_generations(latest_generation):
+    for name in os.listdir(SNAPSHOT_DIR):
+        if not name.startswith("gen-"): continue
+        generation = name[4:].split(".", 1)[0]
+        if generation.isdigit() and int(generation) <= latest_generation - max(SNAPSHOT_KEEP, 1):
+            shutil.rmtree(os.path.join(SNAPSHOT_DIR, name), ignore_errors=True)
@@ -0,0 +1,17 @@
+# conftest.py
+# Tests import the top-level modules and read the checked-in data/ files, which point_calculator addresses
+# relative to the repository root.
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path: sys.path.insert(0, REPO_ROOT)
+
+@pytest.fixture(autouse=True)
+def repo_cwd(monkeypatch, tmp_path):
+    """Runs each test from the repository root, with derived caches written to a temp dir."""
+    import point_calculator
+    monkeypatch.chdir(REPO_ROOT)
+    monkeypatch.setattr(point_calculator, "PLAYER_STATS_CACHE_DIR", str(tmp_path / "player_stats"))
@@ -0,0 +1,41 @@
+# test_bonus_points.py
+# Bonus points: 3/2/1 to the top three ExpectedPoints per match, ties broken by row order.
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+
+import point_calculator
+
+def finalize(player_points_df):
+    """(bonus group columns, BonusPoints list) after finalize_player_points."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        group_cols_for_bonus = point_calculator.get_bonus_group_columns(player_points_df)
+    point_calculator.finalize_player_points(player_points_df, group_cols_for_bonus)
+    return group_cols_for_bonus, player_points_df['BonusPoints'].tolist()
+
+def test_tied_players_in_fallback_fixtures_get_bonus_in_row_order():
+    """Two fixtures without an id share fixture_id/GW; MatchIdentifier keeps their bonus apart."""
+    player_points_df = pd.DataFrame({
+        'fixture_id':      ["N/A_ID", "N/A_ID", "N/A_ID", "N/A_ID", "N/A_ID", "N/A_ID", "N/A_ID", "f3", "f3", "f3", "f3"],
+        'GW':              ["1"] * 11,
+        'MatchIdentifier': ["A vs B", "C vs D", "A vs B", "A vs B", "C vs D", "A vs B", "A vs B", "E vs F", "E vs F", "E vs F", "E vs F"],
+        'ExpectedPoints':  [5.0, 4.0, 7.0, 5.0, 4.0, 5.0, 2.0, np.nan, 1.0, 1.0, 1.0],
+    })
+    group_cols_for_bonus, bonus_points = finalize(player_points_df)
+    assert group_cols_for_bonus == ['MatchIdentifier']
+    # A vs B: 7 -> 3, then the three 5s in row order -> 2, 1, 0. C vs D: 4, 4 -> 3, 2. E vs F: NaN counts as 0 and ranks last.
+    assert bonus_points == [2, 3, 3, 1, 2, 0, 0, 0, 3, 2, 1]
+    assert player_points_df['TotalPoints'].tolist() == [7.0, 7.0, 10.0, 6.0, 6.0, 5.0, 2.0, 0.0, 4.0, 3.0, 2.0]
+
+def test_fixture_id_and_gw_groups_break_ties_in_row_order():
+    player_points_df = pd.DataFrame({
+        'fixture_id':      ["f1", "f1", "f2", "f1", "f1", "f2"],
+        'GW':              ["1", "1", "1", "1", "1", "1"],
+        'MatchIdentifier': ["A vs B", "A vs B", "C vs D", "A vs B", "A vs B", "C vs D"],
+        'ExpectedPoints':  [3.5, 3.5, 0.0, 3.5, 3.5, 0.0],
+    })
+    group_cols_for_bonus, bonus_points = finalize(player_points_df)
+    assert group_cols_for_bonus == ['fixture_id', 'GW']
+    assert bonus_points == [3, 2, 3, 1, 0, 2]
@@ -0,0 +1,47 @@
+# test_fdr.py
+# calculate_fdr_frame must keep producing the fdr_final_df of the original per-fixture FDR loop.
+import contextlib
+import io
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import point_calculator
+
+# Saved from the per-fixture loop that calculate_fdr_frame replaced, run on the checked-in data/ files.
+# Only the correct-score probability sums may differ, in the last bit, from the summation order.
+GOLDEN_FP = os.path.join(os.path.dirname(__file__), "data", "fdr_final_df.json")
+
+@pytest.fixture(scope="module")
+def golden_fdr_df():
+    with open(GOLDEN_FP, "r", encoding="utf-8") as f: golden = json.load(f)
+    return pd.DataFrame(golden["data"], columns=golden["columns"]).astype(dict(zip(golden["columns"], golden["dtypes"])))
+
+@pytest.fixture
+def fdr_inputs():
+    """(fixtures, team strengths, correct-score lookup) loaded the way _calculate_player_points_frame loads them."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        fixtures = point_calculator.create_base_fixtures_with_canonical_names(point_calculator.TEAM_NAME_MAPPING, point_calculator.get_fixture_id_gw_lookup())
+        teams = set(t for fix in fixtures for t in (fix['home_team_canonical'], fix['away_team_canonical']))
+        outright_odds_df = point_calculator.get_tournament_outright_odds_data(point_calculator.HTML_ODDS_FP, point_calculator.MD_ODDS_FP, point_calculator.TEAM_NAME_MAPPING)
+        team_strengths = point_calculator.normalize_tournament_implied_probs(outright_odds_df, teams)
+        cs_odds_lookup = point_calculator.load_correct_score_data_for_fdr(point_calculator.CS_JSON_FP, point_calculator.TEAM_NAME_MAPPING)
+    return fixtures, team_strengths, cs_odds_lookup
+
+def assert_fdr_frame_equal(fdr_df, expected_df):
+    pd.testing.assert_frame_equal(fdr_df, expected_df, check_exact=False, rtol=1e-12, atol=0)
+
+def test_fdr_frame_matches_golden(fdr_inputs, golden_fdr_df):
+    with contextlib.redirect_stdout(io.StringIO()):
+        fdr_df = point_calculator.calculate_fdr_frame(*fdr_inputs)
+    assert fdr_df["fdr_calculation_method"].nunique() > 1 # Both the outright-only and the correct-score paths are covered
+    assert_fdr_frame_equal(fdr_df, golden_fdr_df)
+
+def test_selected_fixtures_match_golden_rows(fdr_inputs, golden_fdr_df):
+    """A slice keeps the rest days of the full schedule, so its rows equal the full frame's."""
+    selected_indices = [0, 1, 8, 17, 30, len(fdr_inputs[0]) - 1]
+    with contextlib.redirect_stdout(io.StringIO()):
+        fdr_df = point_calculator.calculate_fdr_frame(*fdr_inputs, selected_indices=selected_indices)
+    assert_fdr_frame_equal(fdr_df, golden_fdr_df.iloc[selected_indices].reset_index(drop=True))
@@ -0,0 +1,96 @@
+# test_incremental.py
+# generate_all_player_points_data(incremental=True) must return exactly what a full recompute returns.
+import contextlib
+import copy
+import io
+import json
+import shutil
+
+import pandas as pd
+import pytest
+
+import point_calculator
+
+@pytest.fixture
+def inputs(tmp_path, monkeypatch):
+    """Copies of the correct-score JSON and player workbook that a test may edit; no incremental state yet."""
+    cs_json_fp, player_stats_fp = tmp_path / "correct_score.json", tmp_path / "players.xlsx"
+    shutil.copy(point_calculator.CS_JSON_FP, cs_json_fp)
+    shutil.copy(point_calculator.PLAYER_STATS_FP, player_stats_fp)
+    monkeypatch.setattr(point_calculator, "CS_JSON_FP", str(cs_json_fp))
+    monkeypatch.setattr(point_calculator, "PLAYER_STATS_FP", str(player_stats_fp))
+    monkeypatch.setattr(point_calculator, "_INCREMENTAL_STATE", {})
+    with open(cs_json_fp, "r", encoding="utf-8") as f: correct_scores = json.load(f)
+    return {"cs_json_fp": cs_json_fp, "player_stats_fp": player_stats_fp, "correct_scores": correct_scores}
+
+def run(incremental):
+    """(grouped_data, json_body, printed output) of one calculation."""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        grouped_data, json_body, err_msg = point_calculator.generate_all_player_points_data(incremental=incremental, with_json=True)
+    assert err_msg is None
+    return grouped_data, json_body, output.getvalue()
+
+def assert_matches_full_run(grouped_data, json_body, monkeypatch):
+    monkeypatch.setattr(point_calculator, "_INCREMENTAL_STATE", {})
+    full_data, full_body, _ = run(incremental=False)
+    assert grouped_data == full_data
+    assert json_body == full_body
+
+def write_correct_scores(inputs, correct_scores):
+    with open(inputs["cs_json_fp"], "w", encoding="utf-8") as f: json.dump(correct_scores, f)
+
+def edit_correct_scores(inputs):
+    """Changes, rescales, reverses, removes and adds correct-score matches."""
+    correct_scores = copy.deepcopy(inputs["correct_scores"])
+    matches = correct_scores["matches"]
+    matches[1]["correct_score_odds"]["1-0"] = 3.0
+    matches[2]["correct_score_odds"] = {score: odds * 1.1 for score, odds in matches[2]["correct_score_odds"].items()}
+    home, away = matches[3]["match"].split(" vs ")
+    matches[3]["match"] = f"{away} vs {home}"
+    removed = matches.pop(5)
+    with contextlib.redirect_stdout(io.StringIO()):
+        fixtures = point_calculator.create_base_fixtures_with_canonical_names(point_calculator.TEAM_NAME_MAPPING, point_calculator.get_fixture_id_gw_lookup())
+    added = fixtures[-1] # Last round: no correct-score odds in the checked-in data
+    matches.append(dict(removed, match=f"{added['home_team_canonical']} vs {added['away_team_canonical']}", date=added["date_str"],
+                        group=added["group"], stadium=added["stadium"]))
+    write_correct_scores(inputs, correct_scores)
+
+def test_incremental_matches_full_run_after_correct_score_changes(inputs, monkeypatch):
+    before_data, _, _ = run(incremental=True)
+    edit_correct_scores(inputs)
+    grouped_data, json_body, output = run(incremental=True)
+    assert "Info (Incremental)" in output
+    assert grouped_data != before_data
+    assert_matches_full_run(grouped_data, json_body, monkeypatch)
+
+def test_incremental_without_changes_returns_previous_result(inputs):
+    before_data, before_body, _ = run(incremental=True)
+    grouped_data, json_body, output = run(incremental=True)
+    assert "recomputing 0 of" in output
+    assert (grouped_data, json_body) == (before_data, before_body)
+
+def test_incremental_matches_full_run_with_fallback_fixture_ids(inputs, monkeypatch):
+    """Fixtures without an id (N/A_ID) are grouped for bonus points by MatchIdentifier; edited ones must splice back in place."""
+    create_base_fixtures = point_calculator.create_base_fixtures_with_canonical_names
+    def create_base_fixtures_without_ids(*args, **kwargs):
+        fixtures = create_base_fixtures(*args, **kwargs)
+        for fixture_details in fixtures[1:3]: fixture_details["fixture_id"] = "N/A_ID"
+        return fixtures
+    monkeypatch.setattr(point_calculator, "create_base_fixtures_with_canonical_names", create_base_fixtures_without_ids)
+    before_data, _, _ = run(incremental=True)
+    assert sum(match_info["fixture_id"] == "N/A_ID" for match_info in before_data) == 2
+    edit_correct_scores(inputs)
+    grouped_data, json_body, output = run(incremental=True)
+    assert "Info (Incremental)" in output
+    assert_matches_full_run(grouped_data, json_body, monkeypatch)
+
+def test_changed_player_stats_force_a_full_run(inputs, monkeypatch):
+    run(incremental=True)
+    player_df = pd.read_excel(inputs["player_stats_fp"], sheet_name="Sheet1")
+    player_df.loc[0, "Goals"] = pd.to_numeric(player_df["Goals"], errors="coerce").fillna(0).iloc[0] + 5
+    player_df.to_excel(inputs["player_stats_fp"], sheet_name="Sheet1", index=False)
+    edit_correct_scores(inputs)
+    grouped_data, json_body, output = run(incremental=True)
+    assert "Info (Incremental)" not in output
+    assert_matches_full_run(grouped_data, json_body, monkeypatch)
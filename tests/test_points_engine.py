@@ -0,0 +1,43 @@
+# test_points_engine.py
+# The vectorized points engine (calculate_points_tensor / calculate_expected_points_vectorized) against the
+# per-scoreline reference, calculate_player_points_for_specific_score.
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import point_calculator
+
+ROSTER = pd.DataFrame({
+    "Player Name": ["Keeper", "Defender", "Midfielder", "Forward", "No goals", "No assists", "No stats", "Unknown", "No position"],
+    "PositionCategory": ["Goalkeeper", "Defender", "Midfielder", "Forward", "Forward", "Midfielder", "Defender", "Winger-back", None],
+    "Goals": [0, 2, 5, 11, math.nan, 3, math.nan, 4, 1],
+    "Assists": [1, 3, 7, 4, 2, math.nan, math.nan, 0, 6],
+})
+
+def reference_points_tensor(players_df, n_goals, n_conceded, team_goals_season, team_assists_season):
+    return np.array([[[point_calculator.calculate_player_points_for_specific_score(p_stats, team_goals, team_conceded, team_goals_season, team_assists_season)
+                       for team_conceded in range(n_conceded)] for team_goals in range(n_goals)] for _, p_stats in players_df.iterrows()])
+
+@pytest.mark.parametrize("team_goals_season, team_assists_season", [(30, 25), (1, 1), (0, 25), (30, 0)])
+def test_points_tensor_matches_reference(team_goals_season, team_assists_season):
+    expected = reference_points_tensor(ROSTER, 7, 6, team_goals_season, team_assists_season)
+    actual = point_calculator.calculate_points_tensor(ROSTER, 7, 6, team_goals_season, team_assists_season)
+    np.testing.assert_array_equal(actual, expected)
+
+def test_points_tensor_slices_match_smaller_grids():
+    full = point_calculator.calculate_points_tensor(ROSTER, 9, 9, 30, 25)
+    np.testing.assert_array_equal(full[:, :4, :3], point_calculator.calculate_points_tensor(ROSTER, 4, 3, 30, 25))
+
+def test_expected_points_match_reference_over_score_grid():
+    rng = np.random.default_rng(7)
+    score_prob_matrix = rng.random((6, 5))
+    score_prob_matrix /= score_prob_matrix.sum()
+    expected = [sum(point_calculator.calculate_player_points_for_specific_score(p_stats, g, c, 30, 25) * score_prob_matrix[g, c]
+                    for g in range(6) for c in range(5)) for _, p_stats in ROSTER.iterrows()]
+    actual = point_calculator.calculate_expected_points_vectorized(ROSTER, score_prob_matrix, 30, 25)
+    np.testing.assert_allclose(actual, expected, rtol=1e-12, atol=0, equal_nan=True) # Only the summation order differs
+
+def test_expected_points_empty_roster():
+    assert point_calculator.calculate_expected_points_vectorized(ROSTER.iloc[0:0], np.ones((2, 2)) / 4, 30, 25).shape == (0,)
@@ -0,0 +1,124 @@
+# watcher.py
+# Watches the calculation input files and calls back once per burst of changes (debounced).
+# Uses inotify (through libc, no extra dependency) on Linux and falls back to polling os.stat elsewhere.
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+import point_calculator
+
+DATA_WATCH_ENABLED = os.getenv("DATA_WATCH", "1").lower() in ("1", "true", "yes")
+DATA_WATCH_BACKEND = os.getenv("DATA_WATCH_BACKEND", "auto") # auto (inotify, else polling), inotify or polling
+DATA_WATCH_DEBOUNCE_SECONDS = float(os.getenv("DATA_WATCH_DEBOUNCE_SECONDS", "1.0")) # Quiet time after the last change before calling back
+DATA_WATCH_POLL_INTERVAL = float(os.getenv("DATA_WATCH_POLL_INTERVAL", "2.0"))
+WATCHED_FILES = (point_calculator.HTML_ODDS_FP, point_calculator.MD_ODDS_FP, point_calculator.CS_JSON_FP, point_calculator.PLAYER_STATS_FP)
+_STOP_CHECK_SECONDS = 0.5 # Longest a watcher thread waits before noticing stop()
+
+# inotify event masks (linux/inotify.h). Directories are watched, not files, so replacing a file (write to a temp
+# file + rename) is seen as well as overwriting it in place.
+IN_MODIFY, IN_ATTRIB, IN_CLOSE_WRITE = 0x2, 0x4, 0x8
+IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE = 0x40, 0x80, 0x100, 0x200
+IN_DELETE_SELF, IN_MOVE_SELF, IN_Q_OVERFLOW, IN_IGNORED = 0x400, 0x800, 0x4000, 0x8000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+_EVENT_HEADER = struct.Struct("iIII") # wd, mask, cookie, len (followed by len bytes of NUL-padded name)
+
+class DataWatcher:
+    """Calls on_change() from a background thread once the watched files stop changing for debounce_seconds."""
+
+    def __init__(self, on_change, file_paths=WATCHED_FILES, debounce_seconds=DATA_WATCH_DEBOUNCE_SECONDS,
+                 poll_interval=DATA_WATCH_POLL_INTERVAL, backend=DATA_WATCH_BACKEND):
+        self.on_change, self.debounce_seconds, self.poll_interval = on_change, debounce_seconds, poll_interval
+        self.file_paths = [os.path.abspath(file_path) for file_path in file_paths]
+        self.backend = backend
+        self._stop = threading.Event()
+        self._thread = None
+        self._due_at = None # Debounce deadline (time.monotonic()) while a change is pending
+
+    def start(self):
+        inotify_fd = self._open_inotify() if self.backend in ("auto", "inotify") else None
+        self.backend = "inotify" if inotify_fd is not None else "polling"
+        target = (lambda: self._run_inotify(inotify_fd)) if inotify_fd is not None else self._run_polling
+        self._thread = threading.Thread(target=target, name="data-watcher", daemon=True)
+        self._thread.start()
+        print(f"Info (Data Watcher): Watching {len(self.file_paths)} input files ({self.backend}, debounce {self.debounce_seconds}s).")
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread is not None: self._thread.join(timeout)
+
+    def _changed(self):
+        self._due_at = time.monotonic() + self.debounce_seconds
+
+    def _fire_if_due(self):
+        if self._due_at is None or time.monotonic() < self._due_at: return
+        self._due_at = None
+        try: self.on_change()
+        except Exception as e: print(f"Warning (Data Watcher): Change callback failed: {e}")
+
+    def _wait_seconds(self, idle_seconds):
+        return min(idle_seconds, _STOP_CHECK_SECONDS) if self._due_at is None else max(0.0, min(self._due_at - time.monotonic(), _STOP_CHECK_SECONDS))
+
+    # --- inotify backend ---
+    def _open_inotify(self):
+        """inotify fd watching every watched file's directory, or None if inotify isn't available."""
+        if not sys.platform.startswith("linux"): return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            inotify_fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if inotify_fd < 0: raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+            for dir_path in sorted({os.path.dirname(file_path) for file_path in self.file_paths}):
+                if libc.inotify_add_watch(inotify_fd, os.fsencode(dir_path), WATCH_MASK) < 0:
+                    error_number = ctypes.get_errno()
+                    os.close(inotify_fd)
+                    raise OSError(error_number, f"{os.strerror(error_number)}: {dir_path}")
+            return inotify_fd
+        except (OSError, AttributeError) as e: # AttributeError: libc without inotify symbols
+            print(f"Warning (Data Watcher): inotify unavailable ({e}); polling instead.")
+            return None
+
+    def _run_inotify(self, inotify_fd):
+        watched_names = {os.fsencode(os.path.basename(file_path)) for file_path in self.file_paths}
+        try:
+            while not self._stop.is_set():
+                readable, _, _ = select.select([inotify_fd], [], [], self._wait_seconds(_STOP_CHECK_SECONDS))
+                if readable:
+                    try: buffer = os.read(inotify_fd, 64 * 1024)
+                    except BlockingIOError: buffer = b""
+                    offset = 0
+                    while offset < len(buffer):
+                        _, mask, _, name_length = _EVENT_HEADER.unpack_from(buffer, offset)
+                        name = buffer[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + name_length].rstrip(b"\0")
+                        offset += _EVENT_HEADER.size + name_length
+                        if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                            print("Warning (Data Watcher): A watched directory was removed or moved; polling instead.")
+                            self._changed()
+                            return self._run_polling()
+                        if mask & IN_Q_OVERFLOW or name in watched_names: self._changed()
+                self._fire_if_due()
+        finally:
+            os.close(inotify_fd)
+
+    # --- Polling backend ---
+    def _stat_signature(self):
+        signature = []
+        for file_path in self.file_paths:
+            try: stat = os.stat(file_path)
+            except OSError: signature.append(None); continue
+            signature.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+        return signature
+
+    def _run_polling(self):
+        self.backend = "polling"
+        last_signature, next_poll_at = self._stat_signature(), time.monotonic() + self.poll_interval
+        while not self._stop.wait(self._wait_seconds(max(0.0, next_poll_at - time.monotonic()))):
+            if time.monotonic() >= next_poll_at:
+                signature = self._stat_signature()
+                if signature != last_signature: last_signature = signature; self._changed()
+                next_poll_at = time.monotonic() + self.poll_interval
+            self._fire_if_due()